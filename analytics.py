@@ -0,0 +1,176 @@
+from datetime import date
+
+import workdays
+
+# Keys are (department_id, month, leave_type, status); month is the first day
+# of the month the leave starts in. Values are (leave_count, day_count,
+# decided_count, latency_seconds).
+UPSERT_ROLLUP = """
+    INSERT INTO leave_rollups (department_id, month, leave_type, status,
+                               leave_count, day_count, decided_count, latency_seconds)
+    VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+    ON DUPLICATE KEY UPDATE leave_count = leave_count + VALUES(leave_count),
+                            day_count = day_count + VALUES(day_count),
+                            decided_count = decided_count + VALUES(decided_count),
+                            latency_seconds = latency_seconds + VALUES(latency_seconds)
+"""
+
+INSERT_ROLLUP = """
+    INSERT INTO leave_rollups (department_id, month, leave_type, status,
+                               leave_count, day_count, decided_count, latency_seconds)
+    VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+"""
+
+# Leave types whose days come out of a balance
+BALANCE_TYPES = ('vacation', 'sick')
+
+
+def month_of(day):
+    return day.replace(day=1)
+
+
+def submitted(department_id, leave_type, start_date, days):
+    """Rollup delta for a newly submitted leave."""
+    return [((department_id, month_of(start_date), leave_type, 'pending'), (1, days, 0, 0))]
+
+
+def decided(leave, status, days, decided_at):
+    """Rollup deltas moving a pending leave to ``status``.
+
+    ``leave`` needs department_id, leave_type, start_date and submitted_at.
+    """
+    key = (leave['department_id'], month_of(leave['start_date']), leave['leave_type'])
+    latency = int((decided_at - leave['submitted_at']).total_seconds())
+    return [(key + ('pending',), (-1, -days, 0, 0)),
+            (key + (status,), (1, days, 1, latency))]
+
+
+def record(cursor, deltas):
+    """Apply rollup deltas in the caller's transaction.
+
+    Deltas for the same key are merged and keys are written in order, so
+    concurrent transactions lock rollup rows in the same order.
+    """
+    merged = {}
+    for key, values in deltas:
+        current = merged.get(key, (0, 0, 0, 0))
+        merged[key] = tuple(a + b for a, b in zip(current, values))
+    if merged:
+        cursor.executemany(UPSERT_ROLLUP, [key + values for key, values in sorted(merged.items())])
+
+
+def rebuild_department(connection, department_id, department_name, chunk_size=5000):
+    """Recompute one department's rollups from its leaves.
+
+    Runs as one transaction that starts by deleting the department's rollup
+    rows. The locks this takes make concurrent submits and decisions in the
+    department wait until the new totals are committed, so their deltas
+    apply on top of the rebuilt rows instead of being lost. Leaves are read
+    in chunks and their working days counted a chunk at a time.
+    """
+    calendar = workdays.calendar_for(department_name)
+    totals = {}
+    cursor = connection.cursor(buffered=False)
+    try:
+        cursor.execute("DELETE FROM leave_rollups WHERE department_id = %s", (department_id,))
+        cursor.execute("""
+            SELECT leave_type, status, start_date, end_date, submitted_at, approved_at
+            FROM leaves
+            WHERE department_id = %s
+        """, (department_id,))
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+            days = calendar.count_many((row[2], row[3]) for row in rows)
+            for (leave_type, status, start_date, _, submitted_at, approved_at), count in zip(rows, days):
+                key = (month_of(start_date), leave_type, status)
+                leaves, day_count, decided_count, latency = totals.get(key, (0, 0, 0, 0))
+                if status != 'pending' and approved_at and submitted_at:
+                    decided_count += 1
+                    latency += int((approved_at - submitted_at).total_seconds())
+                totals[key] = (leaves + 1, day_count + count, decided_count, latency)
+        cursor.executemany(INSERT_ROLLUP, [(department_id,) + key + values for key, values in sorted(totals.items())])
+        connection.commit()
+    except Exception:
+        connection.rollback()
+        raise
+    finally:
+        cursor.close()
+    return len(totals)
+
+
+def rebuild(connection, chunk_size=5000):
+    """Recompute the rollups of every department, one transaction each."""
+    cursor = connection.cursor()
+    cursor.execute("SELECT id, name FROM departments ORDER BY id")
+    department_rows = cursor.fetchall()
+    cursor.close()
+    connection.commit()
+    return sum(rebuild_department(connection, department_id, name, chunk_size)
+               for department_id, name in department_rows)
+
+
+def report(cursor, department_id, year):
+    """Usage per month, decision latency and balance burn-down for one year.
+
+    ``cursor`` must be a dict cursor. Reads at most one rollup row per
+    (month, leave_type, status) plus the department's summed balances.
+    """
+    cursor.execute("""
+        SELECT month, leave_type, status, leave_count, day_count, decided_count, latency_seconds
+        FROM leave_rollups
+        WHERE department_id = %s AND month BETWEEN %s AND %s
+        ORDER BY month, leave_type, status
+    """, (department_id, date(year, 1, 1), date(year, 12, 1)))
+    rows = cursor.fetchall()
+
+    usage = []
+    latency = {status: {'decided': 0, 'seconds': 0} for status in ('approved', 'rejected')}
+    approved_days = {leave_type: [0] * 12 for leave_type in BALANCE_TYPES}
+    for row in rows:
+        usage.append({
+            'month': row['month'].strftime('%Y-%m'),
+            'leave_type': row['leave_type'],
+            'status': row['status'],
+            'leaves': int(row['leave_count']),
+            'days': int(row['day_count'])
+        })
+        if row['status'] in latency:
+            latency[row['status']]['decided'] += int(row['decided_count'])
+            latency[row['status']]['seconds'] += int(row['latency_seconds'])
+        if row['status'] == 'approved' and row['leave_type'] in approved_days:
+            approved_days[row['leave_type']][row['month'].month - 1] += int(row['day_count'])
+
+    # Balances are charged at approval, so today's balance plus the days
+    # approved for later months is what was left at the end of each month
+    cursor.execute("""
+        SELECT COALESCE(SUM(vacation_balance), 0) AS vacation, COALESCE(SUM(sick_balance), 0) AS sick
+        FROM users
+        WHERE department_id = %s
+    """, (department_id,))
+    balances = cursor.fetchone()
+    burn_down = []
+    remaining = {leave_type: int(balances[leave_type]) + sum(approved_days[leave_type]) for leave_type in BALANCE_TYPES}
+    used = {leave_type: 0 for leave_type in BALANCE_TYPES}
+    for month in range(12):
+        entry = {'month': f'{year}-{month + 1:02d}'}
+        for leave_type in BALANCE_TYPES:
+            used[leave_type] += approved_days[leave_type][month]
+            remaining[leave_type] -= approved_days[leave_type][month]
+            entry[f'{leave_type}_used'] = used[leave_type]
+            entry[f'{leave_type}_remaining'] = remaining[leave_type]
+        burn_down.append(entry)
+
+    return {
+        'year': year,
+        'usage': usage,
+        'approval_latency': {
+            status: {
+                'decided': values['decided'],
+                'average_hours': round(values['seconds'] / values['decided'] / 3600, 2) if values['decided'] else None
+            }
+            for status, values in latency.items()
+        },
+        'burn_down': burn_down
+    }
@@ -1,37 +1,198 @@
-from flask import Flask, render_template, request, jsonify, session, redirect, url_for
+import os
+
+# Serving mode: 'threading' (default), or 'eventlet' / 'gevent' for green threads.
+# Green modes patch the standard library before anything opens sockets or threads.
+ASYNC_MODE = os.environ.get('ASYNC_MODE', 'threading')
+if ASYNC_MODE == 'eventlet':
+    import eventlet
+    eventlet.monkey_patch()
+elif ASYNC_MODE == 'gevent':
+    from gevent import monkey
+    monkey.patch_all()
+
+from flask import (Blueprint, Flask, Response, current_app, render_template, request, jsonify, session, redirect,
+                   stream_with_context, url_for)
 from flask_socketio import SocketIO, emit, join_room
 from flask_cors import CORS
-import mysql.connector
-from mysql.connector import Error
-from datetime import datetime, timedelta
-from werkzeug.security import generate_password_hash, check_password_hash
-import os
+import click
+from datetime import date, datetime, timedelta
 from functools import wraps
+import db
+import identity
+import analytics
+import balances
+import export
+import calendar_cache
+import occupancy
+import departments
+import workdays
+import notifications
+import passwords
+import realtime
+import instrumentation
+import response_cache
+import startup
+from balances import BALANCE_COLUMNS
+from db import get_db, PoolTimeout
+from identity import current_identity
+from response_cache import department_versioned
+from pagination import leave_filters, keyset_page, parse_date, LEAVE_STATUSES, LEAVE_TYPES
+from serialization import RowSchema, json_response, json_array_response
+from workdays import leave_days
 
-app = Flask(__name__)
-app.config['SECRET_KEY'] = 'your-secret-key-change-in-production'
-CORS(app)
-socketio = SocketIO(app, cors_allowed_origins="*", async_mode="threading")
+# Routes, error handlers, CLI commands and Socket.IO events are registered on
+# these; create_app() binds them to an application
+main = Blueprint('main', __name__, cli_group=None)
+socketio = SocketIO()
 
-def get_db_connection():
-    try:
-        connection = mysql.connector.connect(
-            host='localhost',
-            database='leave_management',
-            user='root',
-            password='Rajesh@857'  # Change this to your MySQL password
-        )
-        return connection
-    except Error as e:
-        print(f"Error connecting to MySQL: {e}")
-        return None
+# Statements nearly every worker runs first, executed once on each connection
+# opened by the warm-up (see startup.warm_up)
+LOGIN_SELECT = "SELECT * FROM users WHERE email = %s"
+WARM_STATEMENTS = [
+    (LOGIN_SELECT, ('',)),
+    (identity.IDENTITY_SELECT, (0,))
+]
+
+def configure(app):
+    """Read the settings from the environment; see the README for each one."""
+    app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'your-secret-key-change-in-production')
+    app.config['ASYNC_MODE'] = ASYNC_MODE
+    
+    # Load shared state before the server forks its workers and leave
+    # connections, threads and hashing processes to start_worker()
+    app.config['PREFORK'] = os.environ.get('PREFORK', '0') == '1'
+    
+    # Cross-process Socket.IO fan-out: redis://..., amqp://... or unix:///path for the local broker
+    app.config['SOCKETIO_MESSAGE_QUEUE'] = os.environ.get('SOCKETIO_MESSAGE_QUEUE')
+    
+    # Database settings
+    app.config['DB_BACKEND'] = os.environ.get('DB_BACKEND', 'mysql')  # 'mysql' or 'sqlite'
+    app.config['DB_CONFIG'] = {
+        'host': os.environ.get('DB_HOST', 'localhost'),
+        'database': os.environ.get('DB_NAME', 'leave_management'),
+        'user': os.environ.get('DB_USER', 'root'),
+        'password': os.environ.get('DB_PASSWORD', '')
+    }
+    app.config['SQLITE_PATH'] = os.environ.get('SQLITE_PATH', 'leave_management.db')
+    app.config['DB_POOL_SIZE'] = int(os.environ.get('DB_POOL_SIZE', 10))
+    app.config['DB_POOL_TIMEOUT'] = float(os.environ.get('DB_POOL_TIMEOUT', 5))
+    # Connections each worker opens and warms before it reports ready
+    app.config['DB_WARM_CONNECTIONS'] = int(os.environ.get('DB_WARM_CONNECTIONS', 2))
+    
+    # Seconds a cached user identity (role, department, name) stays valid
+    app.config['IDENTITY_CACHE_TTL'] = int(os.environ.get('IDENTITY_CACHE_TTL', 300))
+    # Identities loaded at start-up: managers and employees who submitted leave recently
+    app.config['IDENTITY_WARM_USERS'] = int(os.environ.get('IDENTITY_WARM_USERS', 1000))
+    
+    # Approved leaves are cached per department for calendar windows
+    app.config['CALENDAR_CACHE_TTL'] = int(os.environ.get('CALENDAR_CACHE_TTL', 300))
+    
+    # Department read endpoints revalidate against a per-department version; with
+    # RESPONSE_CACHE_BYTES > 0 their bodies are also kept in an in-process LRU
+    app.config['RESPONSE_CACHE_BYTES'] = int(os.environ.get('RESPONSE_CACHE_BYTES', 0))
+    app.config['RESPONSE_VERSION_FILE'] = os.environ.get('RESPONSE_VERSION_FILE')
+    
+    # Working-day calendars (weekmask and holidays) used to charge leave; see workdays.py
+    app.config['WORK_CALENDARS_FILE'] = os.environ.get('WORK_CALENDARS_FILE')
+    
+    # Most people of a department away on one working day, as a count and as a
+    # share of its headcount (0 disables); COVERAGE_RULES_FILE overrides per department
+    app.config['MAX_ABSENT'] = int(os.environ.get('MAX_ABSENT', 0))
+    app.config['MAX_ABSENT_RATIO'] = float(os.environ.get('MAX_ABSENT_RATIO', 0))
+    app.config['COVERAGE_RULES_FILE'] = os.environ.get('COVERAGE_RULES_FILE')
+    
+    # Yearly allowances granted at registration and by `flask --app app accrue-balances`,
+    # and the days `flask --app app expire-balances` lets a balance carry into the next year
+    app.config['VACATION_DAYS_PER_YEAR'] = int(os.environ.get('VACATION_DAYS_PER_YEAR', 20))
+    app.config['SICK_DAYS_PER_YEAR'] = int(os.environ.get('SICK_DAYS_PER_YEAR', 10))
+    app.config['VACATION_CARRY_OVER_DAYS'] = int(os.environ.get('VACATION_CARRY_OVER_DAYS', 5))
+    app.config['SICK_CARRY_OVER_DAYS'] = int(os.environ.get('SICK_CARRY_OVER_DAYS', 0))
+    
+    # Password hashing cost and worker processes (0 hashes in the request thread)
+    app.config['PASSWORD_HASH_METHOD'] = os.environ.get('PASSWORD_HASH_METHOD', 'scrypt')
+    app.config['PASSWORD_HASH_WORKERS'] = int(os.environ.get('PASSWORD_HASH_WORKERS', os.cpu_count() or 1))
+    
+    # Notification rows and Socket.IO emits are written by a background worker
+    app.config['NOTIFICATION_QUEUE_SIZE'] = int(os.environ.get('NOTIFICATION_QUEUE_SIZE', 10000))
+    # Age after which `flask --app app purge-notifications` deletes notifications
+    app.config['NOTIFICATION_RETENTION_DAYS'] = int(os.environ.get('NOTIFICATION_RETENTION_DAYS', 90))
+    
+    # Opt-in metrics on /metrics: route latency, SQL per request, slow queries and
+    # Socket.IO emits. With PROFILE_DIR set, requests sent with an X-Profile header
+    # are sampled into folded-stack files there. /metrics answers managers and
+    # requests carrying METRICS_TOKEN as a bearer token.
+    app.config['METRICS_ENABLED'] = os.environ.get('METRICS_ENABLED', '0') == '1'
+    app.config['METRICS_TOKEN'] = os.environ.get('METRICS_TOKEN')
+    app.config['SLOW_QUERY_MS'] = float(os.environ.get('SLOW_QUERY_MS', 100))
+    app.config['PROFILE_DIR'] = os.environ.get('PROFILE_DIR')
+
+def create_app(config=None):
+    """Build the application; ``config`` overrides the settings read from the environment.
+    
+    Nothing here opens a connection or starts a thread or process unless
+    start_worker() runs, which happens at the end unless PREFORK is set. With
+    PREFORK the shared read-only state is loaded here instead, and the server
+    calls start_worker() in every worker after forking (see
+    scripts/gunicorn.conf.py).
+    """
+    app = Flask(__name__)
+    configure(app)
+    app.config.update(config or {})
+    CORS(app, expose_headers=['X-Next-Cursor'])
+    socketio.init_app(app, cors_allowed_origins="*", async_mode=app.config['ASYNC_MODE'],
+                      **realtime.socketio_options(app.config))
+    
+    db.init_app(app)
+    departments.init_app(app)
+    identity.init_app(app)
+    calendar_cache.init_app(app)
+    # The version table is shared with workers forked after this point
+    response_cache.init_app(app)
+    workdays.init_app(app)
+    occupancy.init_app(app)
+    balances.init_app(app)
+    passwords.init_app(app)
+    notifications.init_app(app, socketio)
+    app.extensions['startup'] = startup.state
+    app.register_blueprint(main)
+    # Last: wraps the notification emits and reads every extension's stats
+    instrumentation.init_app(app)
+    
+    if app.config['PREFORK']:
+        startup.load_shared(app)
+        startup.prepare_fork()
+    else:
+        start_worker(app)
+    return app
+
+def start_worker(app):
+    """Start this process's hashing workers and notification writer, then warm it up.
+    
+    Hashing processes are forked first, while the process is single-threaded.
+    """
+    passwords.start()
+    notifications.start()
+    startup.warm_up(app, WARM_STATEMENTS)
+
+# `app` is built on first access, so importing this module (tests, CLI
+# helpers, create_app() callers) does not configure one from the environment
+def __getattr__(name):
+    if name == 'app':
+        global app
+        app = create_app()
+        return app
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+@main.app_errorhandler(PoolTimeout)
+def handle_pool_timeout(e):
+    return jsonify({'error': 'Service busy, please retry'}), 503
 
 # Login required decorator
 def login_required(f):
     @wraps(f)
     def decorated_function(*args, **kwargs):
         if 'user_id' not in session:
-            return redirect(url_for('login'))
+            return redirect(url_for('.login'))
         return f(*args, **kwargs)
     return decorated_function
 
@@ -40,57 +201,111 @@ def manager_required(f):
     @wraps(f)
     def decorated_function(*args, **kwargs):
         if 'user_id' not in session:
-            return redirect(url_for('login'))
-        
-        connection = get_db_connection()
-        cursor = connection.cursor(dictionary=True)
-        cursor.execute("SELECT role FROM users WHERE id = %s", (session['user_id'],))
-        user = cursor.fetchone()
-        cursor.close()
-        connection.close()
+            return redirect(url_for('.login'))
         
+        user = current_identity()
         if not user or user.get('role') != 'manager':
             return jsonify({'error': 'Unauthorized'}), 403
         return f(*args, **kwargs)
     return decorated_function
 
+# Leaves store only user_id and department_id; the employee's current name is
+# looked up per returned row and department names come from the departments cache
+USER_NAME_COLUMN = "(SELECT name FROM users WHERE users.id = leaves.user_id) AS user_name"
+
+LEAVE_LIST_SELECT = f"""
+    SELECT id, user_id, {USER_NAME_COLUMN}, department_id, leave_type, start_date, end_date, 
+           reason, status, submitted_at, manager_comment, approved_by, approved_at
+    FROM leaves
+"""
+
+# Response shape of a LEAVE_LIST_SELECT row, read from a tuple cursor. _id
+# duplicates id for frontend compatibility; exports leave it out.
+LEAVE_FIELDS = [
+    ('id', 'id', None),
+    ('user_id', 'user_id', None),
+    ('user_name', 'user_name', None),
+    ('department_id', 'department', departments.name),
+    ('leave_type', 'leave_type', None),
+    ('start_date', 'start_date', None),
+    ('end_date', 'end_date', None),
+    ('reason', 'reason', None),
+    ('status', 'status', None),
+    ('submitted_at', 'submitted_at', None),
+    ('manager_comment', 'manager_comment', None),
+    ('approved_by', 'approved_by', None),
+    ('approved_at', 'approved_at', None)
+]
+LEAVE_SCHEMA = RowSchema(LEAVE_FIELDS, derived=[('_id', 'id', str)])
+LEAVE_EXPORT_SCHEMA = RowSchema(LEAVE_FIELDS)
+
+def serialize_leave(leave):
+    """Response dict for a LEAVE_LIST_SELECT row read from a dict cursor."""
+    return LEAVE_SCHEMA.from_dict(leave)
+
+# Paginated lists keep returning a plain array; the next page is advertised in a header
+def leave_page_response(rows, next_cursor):
+    response = json_array_response(LEAVE_SCHEMA, rows)
+    if next_cursor:
+        response.headers['X-Next-Cursor'] = next_cursor
+    return response
+
 # Routes
-@app.route('/')
+@main.route('/')
 def index():
     if 'user_id' in session:
-        connection = get_db_connection()
-        cursor = connection.cursor(dictionary=True)
-        cursor.execute("SELECT role FROM users WHERE id = %s", (session['user_id'],))
-        user = cursor.fetchone()
-        cursor.close()
-        connection.close()
-        
+        user = current_identity()
         if user and user.get('role') == 'manager':
-            return redirect(url_for('manager_dashboard'))
-        return redirect(url_for('employee_dashboard'))
-    return redirect(url_for('login'))
+            return redirect(url_for('.manager_dashboard'))
+        return redirect(url_for('.employee_dashboard'))
+    return redirect(url_for('.login'))
 
-@app.route('/login')
+@main.route('/login')
 def login():
     return render_template('login.html')
 
-@app.route('/api/login', methods=['POST'])
+# Liveness: the process is up and serving requests
+@main.route('/healthz')
+def liveness():
+    return jsonify({'status': 'ok', 'pid': os.getpid()})
+
+# Readiness: this process finished its warm-up and can reach the database
+@main.route('/readyz')
+def readiness():
+    if not startup.state.ready:
+        return jsonify({'status': 'starting', 'pid': os.getpid()}), 503
+    try:
+        with get_db() as (connection, cursor):
+            cursor.execute("SELECT 1")
+            cursor.fetchall()
+    except Exception as e:
+        print(f"Readiness check failed: {e}")
+        return jsonify({'status': 'unavailable', 'pid': os.getpid()}), 503
+    return jsonify(dict(startup.state.stats(), status='ready', pid=os.getpid()))
+
+@main.route('/api/login', methods=['POST'])
 def api_login():
     data = request.json
     email = data.get('email')
     password = data.get('password')
     
-    connection = get_db_connection()
-    cursor = connection.cursor(dictionary=True)
-    cursor.execute("SELECT * FROM users WHERE email = %s", (email,))
-    user = cursor.fetchone()
-    cursor.close()
-    connection.close()
+    with get_db() as (connection, cursor):
+        cursor.execute(LOGIN_SELECT, (email,))
+        user = cursor.fetchone()
     
-    if user and check_password_hash(user['password'], password):
+    if user and passwords.verify_password(user['password'], password):
+        # Transparently move the stored hash to the configured parameters
+        new_hash = passwords.upgrade_hash(user['password'], password)
+        if new_hash:
+            with get_db() as (connection, cursor):
+                cursor.execute("UPDATE users SET password = %s WHERE id = %s AND password = %s",
+                               (new_hash, user['id'], user['password']))
+                connection.commit()
+        
         session['user_id'] = str(user['id'])
         session['user_name'] = user['name']
         session['user_role'] = user['role']
+        identity.remember(user)
         
         return jsonify({
             'success': True,
@@ -100,40 +315,44 @@ def api_login():
     
     return jsonify({'success': False, 'message': 'Invalid credentials'}), 401
 
-@app.route('/api/register', methods=['POST'])
+@main.route('/api/register', methods=['POST'])
 def api_register():
     data = request.json
+    # Hash before checking out a connection so the pool is not held while hashing
+    password_hash = passwords.hash_password(data.get('password'))
+    department_id = departments.id_for(data.get('department') or departments.DEFAULT_DEPARTMENT, create=True)
+    now = datetime.now()
     
-    connection = get_db_connection()
-    cursor = connection.cursor(dictionary=True)
-    cursor.execute("SELECT id FROM users WHERE email = %s", (data.get('email'),))
-    existing_user = cursor.fetchone()
-    
-    if existing_user:
-        cursor.close()
-        connection.close()
-        return jsonify({'success': False, 'message': 'Email already exists'}), 400
-    
-    query = """
-        INSERT INTO users (name, email, password, role, department, vacation_balance, sick_balance, created_at)
-        VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
-    """
-    values = (
-        data.get('name'),
-        data.get('email'),
-        generate_password_hash(data.get('password')),
-        data.get('role', 'employee'),
-        data.get('department', 'General'),
-        20,
-        10,
-        datetime.now()
-    )
-    
-    cursor.execute(query, values)
-    connection.commit()
-    user_id = cursor.lastrowid
-    cursor.close()
-    connection.close()
+    with get_db() as (connection, cursor):
+        cursor.execute("SELECT id FROM users WHERE email = %s", (data.get('email'),))
+        existing_user = cursor.fetchone()
+        
+        if existing_user:
+            return jsonify({'success': False, 'message': 'Email already exists'}), 400
+        
+        query = """
+            INSERT INTO users (name, email, password, role, department_id, vacation_balance, sick_balance, created_at)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+        """
+        values = (
+            data.get('name'),
+            data.get('email'),
+            password_hash,
+            data.get('role', 'employee'),
+            department_id,
+            balances.annual_days['vacation'],
+            balances.annual_days['sick'],
+            now
+        )
+        
+        cursor.execute(query, values)
+        user_id = cursor.lastrowid
+        # New users start with one year's allowance
+        balances.record(cursor, [balances.grant(user_id, leave_type, days, now)
+                                 for leave_type, days in balances.annual_days.items() if days])
+        connection.commit()
+    # The department's headcount changed
+    response_cache.bump(department_id)
     
     return jsonify({
         'success': True,
@@ -141,382 +360,834 @@ def api_register():
         'user_id': str(user_id)
     })
 
-@app.route('/logout')
+@main.route('/logout')
 def logout():
     session.clear()
-    return redirect(url_for('login'))
+    return redirect(url_for('.login'))
 
-@app.route('/employee')
+@main.route('/employee')
 @login_required
 def employee_dashboard():
     return render_template('employee_dashboard.html')
 
-@app.route('/manager')
+@main.route('/manager')
 @login_required
 @manager_required
 def manager_dashboard():
     return render_template('manager_dashboard.html')
 
-@app.route('/api/user/profile')
+# Balances are the materialized ledger totals kept on the user row
+def load_profile(cursor, user_id):
+    cursor.execute("SELECT name, email, department_id, role, vacation_balance, sick_balance FROM users WHERE id = %s", 
+                   (user_id,))
+    profile = cursor.fetchone()
+    if profile:
+        profile['department'] = departments.name(profile.pop('department_id'))
+    return profile
+
+@main.route('/api/user/profile')
 @login_required
 def get_user_profile():
-    connection = get_db_connection()
-    cursor = connection.cursor(dictionary=True)
-    cursor.execute("SELECT name, email, department, role, vacation_balance, sick_balance FROM users WHERE id = %s", 
-                   (session['user_id'],))
-    user = cursor.fetchone()
-    cursor.close()
-    connection.close()
+    with get_db() as (connection, cursor):
+        user = load_profile(cursor, session['user_id'])
     
     if user:
         return jsonify(user)
     return jsonify({'error': 'User not found'}), 404
 
-@app.route('/api/managers/department')
+@main.route('/api/user/balance-history')
 @login_required
-def get_department_managers():
-    connection = get_db_connection()
-    cursor = connection.cursor(dictionary=True)
-    cursor.execute("SELECT department FROM users WHERE id = %s", (session['user_id'],))
-    user = cursor.fetchone()
+def get_balance_history():
+    with get_db() as (connection, cursor):
+        try:
+            rows, next_cursor = keyset_page(cursor, """
+                SELECT id, leave_type, entry_type, days, leave_id, created_at 
+                FROM balance_ledger
+            """, ['user_id = %s'], [session['user_id']], request.args, column='created_at')
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
     
+    response = jsonify([{
+        'id': str(row['id']),
+        'leave_type': row['leave_type'],
+        'entry_type': row['entry_type'],
+        'days': row['days'],
+        'leave_id': str(row['leave_id']) if row['leave_id'] else None,
+        'created_at': row['created_at'].isoformat() if isinstance(row['created_at'], datetime) else row['created_at']
+    } for row in rows])
+    if next_cursor:
+        response.headers['X-Next-Cursor'] = next_cursor
+    return response
+
+# Items returned in a dashboard summary: recent requests for employees,
+# newest pending requests for managers
+DASHBOARD_RECENT_ITEMS = {'employee': 3, 'manager': 50}
+
+@main.route('/api/dashboard/summary')
+@login_required
+def get_dashboard_summary():
+    user = current_identity()
     if not user:
-        cursor.close()
-        connection.close()
         return jsonify({'error': 'User not found'}), 404
     
-    user_department = user.get('department', 'General')
+    if user['role'] == 'manager':
+        scope, scope_value = 'department_id = %s', user['department_id']
+        recent_filter = " AND status = 'pending'"
+    else:
+        scope, scope_value = 'user_id = %s', user['id']
+        recent_filter = ''
     
-    # Find all managers in the same department
-    cursor.execute("""
-        SELECT id, name, department 
-        FROM users 
-        WHERE role = 'manager' AND department = %s
-    """, (user_department,))
-    managers = cursor.fetchall()
-    cursor.close()
-    connection.close()
+    with get_db() as (connection, cursor):
+        profile = load_profile(cursor, user['id'])
+        
+        cursor.execute(f"SELECT status, COUNT(*) AS total FROM leaves WHERE {scope} GROUP BY status", 
+                       (scope_value,))
+        counts = {status: 0 for status in LEAVE_STATUSES}
+        counts.update({row['status']: row['total'] for row in cursor.fetchall()})
+        
+        cursor.execute(LEAVE_LIST_SELECT + f"""
+            WHERE {scope}{recent_filter} 
+            ORDER BY submitted_at DESC, id DESC 
+            LIMIT %s
+        """, (scope_value, DASHBOARD_RECENT_ITEMS[user['role']]))
+        recent = [serialize_leave(leave) for leave in cursor.fetchall()]
+    
+    counts['total'] = sum(counts.values())
+    return json_response({
+        'profile': profile,
+        'counts': counts,
+        'recent': recent
+    })
+
+@main.route('/api/managers/department')
+@login_required
+def get_department_managers():
+    user = current_identity()
+    if not user:
+        return jsonify({'error': 'User not found'}), 404
     
+    with get_db() as (connection, cursor):
+        # Find all managers in the same department
+        cursor.execute("""
+            SELECT id, name 
+            FROM users 
+            WHERE role = 'manager' AND department_id = %s
+        """, (user['department_id'],))
+        managers = cursor.fetchall()
+    
+    for manager in managers:
+        manager['department'] = user['department']
     return jsonify(managers)
 
-@app.route('/api/leaves/submit', methods=['POST'])
+@main.route('/api/leaves/submit', methods=['POST'])
 @login_required
 def submit_leave():
     data = request.json
+    user = current_identity()
+    if not user:
+        return jsonify({'error': 'User not found'}), 404
+    user_department = user['department']
     
-    connection = get_db_connection()
-    cursor = connection.cursor(dictionary=True)
-    cursor.execute("SELECT department FROM users WHERE id = %s", (session['user_id'],))
-    user = cursor.fetchone()
-    user_department = user.get('department', 'General')
-    
-    query = """
-        INSERT INTO leaves (user_id, user_name, department, leave_type, start_date, end_date, 
-                           reason, status, submitted_at)
-        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
-    """
-    values = (
-        session['user_id'],
-        session['user_name'],
-        user_department,
-        data.get('leave_type'),
-        data.get('start_date'),
-        data.get('end_date'),
-        data.get('reason'),
-        'pending',
-        datetime.now()
-    )
-    
-    cursor.execute(query, values)
-    connection.commit()
-    leave_id = cursor.lastrowid
-    
-    notification_query = """
-        INSERT INTO notifications (type, message, leave_id, department, created_at, is_read)
-        VALUES (%s, %s, %s, %s, %s, %s)
-    """
-    notification_values = (
-        'new_leave_request',
-        f'{session["user_name"]} ({user_department}) submitted a new leave request',
-        leave_id,
-        user_department,
-        datetime.now(),
-        False
-    )
-    cursor.execute(notification_query, notification_values)
-    connection.commit()
+    try:
+        start_date = parse_date(data.get('start_date') or '', 'start_date')
+        end_date = parse_date(data.get('end_date') or '', 'end_date')
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    if data.get('leave_type') not in LEAVE_TYPES:
+        return jsonify({'success': False, 'message': f'leave_type must be one of {", ".join(LEAVE_TYPES)}'}), 400
+    if end_date < start_date:
+        return jsonify({'success': False, 'message': 'End date must not be before start date'}), 400
+    days = leave_days({'department': user_department, 'start_date': start_date, 'end_date': end_date})
+    if not days:
+        return jsonify({'success': False, 'message': 'Leave covers no working days'}), 400
     
-    cursor.close()
-    connection.close()
+    with get_db() as (connection, cursor):
+        cursor.execute("""
+            SELECT id FROM leaves 
+            WHERE user_id = %s AND status = 'approved' AND end_date >= %s AND start_date <= %s 
+            LIMIT 1
+        """, (user['id'], start_date, end_date))
+        if cursor.fetchone():
+            return jsonify({'success': False, 'message': 'Leave overlaps an approved leave'}), 409
+        
+        query = """
+            INSERT INTO leaves (user_id, department_id, leave_type, start_date, end_date, 
+                               reason, status, submitted_at)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+        """
+        values = (
+            user['id'],
+            user['department_id'],
+            data.get('leave_type'),
+            start_date,
+            end_date,
+            data.get('reason'),
+            'pending',
+            datetime.now()
+        )
+        
+        cursor.execute(query, values)
+        leave_id = cursor.lastrowid
+        analytics.record(cursor, analytics.submitted(user['department_id'], data.get('leave_type'), start_date, days))
+        occupancy.record(cursor, occupancy.submitted(user['department_id'], user_department, start_date, end_date))
+        busy_day, limit = occupancy.over_limit(cursor, user['department_id'], user_department, start_date, end_date)
+        if busy_day:
+            connection.rollback()
+            return jsonify({
+                'success': False,
+                'message': f'{busy_day} already has the maximum of {limit} people away'
+            }), 409
+        connection.commit()
+    response_cache.bump(user['department_id'])
     
-    socketio.emit('new_leave_request', {
+    # The notification row and the manager emit are written behind the response
+    notifications.publish('new_leave_request', {
         'leave_id': str(leave_id),
-        'user_name': session['user_name'],
+        'user_name': user['name'],
         'department': user_department,
         'leave_type': data.get('leave_type'),
         'start_date': data.get('start_date'),
         'end_date': data.get('end_date')
-    }, room=f'managers_{user_department}')
+    }, room=f"managers_{user['department_id']}", notification=(
+        'new_leave_request',
+        f'{user["name"]} ({user_department}) submitted a new leave request',
+        leave_id,
+        user['department_id'],
+        None,
+        datetime.now(),
+        False
+    ))
     
     return jsonify({
         'success': True,
         'message': 'Leave request submitted successfully',
-        'leave_id': str(leave_id)
+        'leave_id': str(leave_id),
+        'days': days
     })
 
-@app.route('/api/leaves/my-requests')
+@main.route('/api/leaves/my-requests')
 @login_required
 def get_my_requests():
-    connection = get_db_connection()
-    cursor = connection.cursor(dictionary=True)
-    cursor.execute("""
-        SELECT id, user_id, user_name, department, leave_type, start_date, end_date, 
-               reason, status, submitted_at, manager_comment, approved_by, approved_at
-        FROM leaves 
-        WHERE user_id = %s 
-        ORDER BY submitted_at DESC
-    """, (session['user_id'],))
-    leaves = cursor.fetchall()
-    cursor.close()
-    connection.close()
-    
-    # Convert datetime objects to ISO format strings
-    for leave in leaves:
-        if isinstance(leave.get('submitted_at'), datetime):
-            leave['submitted_at'] = leave['submitted_at'].isoformat()
-        if isinstance(leave.get('approved_at'), datetime):
-            leave['approved_at'] = leave['approved_at'].isoformat()
-        if isinstance(leave.get('start_date'), datetime):
-            leave['start_date'] = leave['start_date'].strftime('%Y-%m-%d')
-        if isinstance(leave.get('end_date'), datetime):
-            leave['end_date'] = leave['end_date'].strftime('%Y-%m-%d')
-        # Rename id to _id for frontend compatibility
-        leave['_id'] = str(leave['id'])
-    
-    return jsonify(leaves)
-
-@app.route('/api/leaves/pending')
+    try:
+        clauses, params = leave_filters(request.args)
+        with get_db(dictionary=False) as (connection, cursor):
+            rows, next_cursor = keyset_page(cursor, LEAVE_LIST_SELECT,
+                                            ['user_id = %s'] + clauses,
+                                            [session['user_id']] + params,
+                                            request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    return leave_page_response(rows, next_cursor)
+
+@main.route('/api/leaves/pending')
 @login_required
 @manager_required
+@department_versioned
 def get_pending_leaves():
-    connection = get_db_connection()
-    cursor = connection.cursor(dictionary=True)
-    cursor.execute("SELECT department FROM users WHERE id = %s", (session['user_id'],))
-    manager = cursor.fetchone()
-    manager_department = manager.get('department', 'General')
+    manager = current_identity()
     
-    cursor.execute("""
-        SELECT id, user_id, user_name, department, leave_type, start_date, end_date, 
-               reason, status, submitted_at, manager_comment
-        FROM leaves 
-        WHERE status = 'pending' AND department = %s 
-        ORDER BY submitted_at DESC
-    """, (manager_department,))
-    leaves = cursor.fetchall()
-    cursor.close()
-    connection.close()
-    
-    # Convert datetime objects to ISO format strings
-    for leave in leaves:
-        if isinstance(leave.get('submitted_at'), datetime):
-            leave['submitted_at'] = leave['submitted_at'].isoformat()
-        if isinstance(leave.get('start_date'), datetime):
-            leave['start_date'] = leave['start_date'].strftime('%Y-%m-%d')
-        if isinstance(leave.get('end_date'), datetime):
-            leave['end_date'] = leave['end_date'].strftime('%Y-%m-%d')
-        leave['_id'] = str(leave['id'])
+    with get_db(dictionary=False) as (connection, cursor):
+        cursor.execute(LEAVE_LIST_SELECT + """
+            WHERE status = 'pending' AND department_id = %s 
+            ORDER BY submitted_at DESC
+        """, (manager['department_id'],))
+        rows = cursor.fetchall()
     
-    return jsonify(leaves)
+    # Unpaginated, so a large backlog is streamed in chunks
+    return json_array_response(LEAVE_SCHEMA, rows)
 
-@app.route('/api/leaves/all')
+@main.route('/api/leaves/all')
 @login_required
 @manager_required
+@department_versioned
 def get_all_leaves():
-    connection = get_db_connection()
-    cursor = connection.cursor(dictionary=True)
-    cursor.execute("SELECT department FROM users WHERE id = %s", (session['user_id'],))
-    manager = cursor.fetchone()
-    manager_department = manager.get('department', 'General')
+    manager_department_id = current_identity()['department_id']
     
-    cursor.execute("""
-        SELECT id, user_id, user_name, department, leave_type, start_date, end_date, 
-               reason, status, submitted_at, manager_comment, approved_by, approved_at
-        FROM leaves 
-        WHERE department = %s 
-        ORDER BY submitted_at DESC
-    """, (manager_department,))
-    leaves = cursor.fetchall()
-    cursor.close()
-    connection.close()
-    
-    # Convert datetime objects to ISO format strings
-    for leave in leaves:
-        if isinstance(leave.get('submitted_at'), datetime):
-            leave['submitted_at'] = leave['submitted_at'].isoformat()
-        if isinstance(leave.get('approved_at'), datetime):
-            leave['approved_at'] = leave['approved_at'].isoformat()
-        if isinstance(leave.get('start_date'), datetime):
-            leave['start_date'] = leave['start_date'].strftime('%Y-%m-%d')
-        if isinstance(leave.get('end_date'), datetime):
-            leave['end_date'] = leave['end_date'].strftime('%Y-%m-%d')
-        leave['_id'] = str(leave['id'])
-    
-    return jsonify(leaves)
-
-@app.route('/api/leaves/<leave_id>/approve', methods=['POST'])
+    try:
+        clauses, params = leave_filters(request.args)
+        with get_db(dictionary=False) as (connection, cursor):
+            rows, next_cursor = keyset_page(cursor, LEAVE_LIST_SELECT,
+                                            ['department_id = %s'] + clauses,
+                                            [manager_department_id] + params,
+                                            request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    return leave_page_response(rows, next_cursor)
+
+# Export format -> (mimetype, body generator)
+EXPORT_FORMATS = {
+    'csv': ('text/csv', export.csv_stream),
+    'ndjson': ('application/x-ndjson', export.ndjson_stream)
+}
+
+@main.route('/api/leaves/export')
 @login_required
 @manager_required
-def approve_leave(leave_id):
-    data = request.json
-    comment = data.get('comment', '')
+def export_leaves():
+    manager = current_identity()
+    export_format = request.args.get('format', 'csv')
+    if export_format not in EXPORT_FORMATS:
+        return jsonify({'error': f'format must be one of {", ".join(EXPORT_FORMATS)}'}), 400
+    try:
+        clauses, params = leave_filters(request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    # Rows are read chunk by chunk while the body is sent
+    chunks = export.leave_chunks(LEAVE_LIST_SELECT, LEAVE_EXPORT_SCHEMA,
+                                 ['department_id = %s'] + clauses,
+                                 [manager['department_id']] + params)
+    mimetype, stream = EXPORT_FORMATS[export_format]
+    # Keeping the request context while streaming counts the chunk queries
+    # towards this request's metrics
+    response = Response(stream_with_context(stream(chunks, LEAVE_EXPORT_SCHEMA)), mimetype=mimetype)
+    response.headers['Content-Disposition'] = f'attachment; filename=leaves-{date.today()}.{export_format}'
+    return response
+
+@main.route('/api/leaves/<int:leave_id>')
+@login_required
+def get_leave(leave_id):
+    user = current_identity()
+    if not user:
+        return jsonify({'error': 'User not found'}), 404
+    
+    with get_db() as (connection, cursor):
+        cursor.execute(LEAVE_LIST_SELECT + " WHERE id = %s", (leave_id,))
+        leave = cursor.fetchone()
     
-    connection = get_db_connection()
-    cursor = connection.cursor(dictionary=True)
+    if not leave:
+        return jsonify({'error': 'Leave not found'}), 404
     
-    # Get leave details
+    # Managers see their department's leaves, employees only their own
+    is_owner = str(leave['user_id']) == user['id']
+    is_department_manager = user['role'] == 'manager' and leave['department_id'] == user['department_id']
+    if not (is_owner or is_department_manager):
+        return jsonify({'error': 'Unauthorized'}), 403
+    
+    # Let the browser revalidate with If-None-Match and get a 304 when unchanged
+    response = json_response(serialize_leave(leave))
+    response.headers['Cache-Control'] = 'private, no-cache'
+    response.add_etag()
+    return response.make_conditional(request)
+
+# Largest number of decisions accepted by one bulk request
+MAX_BULK_DECISIONS = 1000
+
+# Move a pending leave of the manager's department to a final status. The
+# conditional UPDATE is the serialization point: a concurrent decision on the
+# same leave waits on its row lock and then matches no rows.
+def decide_leave(cursor, leave_id, status, comment):
+    manager = current_identity()
+    decided_at = datetime.now()
     cursor.execute("""
-        SELECT user_id, leave_type, start_date, end_date 
+        UPDATE leaves 
+        SET status = %s, 
+            manager_comment = %s, 
+            approved_by = %s, 
+            approved_at = %s
+        WHERE id = %s AND department_id = %s AND status = 'pending'
+    """, (status, comment, manager['name'], decided_at, leave_id, manager['department_id']))
+    updated = cursor.rowcount
+    
+    cursor.execute(f"""
+        SELECT id, user_id, {USER_NAME_COLUMN}, department_id, leave_type, start_date, end_date, status, 
+               submitted_at 
         FROM leaves 
         WHERE id = %s
     """, (leave_id,))
     leave = cursor.fetchone()
     
-    if leave:
-        # Update leave status
-        cursor.execute("""
-            UPDATE leaves 
-            SET status = 'approved', 
-                manager_comment = %s, 
-                approved_by = %s, 
-                approved_at = %s
-            WHERE id = %s
-        """, (comment, session['user_name'], datetime.now(), leave_id))
-        connection.commit()
-        
-        # Update user leave balance
-        leave_type = leave['leave_type']
-        start_date = leave['start_date']
-        end_date = leave['end_date']
-        days = (end_date - start_date).days + 1
+    if not leave or leave['department_id'] != manager['department_id']:
+        return None, (jsonify({'error': 'Leave not found'}), 404)
+    if not updated:
+        return None, (jsonify({'success': False, 'message': f"Leave already {leave['status']}"}), 409)
+    leave['department'] = manager['department']
+    leave['decided_at'] = decided_at
+    return leave, None
+
+def status_notification(leave, status):
+    """Inbox row for the employee whose leave was decided."""
+    return (
+        'leave_status_update',
+        f"Your {leave['leave_type']} leave from {leave['start_date']} to {leave['end_date']} was {status}",
+        leave['id'],
+        None,
+        leave['user_id'],
+        datetime.now(),
+        False
+    )
+
+@main.route('/api/leaves/<leave_id>/approve', methods=['POST'])
+@login_required
+@manager_required
+def approve_leave(leave_id):
+    data = request.json
+    comment = data.get('comment', '')
+    
+    with get_db() as (connection, cursor):
+        leave, error = decide_leave(cursor, leave_id, 'approved', comment)
+        if error:
+            return error
         
-        if leave_type == 'vacation':
-            cursor.execute("""
+        # Deduct the balance only if it covers the leave, in the same transaction
+        days = leave_days(leave)
+        column = BALANCE_COLUMNS.get(leave['leave_type'])
+        if column:
+            cursor.execute(f"""
                 UPDATE users 
-                SET vacation_balance = vacation_balance - %s 
-                WHERE id = %s
-            """, (days, leave['user_id']))
-        elif leave_type == 'sick':
-            cursor.execute("""
-                UPDATE users 
-                SET sick_balance = sick_balance - %s 
-                WHERE id = %s
-            """, (days, leave['user_id']))
+                SET {column} = {column} - %s 
+                WHERE id = %s AND {column} >= %s
+            """, (days, leave['user_id'], days))
+            if not cursor.rowcount:
+                connection.rollback()
+                return jsonify({'success': False, 'message': f"Insufficient {leave['leave_type']} balance"}), 409
+            balances.record(cursor, [balances.deduction(leave['user_id'], leave['leave_type'], days, leave['id'],
+                                                        leave['decided_at'])])
         
+        # Rollup and occupancy rows are locked last, as in bulk decisions
+        analytics.record(cursor, analytics.decided(leave, 'approved', days, leave['decided_at']))
+        occupancy.record(cursor, occupancy.decided(leave, 'approved'))
         connection.commit()
-        cursor.close()
-        connection.close()
-        
-        # Emit real-time notification to employee
-        socketio.emit('leave_status_update', {
-            'leave_id': leave_id,
-            'status': 'approved',
-            'comment': comment
-        }, room=str(leave['user_id']))
-        
-        return jsonify({'success': True, 'message': 'Leave approved'})
+    response_cache.bump(leave['department_id'])
+    
+    # Notify the employee in real time and in their inbox
+    notifications.publish('leave_status_update', {
+        'leave_id': leave_id,
+        'status': 'approved',
+        'comment': comment
+    }, room=str(leave['user_id']), notification=status_notification(leave, 'approved'))
     
-    cursor.close()
-    connection.close()
-    return jsonify({'error': 'Leave not found'}), 404
+    return jsonify({'success': True, 'message': 'Leave approved'})
 
-@app.route('/api/leaves/<leave_id>/reject', methods=['POST'])
+@main.route('/api/leaves/<leave_id>/reject', methods=['POST'])
 @login_required
 @manager_required
 def reject_leave(leave_id):
     data = request.json
     comment = data.get('comment', '')
     
-    connection = get_db_connection()
-    cursor = connection.cursor(dictionary=True)
+    with get_db() as (connection, cursor):
+        leave, error = decide_leave(cursor, leave_id, 'rejected', comment)
+        if error:
+            return error
+        analytics.record(cursor, analytics.decided(leave, 'rejected', leave_days(leave), leave['decided_at']))
+        occupancy.record(cursor, occupancy.decided(leave, 'rejected'))
+        connection.commit()
+    response_cache.bump(leave['department_id'])
     
-    cursor.execute("""
-        SELECT user_id FROM leaves WHERE id = %s
-    """, (leave_id,))
-    leave = cursor.fetchone()
+    # Notify the employee in real time and in their inbox
+    notifications.publish('leave_status_update', {
+        'leave_id': leave_id,
+        'status': 'rejected',
+        'comment': comment
+    }, room=str(leave['user_id']), notification=status_notification(leave, 'rejected'))
     
-    if leave:
-        cursor.execute("""
-            UPDATE leaves 
-            SET status = 'rejected', 
-                manager_comment = %s, 
-                approved_by = %s, 
-                approved_at = %s
-            WHERE id = %s
-        """, (comment, session['user_name'], datetime.now(), leave_id))
-        connection.commit()
-        cursor.close()
-        connection.close()
+    return jsonify({'success': True, 'message': 'Leave rejected'})
+
+@main.route('/api/leaves/bulk-decision', methods=['POST'])
+@login_required
+@manager_required
+def bulk_decision():
+    data = request.json or {}
+    decisions = data.get('decisions') or []
+    if not isinstance(decisions, list) or len(decisions) > MAX_BULK_DECISIONS:
+        return jsonify({'error': f'decisions must be a list of at most {MAX_BULK_DECISIONS} items'}), 400
+    
+    requested = {}
+    for item in decisions:
+        try:
+            leave_id = int(item['id'])
+            status = {'approve': 'approved', 'reject': 'rejected'}[item['decision']]
+        except (KeyError, TypeError, ValueError):
+            return jsonify({'error': 'Each decision needs an id and a decision of approve or reject'}), 400
+        requested[leave_id] = (status, item.get('comment', ''))
+    
+    if not requested:
+        return jsonify({'success': True, 'approved': [], 'rejected': [], 'failed': []})
+    
+    manager = current_identity()
+    now = datetime.now()
+    failed = []
+    
+    with get_db() as (connection, cursor):
+        # Lock every pending leave of the batch, then the balances of their owners
+        placeholders = ', '.join(['%s'] * len(requested))
+        cursor.execute(f"""
+            SELECT id, user_id, {USER_NAME_COLUMN}, leave_type, start_date, end_date, submitted_at 
+            FROM leaves 
+            WHERE id IN ({placeholders}) AND department_id = %s AND status = 'pending' 
+            ORDER BY submitted_at, id 
+            FOR UPDATE
+        """, list(requested) + [manager['department_id']])
+        leaves = cursor.fetchall()
+        for leave in leaves:
+            leave['department_id'] = manager['department_id']
+            leave['department'] = manager['department']
         
-        # Emit real-time notification to employee
-        socketio.emit('leave_status_update', {
-            'leave_id': leave_id,
-            'status': 'rejected',
-            'comment': comment
-        }, room=str(leave['user_id']))
+        found = {leave['id'] for leave in leaves}
+        failed.extend({'id': leave_id, 'error': 'Leave not found or not pending'}
+                      for leave_id in requested if leave_id not in found)
+        
+        owner_balances = {}
+        user_ids = sorted({leave['user_id'] for leave in leaves if requested[leave['id']][0] == 'approved'})
+        if user_ids:
+            cursor.execute(f"""
+                SELECT id, vacation_balance, sick_balance 
+                FROM users 
+                WHERE id IN ({', '.join(['%s'] * len(user_ids))}) 
+                FOR UPDATE
+            """, user_ids)
+            owner_balances = {user['id']: user for user in cursor.fetchall()}
+        
+        # Approve each user's leaves in submission order while the balance covers them
+        decided = []
+        deductions = {column: {} for column in BALANCE_COLUMNS.values()}
+        ledger = []
+        for leave in leaves:
+            status, comment = requested[leave['id']]
+            column = BALANCE_COLUMNS.get(leave['leave_type'])
+            if status == 'approved' and column:
+                days = leave_days(leave)
+                remaining = owner_balances[leave['user_id']][column] - deductions[column].get(leave['user_id'], 0)
+                if remaining < days:
+                    failed.append({'id': leave['id'], 'error': f"Insufficient {leave['leave_type']} balance"})
+                    continue
+                deductions[column][leave['user_id']] = deductions[column].get(leave['user_id'], 0) + days
+                ledger.append(balances.deduction(leave['user_id'], leave['leave_type'], days, leave['id'], now))
+            decided.append(leave)
+        
+        # One UPDATE per distinct (status, comment) pair. The same guards as
+        # single decisions: if another decision got in first, nothing is applied.
+        groups = {}
+        for leave in decided:
+            groups.setdefault(requested[leave['id']], []).append(leave['id'])
+        for (status, comment), ids in groups.items():
+            cursor.execute(f"""
+                UPDATE leaves 
+                SET status = %s, manager_comment = %s, approved_by = %s, approved_at = %s 
+                WHERE id IN ({', '.join(['%s'] * len(ids))}) AND department_id = %s AND status = 'pending'
+            """, [status, comment, manager['name'], now] + ids + [manager['department_id']])
+            if cursor.rowcount != len(ids):
+                connection.rollback()
+                return jsonify({'success': False, 'message': 'Some leaves were decided concurrently, retry'}), 409
+        
+        # One UPDATE per balance column with the per-user totals, only where they are covered
+        for column, totals in deductions.items():
+            if not totals:
+                continue
+            cases = ' '.join(['WHEN %s THEN %s'] * len(totals))
+            params = [value for item in totals.items() for value in item]
+            cursor.execute(f"""
+                UPDATE users 
+                SET {column} = {column} - CASE id {cases} END 
+                WHERE id IN ({', '.join(['%s'] * len(totals))}) AND {column} >= CASE id {cases} END
+            """, params + list(totals) + params)
+            if cursor.rowcount != len(totals):
+                connection.rollback()
+                return jsonify({'success': False, 'message': 'Balances changed concurrently, retry'}), 409
+        balances.record(cursor, ledger)
         
-        return jsonify({'success': True, 'message': 'Leave rejected'})
+        analytics.record(cursor, [delta for leave in decided
+                                  for delta in analytics.decided(leave, requested[leave['id']][0],
+                                                                 leave_days(leave), now)])
+        occupancy.record(cursor, [delta for leave in decided
+                                 for delta in occupancy.decided(leave, requested[leave['id']][0])])
+        connection.commit()
+    if decided:
+        response_cache.bump(manager['department_id'])
+    
+    # One event per employee room, carrying all of that employee's updates
+    updates = {}
+    inbox_rows = {}
+    for leave in decided:
+        status, comment = requested[leave['id']]
+        updates.setdefault(str(leave['user_id']), []).append({
+            'leave_id': str(leave['id']),
+            'status': status,
+            'comment': comment
+        })
+        inbox_rows.setdefault(str(leave['user_id']), []).append(status_notification(leave, status))
+    for room, room_updates in updates.items():
+        notifications.publish('leave_status_updates', {'updates': room_updates}, room=room,
+                              notification=inbox_rows[room])
     
-    cursor.close()
-    connection.close()
-    return jsonify({'error': 'Leave not found'}), 404
+    return jsonify({
+        'success': True,
+        'approved': [leave['id'] for leave in decided if requested[leave['id']][0] == 'approved'],
+        'rejected': [leave['id'] for leave in decided if requested[leave['id']][0] == 'rejected'],
+        'failed': failed
+    })
 
-@app.route('/api/calendar/leaves')
+CALENDAR_SELECT = f"""
+    SELECT id, {USER_NAME_COLUMN}, leave_type, start_date, end_date 
+    FROM leaves 
+    WHERE status = 'approved' AND department_id = %s
+"""
+
+def load_calendar_window(department_id, start, end):
+    with get_db() as (connection, cursor):
+        cursor.execute(CALENDAR_SELECT + " AND end_date >= %s AND start_date <= %s",
+                       (department_id, start, end))
+        return cursor.fetchall()
+
+@main.route('/api/calendar/leaves')
 @login_required
+@department_versioned
 def get_calendar_leaves():
-    connection = get_db_connection()
-    cursor = connection.cursor(dictionary=True)
-    cursor.execute("SELECT department FROM users WHERE id = %s", (session['user_id'],))
-    user = cursor.fetchone()
-    user_department = user.get('department', 'General')
+    user = current_identity()
+    if not user:
+        return jsonify({'error': 'User not found'}), 404
+    user_department_id = user['department_id']
     
-    cursor.execute("""
-        SELECT id, user_name, leave_type, start_date, end_date 
-        FROM leaves 
-        WHERE status = 'approved' AND department = %s
-    """, (user_department,))
-    leaves = cursor.fetchall()
-    cursor.close()
-    connection.close()
+    # With a start/end window only overlapping leaves are returned, served from the calendar cache
+    if request.args.get('start') or request.args.get('end'):
+        try:
+            start = parse_date(request.args.get('start', '')[:10], 'start')
+            end = parse_date(request.args.get('end', '')[:10], 'end')
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        if end < start:
+            return jsonify({'error': 'end must not be before start'}), 400
+        version = response_cache.versions.get(user_department_id)
+        leaves = calendar_cache.cache.window(user_department_id, version, start, end, load_calendar_window)
+    else:
+        with get_db() as (connection, cursor):
+            cursor.execute(CALENDAR_SELECT, (user_department_id,))
+            leaves = cursor.fetchall()
     
     calendar_events = []
     for leave in leaves:
         calendar_events.append({
             'id': str(leave['id']),
             'title': f"{leave['user_name']} - {leave['leave_type'].title()}",
-            'start': leave['start_date'].strftime('%Y-%m-%d') if isinstance(leave['start_date'], datetime) else leave['start_date'],
-            'end': leave['end_date'].strftime('%Y-%m-%d') if isinstance(leave['end_date'], datetime) else leave['end_date'],
+            'start': leave['start_date'].strftime('%Y-%m-%d') if isinstance(leave['start_date'], date) else leave['start_date'],
+            'end': leave['end_date'].strftime('%Y-%m-%d') if isinstance(leave['end_date'], date) else leave['end_date'],
             'type': leave['leave_type']
         })
     
     return jsonify(calendar_events)
 
+@main.route('/api/coverage')
+@login_required
+@department_versioned
+def get_coverage():
+    user = current_identity()
+    if not user:
+        return jsonify({'error': 'User not found'}), 404
+    try:
+        start = parse_date(request.args.get('start', ''), 'start')
+        end = parse_date(request.args.get('end', ''), 'end')
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    if end < start:
+        return jsonify({'error': 'end must not be before start'}), 400
+    if (end - start).days >= occupancy.MAX_WINDOW_DAYS:
+        return jsonify({'error': f'The window may span at most {occupancy.MAX_WINDOW_DAYS} days'}), 400
+    
+    with get_db() as (connection, cursor):
+        booked = occupancy.window(cursor, user['department_id'], start, end)
+        headcount = occupancy.headcount(cursor, user['department_id'])
+    
+    # One entry per working day, including days nobody is away
+    days = []
+    for day in occupancy.working_days(user['department'], start, end):
+        approved, pending = booked.get(day, (0, 0))
+        days.append({'date': day.strftime('%Y-%m-%d'), 'approved': approved, 'pending': pending,
+                     'present': headcount - approved})
+    return json_response({
+        'department': user['department'],
+        'headcount': headcount,
+        'max_absent': occupancy.limit_for(user['department'], headcount),
+        'days': days
+    })
+
+@main.route('/api/analytics/summary')
+@login_required
+@manager_required
+@department_versioned
+def get_analytics_summary():
+    try:
+        year = int(request.args.get('year', date.today().year))
+    except ValueError:
+        return jsonify({'error': 'year must be an integer'}), 400
+    if not 2000 <= year <= 2100:
+        return jsonify({'error': 'year must be between 2000 and 2100'}), 400
+    
+    manager = current_identity()
+    with get_db() as (connection, cursor):
+        summary = analytics.report(cursor, manager['department_id'], year)
+    summary['department'] = manager['department']
+    return jsonify(summary)
+
+MAX_MARK_READ = 1000
+
+def notification_audience(user):
+    """Managers read their department's inbox; employees read their own."""
+    if user['role'] == 'manager':
+        return 'department_id = %s', user['department_id'], notifications.audience_key(department_id=user['department_id'])
+    return 'user_id = %s', user['id'], notifications.audience_key(user_id=user['id'])
+
+@main.route('/api/notifications')
+@login_required
+def get_notifications():
+    user = current_identity()
+    if not user:
+        return jsonify({'error': 'User not found'}), 404
+    clause, value, _ = notification_audience(user)
+    clauses, params = [clause], [value]
+    if request.args.get('unread') in ('1', 'true'):
+        clauses.append('is_read = FALSE')
+    
+    with get_db() as (connection, cursor):
+        try:
+            rows, next_cursor = keyset_page(cursor, """
+                SELECT id, type, message, leave_id, created_at, is_read 
+                FROM notifications
+            """, clauses, params, request.args, column='created_at')
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+    
+    response = jsonify([{
+        'id': str(row['id']),
+        'type': row['type'],
+        'message': row['message'],
+        'leave_id': str(row['leave_id']) if row['leave_id'] else None,
+        'created_at': row['created_at'].isoformat() if isinstance(row['created_at'], datetime) else row['created_at'],
+        'is_read': bool(row['is_read'])
+    } for row in rows])
+    if next_cursor:
+        response.headers['X-Next-Cursor'] = next_cursor
+    return response
+
+@main.route('/api/notifications/unread-count')
+@login_required
+def get_unread_count():
+    user = current_identity()
+    if not user:
+        return jsonify({'error': 'User not found'}), 404
+    _, _, audience = notification_audience(user)
+    
+    with get_db() as (connection, cursor):
+        return jsonify({'unread': notifications.unread_count(cursor, audience)})
+
+@main.route('/api/notifications/mark-read', methods=['POST'])
+@login_required
+def mark_notifications_read():
+    data = request.json or {}
+    user = current_identity()
+    if not user:
+        return jsonify({'error': 'User not found'}), 404
+    clause, value, audience = notification_audience(user)
+    
+    query = f"UPDATE notifications SET is_read = TRUE WHERE {clause} AND is_read = FALSE"
+    params = [value]
+    if not data.get('all'):
+        try:
+            ids = [int(notification_id) for notification_id in data.get('ids') or []]
+        except (TypeError, ValueError):
+            return jsonify({'error': 'ids must be a list of notification ids'}), 400
+        if not ids or len(ids) > MAX_MARK_READ:
+            return jsonify({'error': f'Pass all, or between 1 and {MAX_MARK_READ} ids'}), 400
+        query += f" AND id IN ({', '.join(['%s'] * len(ids))})"
+        params.extend(ids)
+    
+    with get_db() as (connection, cursor):
+        cursor.execute(query, params)
+        marked = cursor.rowcount
+        notifications.adjust_unread(cursor, {audience: -marked})
+        connection.commit()
+        unread = notifications.unread_count(cursor, audience)
+    
+    return jsonify({'success': True, 'marked': marked, 'unread': unread})
+
+@main.cli.command('purge-notifications')
+@click.option('--days', type=int, default=None, help='Delete notifications older than this many days')
+@click.option('--batch-size', type=int, default=1000, help='Rows deleted per transaction')
+def purge_notifications(days, batch_size):
+    """Delete old notifications in bounded batches."""
+    days = current_app.config['NOTIFICATION_RETENTION_DAYS'] if days is None else days
+    deleted = notifications.purge(datetime.now() - timedelta(days=days), batch_size)
+    print(f"Deleted {deleted} notifications older than {days} days")
+
+# Jobs rewrite data served by department_versioned views outside any request.
+# Bumping every department once they stop, even on failure, drops what was
+# cached before their commits; only workers sharing RESPONSE_VERSION_FILE see it.
+def bump_departments():
+    for department_id in departments.ids():
+        response_cache.bump(department_id)
+
+@main.cli.command('rebuild-analytics')
+@click.option('--chunk-size', type=int, default=5000, help='Leave rows read per chunk')
+def rebuild_analytics(chunk_size):
+    """Recompute the leave rollups from the leaves table."""
+    try:
+        with get_db() as (connection, cursor):
+            rows = analytics.rebuild(connection, chunk_size)
+    finally:
+        bump_departments()
+    print(f"Rebuilt {rows} rollup rows")
+
+@main.cli.command('rebuild-coverage')
+@click.option('--chunk-size', type=int, default=5000, help='Leave rows read per chunk')
+def rebuild_coverage(chunk_size):
+    """Recompute the per-day department occupancy from the leaves table."""
+    try:
+        with get_db() as (connection, cursor):
+            rows = occupancy.rebuild(connection, chunk_size)
+    finally:
+        bump_departments()
+    print(f"Rebuilt {rows} occupancy rows")
+
+@main.cli.command('accrue-balances')
+@click.argument('period')
+@click.option('--chunk-size', type=int, default=1000, help='Users updated per transaction')
+def accrue_balances(period, chunk_size):
+    """Grant the allowance of PERIOD (YYYY for a year, YYYY-MM for a month) to every user.
+
+    Safe to re-run: a period is granted once, and an interrupted run resumes.
+    """
+    try:
+        users = balances.accrue(period, chunk_size)
+    except ValueError as e:
+        raise click.BadParameter(str(e), param_hint='PERIOD')
+    finally:
+        # Balances feed the analytics burn-down
+        bump_departments()
+    print(f"Accrual {period}: processed {users} users")
+
+@main.cli.command('expire-balances')
+@click.argument('year', type=int)
+@click.option('--chunk-size', type=int, default=1000, help='Users updated per transaction')
+def expire_balances(year, chunk_size):
+    """Cap balances at their carry-over days at the end of YEAR. Safe to re-run."""
+    try:
+        users = balances.expire(year, chunk_size)
+    finally:
+        bump_departments()
+    print(f"Year-end {year}: processed {users} users")
+
+@main.cli.command('check-balances')
+def check_balances():
+    """List users whose balances differ from their ledger totals."""
+    with get_db() as (connection, cursor):
+        rows = balances.mismatches(cursor)
+    for row in rows:
+        print(f"User {row['id']}: vacation {row['vacation_balance']} (ledger {row['vacation_ledger']}), "
+              f"sick {row['sick_balance']} (ledger {row['sick_ledger']})")
+    print(f"{len(rows)} mismatched users" if rows else "All balances match the ledger")
+
 # Socket.IO events
 @socketio.on('connect')
 def handle_connect():
     if 'user_id' in session:
         join_room(session['user_id'])
         
-        connection = get_db_connection()
-        cursor = connection.cursor(dictionary=True)
-        cursor.execute("SELECT role, department FROM users WHERE id = %s", (session['user_id'],))
-        user = cursor.fetchone()
-        cursor.close()
-        connection.close()
-        
-        if user and user.get('role') == 'manager':
+        user = current_identity()
+        if user and user['role'] == 'manager':
             join_room('managers')
-            department = user.get('department', 'General')
-            join_room(f'managers_{department}')
+            join_room(f"managers_{user['department_id']}")
         
         emit('connected', {'message': 'Connected to real-time updates'})
 
@@ -525,4 +1196,9 @@ def handle_disconnect():
     pass
 
 if __name__ == '__main__':
-    socketio.run(app, debug=True, port=5000)
+    # One process serves everything, so it starts its worker resources itself
+    app = create_app({'PREFORK': False})
+    # FLASK_DEBUG=1 turns on the debugger and reloader (threading server only). Threading mode
+    # serves with Werkzeug; see Production Deployment in the README for production servers.
+    socketio.run(app, host=os.environ.get('HOST', '127.0.0.1'), port=int(os.environ.get('PORT', 5000)),
+                 debug=app.debug and ASYNC_MODE == 'threading', allow_unsafe_werkzeug=ASYNC_MODE == 'threading')
@@ -0,0 +1,182 @@
+from datetime import date, datetime
+
+import db
+from db import get_db
+
+# Balance column charged for each leave type ('other' leave is not deducted)
+BALANCE_COLUMNS = {'vacation': 'vacation_balance', 'sick': 'sick_balance'}
+
+INSERT_ENTRY = """
+    INSERT INTO balance_ledger (user_id, leave_type, entry_type, days, leave_id, run_id, created_at)
+    VALUES (%s, %s, %s, %s, %s, %s, %s)
+"""
+
+# Days granted per year and days kept at the year end, per leave type
+annual_days = {'vacation': 20, 'sick': 10}
+carry_over_days = {'vacation': 5, 'sick': 0}
+
+
+def init_app(app):
+    annual_days.update(vacation=app.config.get('VACATION_DAYS_PER_YEAR', 20),
+                       sick=app.config.get('SICK_DAYS_PER_YEAR', 10))
+    carry_over_days.update(vacation=app.config.get('VACATION_CARRY_OVER_DAYS', 5),
+                           sick=app.config.get('SICK_CARRY_OVER_DAYS', 0))
+
+
+# Ledger entries are (user_id, leave_type, entry_type, days, leave_id, run_id,
+# created_at) with days signed. Every entry is written in the transaction that
+# changes the matching users column, so the column is always the ledger total.
+
+def grant(user_id, leave_type, days, at, run_id=None):
+    return (user_id, leave_type, 'grant', days, None, run_id, at)
+
+
+def deduction(user_id, leave_type, days, leave_id, at):
+    return (user_id, leave_type, 'deduction', -days, leave_id, None, at)
+
+
+def record(cursor, entries):
+    if entries:
+        cursor.executemany(INSERT_ENTRY, entries)
+
+
+def record_opening(cursor, at):
+    """Open the ledger of users without entries at their current balances."""
+    for leave_type, column in BALANCE_COLUMNS.items():
+        cursor.execute(f"""
+            INSERT INTO balance_ledger (user_id, leave_type, entry_type, days, created_at)
+            SELECT id, %s, 'opening', {column}, %s
+            FROM users
+            WHERE {column} <> 0 AND NOT EXISTS (
+                SELECT 1 FROM balance_ledger
+                WHERE balance_ledger.user_id = users.id AND balance_ledger.leave_type = %s
+            )
+        """, (leave_type, at, leave_type))
+
+
+def allowance(period):
+    """First day of ``period`` and the days granted for it, per leave type.
+
+    ``period`` is 'YYYY' for a whole year or 'YYYY-MM' for one month. Monthly
+    grants spread the annual days so that twelve months add up to exactly
+    one year's worth.
+    """
+    try:
+        year, _, month = period.partition('-')
+        start = date(int(year), int(month or 1), 1)
+    except ValueError:
+        raise ValueError('period must be YYYY or YYYY-MM')
+    if not month:
+        return start, dict(annual_days)
+    return start, {leave_type: days * start.month // 12 - days * (start.month - 1) // 12
+                   for leave_type, days in annual_days.items()}
+
+
+def run_batch(run_id, apply_chunk, chunk_size=1000):
+    """Run ``apply_chunk(cursor, users, now)`` over all users in id order, one transaction per chunk.
+
+    ``users`` are locked dict rows with id, the balance columns and
+    created_at. Progress is committed with each chunk under ``run_id``, so
+    running the same id again resumes after the last committed chunk and a
+    completed run does nothing. Returns the number of users processed.
+    """
+    processed = 0
+    while True:
+        with get_db() as (connection, cursor):
+            # Locking the run row first makes two runners of the same id take turns
+            cursor.execute("SELECT last_user_id, completed_at FROM balance_runs WHERE run_id = %s FOR UPDATE",
+                           (run_id,))
+            run = cursor.fetchone()
+            if run is None:
+                try:
+                    cursor.execute("INSERT INTO balance_runs (run_id, started_at) VALUES (%s, %s)",
+                                   (run_id, datetime.now()))
+                except db.IntegrityError:
+                    continue
+                run = {'last_user_id': 0, 'completed_at': None}
+            if run['completed_at']:
+                return processed
+
+            cursor.execute("""
+                SELECT id, vacation_balance, sick_balance, created_at
+                FROM users
+                WHERE id > %s
+                ORDER BY id
+                LIMIT %s
+                FOR UPDATE
+            """, (run['last_user_id'], chunk_size))
+            users = cursor.fetchall()
+            now = datetime.now()
+            if users:
+                apply_chunk(cursor, users, now)
+                cursor.execute("UPDATE balance_runs SET last_user_id = %s, users = users + %s WHERE run_id = %s",
+                               (users[-1]['id'], len(users), run_id))
+            if len(users) < chunk_size:
+                cursor.execute("UPDATE balance_runs SET completed_at = %s WHERE run_id = %s", (now, run_id))
+            connection.commit()
+        processed += len(users)
+        if len(users) < chunk_size:
+            return processed
+
+
+def accrue(period, chunk_size=1000):
+    """Grant every user the allowance of ``period`` (see allowance()).
+
+    Users created on or after the period's first day are skipped; their
+    registration grant covers it. The run id is 'accrual:<period>'.
+    """
+    start, days = allowance(period)
+    start = datetime.combine(start, datetime.min.time())
+    run_id = f'accrual:{period}'
+
+    def apply_chunk(cursor, users, now):
+        eligible = [user['id'] for user in users if user['created_at'] < start]
+        record(cursor, [grant(user_id, leave_type, amount, now, run_id)
+                        for user_id in eligible for leave_type, amount in days.items() if amount])
+        cursor.execute("""
+            UPDATE users
+            SET vacation_balance = vacation_balance + %s, sick_balance = sick_balance + %s
+            WHERE id >= %s AND id <= %s AND created_at < %s
+        """, (days['vacation'], days['sick'], users[0]['id'], users[-1]['id'], start))
+
+    return run_batch(run_id, apply_chunk, chunk_size)
+
+
+def expire(year, chunk_size=1000):
+    """Cap every balance at its carry-over at the end of ``year``. The run id is 'expiry:<year>'."""
+    run_id = f'expiry:{year}'
+    caps = dict(carry_over_days)
+
+    def apply_chunk(cursor, users, now):
+        entries = []
+        for user in users:
+            for leave_type, column in BALANCE_COLUMNS.items():
+                excess = user[column] - caps[leave_type]
+                if excess > 0:
+                    entries.append((user['id'], leave_type, 'expiry', -excess, None, run_id, now))
+        record(cursor, entries)
+        cursor.execute("""
+            UPDATE users
+            SET vacation_balance = CASE WHEN vacation_balance > %s THEN %s ELSE vacation_balance END,
+                sick_balance = CASE WHEN sick_balance > %s THEN %s ELSE sick_balance END
+            WHERE id >= %s AND id <= %s
+        """, (caps['vacation'], caps['vacation'], caps['sick'], caps['sick'], users[0]['id'], users[-1]['id']))
+
+    return run_batch(run_id, apply_chunk, chunk_size)
+
+
+def mismatches(cursor, limit=100):
+    """Users whose balance columns differ from their ledger totals."""
+    cursor.execute("""
+        SELECT users.id, users.vacation_balance, users.sick_balance,
+               COALESCE(SUM(CASE WHEN balance_ledger.leave_type = 'vacation' THEN balance_ledger.days END), 0)
+                   AS vacation_ledger,
+               COALESCE(SUM(CASE WHEN balance_ledger.leave_type = 'sick' THEN balance_ledger.days END), 0)
+                   AS sick_ledger
+        FROM users
+        LEFT JOIN balance_ledger ON balance_ledger.user_id = users.id
+        GROUP BY users.id, users.vacation_balance, users.sick_balance
+        HAVING users.vacation_balance <> vacation_ledger OR users.sick_balance <> sick_ledger
+        LIMIT %s
+    """, (limit,))
+    return cursor.fetchall()
@@ -0,0 +1,101 @@
+"""Compare two benchmark result files and report regressions.
+
+    python benchmarks/compare.py baseline.json current.json [--tolerance 0.25]
+
+Exits with status 1 when any metric regressed.
+"""
+import argparse
+import json
+import sys
+
+# Statements per request are deterministic; anything beyond this is a new query
+QUERY_SLACK = 0.5
+
+
+def metrics(result):
+    """(name, value, higher is better) of one scenario's comparable numbers."""
+    found = []
+    if result.get('latency_ms'):
+        found.append(('p95_ms', result['latency_ms']['p95'], False))
+        found.append(('throughput_rps', result['throughput_rps'], True))
+        found.append(('errors', result['errors'], False))
+    if result.get('queries_per_request'):
+        found.append(('queries_per_request', result['queries_per_request']['mean'], False))
+    if (result.get('deliveries') or {}).get('p95_ms') is not None:
+        found.append(('delivery_p95_ms', result['deliveries']['p95_ms'], False))
+    if (result.get('deliveries') or {}).get('delivery_rate') is not None:
+        found.append(('delivery_rate', result['deliveries']['delivery_rate'], True))
+    for fmt in ('ndjson', 'csv'):
+        if fmt in result:
+            found.append((f'{fmt}_rows_per_s', result[fmt]['rows_per_s'], True))
+            found.append((f'{fmt}_rss_growth_mb', result[fmt]['rss_growth_mb'], False))
+    for mode in ('cold', 'forked'):
+        if mode in result:
+            found.append((f'{mode}_start_ms', result[mode]['median_ms'], False))
+    for mode in ('threading', 'eventlet'):
+        if (result.get(mode) or {}).get('connections'):
+            found.append((f'{mode}_connections', result[mode]['connections'], True))
+            found.append((f'{mode}_threads_per_conn', result[mode]['threads_per_connection'], False))
+            found.append((f'{mode}_kb_per_conn', result[mode]['rss_kb_per_connection'], False))
+    if 'row_schema' in result:
+        found.append(('row_schema_s', result['row_schema']['best_s'], False))
+    for users, level in sorted((result.get('levels') or {}).items(), key=lambda item: int(item[0])):
+        found.extend((f'{name}@{users}', value, higher_is_better) for name, value, higher_is_better in metrics(level)
+                     if name != 'queries_per_request')
+    return found
+
+
+def regressed(name, before, after, higher_is_better, tolerance):
+    if before is None or after is None:
+        return False
+    if name == 'queries_per_request':
+        return after > before + QUERY_SLACK
+    if name.split('@')[0] == 'errors':
+        return after > before
+    if name == 'delivery_rate':
+        # Every event should reach every connection
+        return after < before
+    if higher_is_better:
+        return after < before * (1 - tolerance)
+    return after > before * (1 + tolerance)
+
+
+def compare(baseline, current, tolerance=0.25):
+    """Print a comparison table; return the list of (scenario, metric) that regressed."""
+    regressions = []
+    for key in ('target', 'async_mode', 'backend', 'data', 'concurrency', 'requests', 'cpus', 'server_cpus'):
+        if baseline['meta'].get(key) != current['meta'].get(key):
+            print(f"Note: {key} differs ({baseline['meta'].get(key)} vs {current['meta'].get(key)})")
+    print(f"{'scenario':<22}{'metric':<24}{'baseline':>14}{'current':>14}{'change':>10}")
+    for scenario, result in current['scenarios'].items():
+        before = dict((name, value) for name, value, _ in metrics(baseline['scenarios'].get(scenario, {})))
+        for name, value, higher_is_better in metrics(result):
+            if name not in before:
+                continue
+            change = f'{(value - before[name]) / before[name] * 100:+.1f}%' if before[name] else ''
+            flag = regressed(name, before[name], value, higher_is_better, tolerance)
+            if flag:
+                regressions.append((scenario, name))
+            print(f"{scenario:<22}{name:<24}{before[name]:>14}{value:>14}{change:>10}{'  REGRESSED' if flag else ''}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare two benchmark result files.')
+    parser.add_argument('baseline')
+    parser.add_argument('current')
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help='Allowed relative slowdown of latency, throughput and export numbers')
+    args = parser.parse_args()
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.current) as f:
+        current = json.load(f)
+    regressions = compare(baseline, current, args.tolerance)
+    if regressions:
+        print(f"\n{len(regressions)} regression(s)")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
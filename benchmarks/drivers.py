@@ -0,0 +1,292 @@
+"""Targets the benchmark scenarios drive: the app in-process or a real server."""
+import http.client
+import collections
+import json
+import os
+import re
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+import simple_websocket
+from wsproto.utilities import LocalProtocolError
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SERVER_TIMING_QUERIES = re.compile(r'desc="(\d+) queries"')
+
+
+def rss_of(pid='self'):
+    """Resident set size of a process in bytes (Linux)."""
+    with open(f'/proc/{pid}/statm') as f:
+        return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+
+
+def threads_of(pid='self'):
+    """OS threads of a process (Linux)."""
+    with open(f'/proc/{pid}/status') as f:
+        for line in f:
+            if line.startswith('Threads:'):
+                return int(line.split()[1])
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def queries_from(headers):
+    """SQL statements the request issued, from the Server-Timing header (METRICS_ENABLED=1)."""
+    match = SERVER_TIMING_QUERIES.search(headers.get('Server-Timing', ''))
+    return int(match.group(1)) if match else None
+
+
+class TestClientSession:
+    def __init__(self, app):
+        self.client = app.test_client()
+
+    def request(self, method, path, json_body=None, headers=None):
+        response = self.client.open(path, method=method, json=json_body, headers=headers or {})
+        body = response.get_json(silent=True)
+        return response.status_code, body, response.headers
+
+    def stream(self, path, headers=None):
+        response = self.client.get(path, buffered=False, headers=headers or {})
+        try:
+            yield from response.response
+        finally:
+            response.close()
+
+
+class TestClientTarget:
+    """Runs the app in this process and drives it through Flask's test client.
+
+    The environment is applied before ``app.app`` is first used, since that
+    builds the app from the environment.
+    """
+    name = 'test-client'
+
+    def __init__(self, env):
+        os.environ.update(env)
+        sys.path.insert(0, ROOT)
+        import app as app_module
+        self.module = app_module
+        self.app = app_module.app
+
+    def session(self):
+        return TestClientSession(self.app)
+
+    def socketio_client(self, session):
+        """Socket.IO client sharing the session's login cookie, or None if unsupported."""
+        client = self.module.socketio.test_client(self.app, flask_test_client=session.client)
+        server = self.module.socketio.server
+        if not getattr(server, 'benchmark_forwarding', False):
+            # python-socketio >= 5.10 sends room emits as pre-encoded engine.io
+            # packets, which Flask-SocketIO 5.3.5's test client doesn't see
+            from socketio import packet
+            server._send_eio_packet = lambda eio_sid, eio_pkt: server._send_packet(
+                eio_sid, packet.Packet(encoded_packet=eio_pkt.data))
+            server.benchmark_forwarding = True
+        return TestClientSocket(client)
+
+    def rss(self):
+        return rss_of()
+
+    def close(self):
+        pipeline = self.app.extensions.get('notification_pipeline')
+        if pipeline:
+            pipeline.stop()
+
+
+class TestClientSocket:
+    def __init__(self, client):
+        self.client = client
+
+    def received(self):
+        return [(message['name'], message['args'][0] if message['args'] else None)
+                for message in self.client.get_received()]
+
+    def close(self):
+        self.client.disconnect()
+
+
+class HttpSession:
+    """Keep-alive HTTP/1.1 connection with a cookie jar of one session."""
+
+    def __init__(self, host, port):
+        self.host = host
+        self.port = port
+        self.cookies = {}
+        self.connection = http.client.HTTPConnection(host, port, timeout=30)
+
+    def request(self, method, path, json_body=None, headers=None):
+        headers = dict(headers or {})
+        body = None
+        if json_body is not None:
+            body = json.dumps(json_body)
+            headers['Content-Type'] = 'application/json'
+        if self.cookies:
+            headers['Cookie'] = '; '.join(f'{name}={value}' for name, value in self.cookies.items())
+        for retry in (False, True):
+            try:
+                self.connection.request(method, path, body=body, headers=headers)
+                response = self.connection.getresponse()
+                data = response.read()
+                break
+            except (http.client.HTTPException, ConnectionError):
+                # The server closed the keep-alive connection; reconnect once
+                self.connection.close()
+                self.connection = http.client.HTTPConnection(self.host, self.port, timeout=30)
+                if retry:
+                    raise
+        for header, value in response.getheaders():
+            if header.lower() == 'set-cookie':
+                name, _, rest = value.partition('=')
+                self.cookies[name] = rest.split(';', 1)[0]
+        try:
+            parsed = json.loads(data) if data else None
+        except ValueError:
+            parsed = None
+        return response.status, parsed, response.msg
+
+    def stream(self, path, headers=None, chunk_size=65536):
+        headers = dict(headers or {})
+        headers['Cookie'] = '; '.join(f'{name}={value}' for name, value in self.cookies.items())
+        connection = http.client.HTTPConnection(self.host, self.port, timeout=60)
+        try:
+            connection.request('GET', path, headers=headers)
+            response = connection.getresponse()
+            while True:
+                chunk = response.read(chunk_size)
+                if not chunk:
+                    return
+                yield chunk
+        finally:
+            connection.close()
+
+
+class ServerTarget:
+    """Starts ``python app.py`` as a subprocess and drives it over HTTP.
+
+    ``cpus`` pins the server to a set of CPU numbers, so scaling with cores
+    can be measured on one machine.
+    """
+    name = 'server'
+
+    def __init__(self, env, host='127.0.0.1', port=5055, startup_timeout=30, cpus=None):
+        self.env = env
+        self.host = host
+        self.port = port
+        self.cpus = cpus
+        self.process = subprocess.Popen(
+            [sys.executable, 'app.py'], cwd=ROOT,
+            env=dict(os.environ, **env, HOST=host, PORT=str(port)),
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+            # Hash workers forked by the server inherit the CPU set
+            preexec_fn=(lambda: os.sched_setaffinity(0, cpus)) if cpus else None
+        )
+        deadline = time.monotonic() + startup_timeout
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError(f'app.py exited with code {self.process.returncode}')
+            try:
+                socket.create_connection((host, port), timeout=1).close()
+                return
+            except OSError:
+                time.sleep(0.2)
+        self.close()
+        raise RuntimeError(f'app.py did not start listening on {host}:{port}')
+
+    def session(self):
+        return HttpSession(self.host, self.port)
+
+    def socketio_client(self, session):
+        return ServerSocket(self, session)
+
+    def rss(self):
+        return rss_of(self.process.pid)
+
+    def threads(self):
+        return threads_of(self.process.pid)
+
+    def close(self):
+        if self.process.poll() is None:
+            self.process.terminate()
+            try:
+                self.process.wait(10)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+
+
+class WebSocket(simple_websocket.Client):
+    # A server at capacity may accept the TCP connection and never answer the upgrade
+    handshake_timeout = 10
+
+    def handshake(self):
+        self.sock.settimeout(self.handshake_timeout)
+        super().handshake()
+        self.sock.settimeout(None)
+        # simple-websocket 1.1 only takes the accept from the handshake's reads; a
+        # message that arrived with it would wait for the next read
+        self._handle_events()
+
+
+class ServerSocket:
+    """Socket.IO connection over a raw engine.io websocket, with a reader thread.
+
+    Speaks just enough of the protocol for the benchmarks: connect to the
+    default namespace, answer pings and collect events.
+    """
+
+    def __init__(self, target, session, timeout=10):
+        self.messages = collections.deque()
+        cookie = '; '.join(f'{name}={value}' for name, value in session.cookies.items())
+        self.ws = WebSocket.connect(
+            f'ws://{target.host}:{target.port}/socket.io/?EIO=4&transport=websocket',
+            headers={'Cookie': cookie})
+        try:
+            message = self.ws.receive(timeout=timeout)
+            if not (message or '').startswith('0'):
+                raise ConnectionError(f'no engine.io handshake: {message!r}')
+            self.ws.send('40')
+            while True:
+                # The connect handler may emit before the server acknowledges the connection
+                message = self.ws.receive(timeout=timeout) or ''
+                if message.startswith('40'):
+                    break
+                if not message.startswith('42'):
+                    raise ConnectionError(f'Socket.IO connection refused: {message!r}')
+                self.queue(message)
+        except BaseException:
+            self.ws.close()
+            raise
+        self.reader = threading.Thread(target=self.read, daemon=True)
+        self.reader.start()
+
+    def read(self):
+        try:
+            while True:
+                message = self.ws.receive()
+                if message == '2':
+                    self.ws.send('3')
+                elif isinstance(message, str) and message.startswith('42'):
+                    self.queue(message)
+        except (simple_websocket.ConnectionClosed, LocalProtocolError, OSError):
+            # Closed by either side, possibly while answering a ping
+            pass
+
+    def queue(self, message):
+        event, *args = json.loads(message[2:])
+        self.messages.append((event, args[0] if args else None))
+
+    def received(self):
+        messages = []
+        while self.messages:
+            messages.append(self.messages.popleft())
+        return messages
+
+    def close(self):
+        self.ws.close()
@@ -0,0 +1,231 @@
+"""Seed a database, drive the app through the benchmark scenarios and write JSON results.
+
+    python benchmarks/run.py --size small --output results.json
+    python benchmarks/run.py --target server --scenarios login_storm,dashboard
+    python benchmarks/run.py --output current.json --compare baseline.json
+
+Generated databases are kept in --workdir and reused while the size, seed,
+anchor, schema and seeding code are unchanged; every run starts from a fresh
+copy, so runs against the same arguments see the same data.
+"""
+import argparse
+import hashlib
+import json
+import os
+import platform
+import secrets
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, datetime
+
+from drivers import ROOT, ServerTarget, TestClientTarget, free_port
+
+sys.path.insert(0, ROOT)
+
+import scenarios
+from compare import compare
+
+# departments, employees per department, years of history
+SIZES = {
+    'small': (3, 40, 2),
+    'medium': (10, 200, 3),
+    'large': (10, 1000, 3)
+}
+
+
+def seed_env(args, path):
+    env = {'DB_BACKEND': args.backend}
+    if args.backend == 'sqlite':
+        env['SQLITE_PATH'] = path
+    return env
+
+
+def seed(args, path):
+    command = [sys.executable, 'seed_db.py', 'generate',
+               '--departments', str(args.departments), '--employees', str(args.employees),
+               '--years', str(args.years), '--seed', str(args.seed), '--anchor', args.anchor.isoformat(),
+               '--password', args.password]
+    subprocess.run(command, cwd=ROOT, env=dict(os.environ, **seed_env(args, path)), check=True)
+
+
+def prepare_database(args):
+    """Path of a freshly seeded SQLite copy for this run (None for MySQL, seeded in place)."""
+    if args.backend == 'mysql':
+        print("Seeding the configured MySQL database (existing data is cleared)")
+        seed(args, None)
+        return None
+
+    # Templates are keyed by everything that changes their contents
+    digest = hashlib.sha1()
+    for name in ('seed_db.py', 'scripts/create_tables_sqlite.sql'):
+        with open(os.path.join(ROOT, name), 'rb') as f:
+            digest.update(f.read())
+    os.makedirs(args.workdir, exist_ok=True)
+    template = os.path.join(args.workdir, f'seed-d{args.departments}-e{args.employees}-y{args.years}'
+                                          f'-s{args.seed}-{args.anchor}-{digest.hexdigest()[:10]}.db')
+    if args.reseed or not os.path.exists(template):
+        partial = template + '.partial'
+        if os.path.exists(partial):
+            os.remove(partial)
+        seed(args, partial)
+        os.replace(partial, template)
+
+    path = os.path.join(args.workdir, 'run.db')
+    for suffix in ('', '-wal', '-shm'):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+    shutil.copyfile(template, path)
+    return path
+
+
+def git_revision():
+    try:
+        revision = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT,
+                                  capture_output=True, text=True, check=True).stdout.strip()
+        dirty = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=ROOT,
+                               capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return revision + ('-dirty' if dirty else '')
+
+
+def print_table(results):
+    print(f"\n{'scenario':<22}{'requests':>9}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}"
+          f"{'queries':>9}{'errors':>8}")
+    rows = []
+    for name, result in results.items():
+        if 'levels' in result:
+            rows.extend((f'{name}@{users}', level) for users, level in
+                        sorted(result['levels'].items(), key=lambda item: int(item[0])))
+        else:
+            rows.append((name, result))
+    for name, result in rows:
+        if 'skipped' in result:
+            print(f"{name:<22}skipped: {result['skipped']}")
+        elif result.get('latency_ms'):
+            latency = result['latency_ms']
+            queries = result['queries_per_request']['mean'] if result['queries_per_request'] else '-'
+            print(f"{name:<22}{result['requests']:>9}{result['throughput_rps']:>10}{latency['p50']:>10}"
+                  f"{latency['p95']:>10}{latency['p99']:>10}{queries:>9}{result['errors']:>8}")
+        else:
+            print(f"{name:<22}{json.dumps(result, sort_keys=True)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='End-to-end benchmarks of the leave management API.')
+    parser.add_argument('--size', choices=SIZES, default='small', help='Seeded data set preset')
+    parser.add_argument('--departments', type=int, help='Override the preset department count')
+    parser.add_argument('--employees', type=int, help='Override the preset employees per department')
+    parser.add_argument('--years', type=int, help='Override the preset years of leave history')
+    parser.add_argument('--seed', type=int, default=42, help='Seed of the data set and of every scenario')
+    parser.add_argument('--anchor', type=date.fromisoformat, default=date(2026, 3, 2),
+                        help='Date the seeded history is generated around (YYYY-MM-DD)')
+    parser.add_argument('--password', default='employee123', help='Password of the seeded accounts')
+    parser.add_argument('--backend', choices=('sqlite', 'mysql'), default='sqlite',
+                        help='sqlite seeds a file in --workdir; mysql clears and seeds the DB_* database')
+    parser.add_argument('--workdir', default=os.path.join(tempfile.gettempdir(), 'leave-benchmarks'),
+                        help='Directory for seeded SQLite databases')
+    parser.add_argument('--reseed', action='store_true', help='Regenerate the seeded database')
+    parser.add_argument('--target', choices=('test-client', 'server'), default='test-client',
+                        help='Drive the app in-process or as `python app.py` over HTTP')
+    parser.add_argument('--async-mode', choices=('eventlet', 'gevent'), default='eventlet',
+                        help='ASYNC_MODE of the server target')
+    parser.add_argument('--server-cpus', type=int, metavar='N',
+                        help='Pin the server target to its first N available CPUs')
+    parser.add_argument('--concurrency', type=int, default=8, help='Concurrent users per scenario')
+    parser.add_argument('--requests', type=int, default=20, help='Iterations per user per scenario')
+    parser.add_argument('--scenarios', default=','.join(scenarios.SCENARIOS),
+                        help='Comma-separated scenarios, run in the listed order')
+    parser.add_argument('--env', action='append', default=[], metavar='KEY=VALUE',
+                        help='App configuration for the run, e.g. RESPONSE_CACHE_BYTES=33554432')
+    parser.add_argument('--output', help='Write the results as JSON to this file')
+    parser.add_argument('--compare', metavar='BASELINE', help='Compare against a results file; exit 1 on regression')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='Allowed relative slowdown for --compare')
+    args = parser.parse_args()
+
+    defaults = SIZES[args.size]
+    args.departments = args.departments or defaults[0]
+    args.employees = args.employees or defaults[1]
+    args.years = args.years or defaults[2]
+    available = sorted(os.sched_getaffinity(0))
+    if args.server_cpus is not None:
+        if args.target != 'server':
+            parser.error('--server-cpus needs --target server')
+        if not 1 <= args.server_cpus <= len(available):
+            parser.error(f'--server-cpus must be between 1 and {len(available)}')
+    names = [name.strip() for name in args.scenarios.split(',') if name.strip()]
+    unknown = [name for name in names if name not in scenarios.SCENARIOS]
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(unknown)}")
+
+    path = prepare_database(args)
+    env = dict(seed_env(args, path), METRICS_ENABLED='1', METRICS_TOKEN=secrets.token_hex(16), SLOW_QUERY_MS='60000')
+    for item in args.env:
+        key, _, value = item.partition('=')
+        env[key] = value
+    # The app reads its configuration from the environment; storage reads the same database
+    os.environ.update(env)
+
+    if args.target == 'server':
+        target = ServerTarget(dict(env, ASYNC_MODE=args.async_mode), port=free_port(),
+                              cpus=available[:args.server_cpus] if args.server_cpus else None)
+    else:
+        target = TestClientTarget(dict(env, ASYNC_MODE='threading'))
+    population = scenarios.Population(args.departments, args.employees, args.anchor, args.password)
+    bench = scenarios.Bench(target, population, args.concurrency, args.requests, args.seed)
+
+    results = {}
+    try:
+        for name in names:
+            if name in scenarios.IN_PROCESS and args.target != 'test-client':
+                results[name] = {'skipped': 'runs in-process; use --target test-client'}
+                continue
+            if name in scenarios.SERVER_ONLY and args.target != 'server':
+                results[name] = {'skipped': 'starts app.py servers; use --target server'}
+                continue
+            print(f"Running {name}...", flush=True)
+            started = time.perf_counter()
+            results[name] = scenarios.SCENARIOS[name](bench)
+            print(f"  done in {time.perf_counter() - started:.1f}s", flush=True)
+    finally:
+        target.close()
+
+    print_table(results)
+    report = {
+        'meta': {
+            'revision': git_revision(),
+            'created_at': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpus': os.cpu_count(),
+            'server_cpus': args.server_cpus,
+            'target': args.target,
+            'async_mode': args.async_mode if args.target == 'server' else 'threading',
+            'backend': args.backend,
+            'data': {'departments': args.departments, 'employees': args.employees, 'years': args.years,
+                     'seed': args.seed, 'anchor': args.anchor.isoformat()},
+            'concurrency': args.concurrency,
+            'requests': args.requests,
+            'env': {key: value for key, value in env.items() if key not in ('SQLITE_PATH', 'METRICS_TOKEN')}
+        },
+        'scenarios': results
+    }
+    if args.output:
+        scenarios.dump(report, args.output)
+        print(f"\nResults written to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        print()
+        regressions = compare(baseline, report, args.tolerance)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s)")
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,836 @@
+"""Benchmark scenarios. Each takes a Bench and returns a result dict."""
+import json
+import os
+import random
+import resource
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import date, datetime, timedelta
+
+from drivers import ROOT, ServerTarget, free_port, queries_from
+
+PENDING_PAGE = 20
+BULK_SIZE = 50
+# Concurrency of each capacity level, as multiples of --concurrency
+CAPACITY_LEVELS = (1, 2, 4, 8)
+# Open idle Socket.IO connections at each connection_capacity step
+CONNECTION_STEPS = (100, 250, 500, 1000, 2000)
+
+
+def percentile(ordered, fraction):
+    if not ordered:
+        return None
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def summarize(samples, elapsed, **extra):
+    """Throughput, latency percentiles, statuses and SQL statements per request."""
+    latencies = sorted(sample[1] for sample in samples)
+    queries = [sample[3] for sample in samples if sample[3] is not None]
+    statuses = {}
+    for sample in samples:
+        statuses[str(sample[2])] = statuses.get(str(sample[2]), 0) + 1
+    endpoints = {}
+    for sample in samples:
+        endpoints.setdefault(sample[0], []).append(sample[1])
+
+    def latency(values):
+        return {
+            'p50': round(percentile(values, 0.50) * 1000, 3),
+            'p95': round(percentile(values, 0.95) * 1000, 3),
+            'p99': round(percentile(values, 0.99) * 1000, 3),
+            'mean': round(sum(values) / len(values) * 1000, 3),
+            'max': round(values[-1] * 1000, 3)
+        } if values else None
+
+    result = {
+        'requests': len(samples),
+        'errors': sum(1 for sample in samples if sample[2] == 'error' or sample[2] >= 500),
+        'statuses': statuses,
+        'elapsed_s': round(elapsed, 3),
+        'throughput_rps': round(len(samples) / elapsed, 2) if elapsed else None,
+        'latency_ms': latency(latencies),
+        'queries_per_request': {
+            'mean': round(sum(queries) / len(queries), 2),
+            'max': max(queries)
+        } if queries else None,
+        'endpoints': {
+            name: dict(count=len(values), **latency(sorted(values)))
+            for name, values in sorted(endpoints.items())
+        }
+    }
+    result.update(extra)
+    return result
+
+
+class Client:
+    """A session that records (endpoint, seconds, status, statements) per request."""
+
+    def __init__(self, session, samples):
+        self.session = session
+        self.samples = samples
+
+    def call(self, label, method, path, json_body=None, headers=None):
+        started = time.perf_counter()
+        try:
+            status, body, response_headers = self.session.request(method, path, json_body, headers)
+        except Exception as e:
+            self.samples.append((label, time.perf_counter() - started, 'error', None))
+            print(f"{label}: {e}")
+            return None, None, {}
+        self.samples.append((label, time.perf_counter() - started, status, queries_from(response_headers)))
+        return status, body, response_headers
+
+
+class Bench:
+    """Target, seeded population and run options shared by the scenarios."""
+
+    def __init__(self, target, population, concurrency, requests, seed):
+        self.target = target
+        self.population = population
+        self.concurrency = concurrency
+        self.requests = requests
+        self.seed = seed
+
+    def login(self, email, target=None):
+        session = (target or self.target).session()
+        status, body, _ = session.request('POST', '/api/login',
+                                          {'email': email, 'password': self.population.password})
+        if status != 200:
+            raise RuntimeError(f'Login as {email} failed with {status}: {body}')
+        return session
+
+    def run_users(self, name, emails, step, targets=None):
+        """Log every email in (untimed), then run ``step(client, rng, index)`` on one thread each.
+
+        The clock starts once every session is logged in. With ``targets``,
+        users are spread round-robin over them.
+        """
+        sessions = [self.login(email, targets[index % len(targets)] if targets else None)
+                    for index, email in enumerate(emails)]
+        samples = []
+        start = threading.Barrier(len(sessions) + 1)
+
+        def worker(index, session):
+            client = Client(session, [])
+            rng = random.Random(f'{self.seed}:{name}:{index}')
+            start.wait()
+            try:
+                step(client, rng, index)
+            finally:
+                samples.extend(client.samples)
+
+        threads = [threading.Thread(target=worker, args=item, daemon=True) for item in enumerate(sessions)]
+        for thread in threads:
+            thread.start()
+        start.wait()
+        started = time.perf_counter()
+        for thread in threads:
+            thread.join()
+        return samples, time.perf_counter() - started
+
+
+class Population:
+    """Accounts and dates of a ``seed_db.py generate`` run, derived from its arguments."""
+
+    def __init__(self, departments, employees, anchor, password):
+        from seed_db import department_names
+        self.slugs = [name.lower().replace(' ', '') for name in department_names(departments)]
+        self.employees = employees
+        self.anchor = anchor
+        self.password = password
+
+    def managers(self, count=None):
+        return [f'manager.{slug}@loadtest.example' for slug in self.slugs][:count]
+
+    def employee_emails(self, count, department=None):
+        """``count`` employees spread round-robin over the departments (or of one department)."""
+        slugs = self.slugs if department is None else [self.slugs[department]]
+        emails = []
+        for number in range(1, self.employees + 1):
+            for slug in slugs:
+                emails.append(f'employee{number}.{slug}@loadtest.example')
+                if len(emails) == count:
+                    return emails
+        return emails
+
+
+def weekday_range(rng, first, span_days, longest=3):
+    """A leave of 1..longest days starting on a random Monday-Wednesday in the span."""
+    start = first + timedelta(days=rng.randrange(span_days))
+    start += timedelta(days=(7 - start.weekday()) % 7 + rng.randrange(3))
+    return start, start + timedelta(days=rng.randrange(longest))
+
+
+# Scenarios
+
+def login_storm(bench):
+    """Concurrent logins as distinct employees, each through a fresh session."""
+    emails = bench.population.employee_emails(bench.concurrency * bench.requests)
+    samples = []
+    lock = threading.Lock()
+    start = threading.Barrier(bench.concurrency + 1)
+
+    def worker(index):
+        client = Client(None, [])
+        start.wait()
+        for email in emails[index::bench.concurrency]:
+            client.session = bench.target.session()
+            client.call('login', 'POST', '/api/login', {'email': email, 'password': bench.population.password})
+        with lock:
+            samples.extend(client.samples)
+
+    threads = [threading.Thread(target=worker, args=(index,), daemon=True) for index in range(bench.concurrency)]
+    for thread in threads:
+        thread.start()
+    start.wait()
+    started = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    # Throughput depends on how many cores hash: the configured workers and the
+    # processes the server actually forked (none when hashing runs on threads)
+    processes = gauges(bench, 'app_password_hasher_').get('workers')
+    return summarize(samples, elapsed, cpus=os.cpu_count(),
+                     hash_workers=int(os.environ.get('PASSWORD_HASH_WORKERS', os.cpu_count() or 1)),
+                     hash_processes=int(processes) if processes is not None else None)
+
+
+def dashboard(bench):
+    """Page loads of the employee and manager dashboards: every API call the page makes."""
+    managers = bench.population.managers(max(1, bench.concurrency // 4))
+    employees = bench.population.employee_emails(max(1, bench.concurrency - len(managers)))
+    year = bench.population.anchor.year
+
+    def step(client, rng, index):
+        manager = index < len(managers)
+        for _ in range(bench.requests):
+            client.call('profile', 'GET', '/api/user/profile')
+            client.call('summary', 'GET', '/api/dashboard/summary')
+            client.call('unread', 'GET', '/api/notifications/unread-count')
+            if manager:
+                client.call('pending', 'GET', '/api/leaves/pending')
+                client.call('all', 'GET', '/api/leaves/all?limit=50')
+                client.call('analytics', 'GET', f'/api/analytics/summary?year={year}')
+            else:
+                client.call('my-requests', 'GET', '/api/leaves/my-requests?limit=20')
+                client.call('notifications', 'GET', '/api/notifications?limit=20')
+
+    return summarize(*bench.run_users('dashboard', managers + employees, step))
+
+
+def revalidation(bench):
+    """Manager polling with If-None-Match: the 304 path of department-versioned endpoints."""
+    managers = bench.population.managers(bench.concurrency)
+    paths = {'pending': '/api/leaves/pending', 'all': '/api/leaves/all?limit=50',
+             'analytics': f'/api/analytics/summary?year={bench.population.anchor.year}'}
+
+    def step(client, rng, index):
+        etags = {}
+        for _ in range(bench.requests):
+            for label, path in paths.items():
+                headers = {'If-None-Match': etags[label]} if label in etags else None
+                status, _, response_headers = client.call(label, 'GET', path, headers=headers)
+                if status == 200 and response_headers.get('ETag'):
+                    etags[label] = response_headers['ETag']
+
+    samples, elapsed = bench.run_users('revalidation', managers, step)
+    not_modified = sum(1 for sample in samples if sample[2] == 304)
+    return summarize(samples, elapsed, not_modified_ratio=round(not_modified / len(samples), 3) if samples else None)
+
+
+def calendar_navigation(bench):
+    """Employees paging the team calendar month by month, back a year and forward again."""
+    employees = bench.population.employee_emails(bench.concurrency)
+    anchor = bench.population.anchor.replace(day=1)
+
+    def month_window(offset):
+        month = anchor.month - 1 + offset
+        first = date(anchor.year + month // 12, month % 12 + 1, 1)
+        following = date(first.year + first.month // 12, first.month % 12 + 1, 1)
+        # FullCalendar asks for whole weeks around the month
+        return first - timedelta(days=first.weekday()), following + timedelta(days=6 - following.weekday())
+
+    def step(client, rng, index):
+        offsets = list(range(0, -12, -1)) + list(range(-12, 1))
+        for request_number in range(bench.requests):
+            start, end = month_window(offsets[(index + request_number) % len(offsets)])
+            client.call('window', 'GET', f'/api/calendar/leaves?start={start}&end={end}')
+
+    return summarize(*bench.run_users('calendar', employees, step))
+
+
+def submit_burst(bench):
+    """Employees submitting leaves at once; the leaves stay pending for approval_queue."""
+    employees = bench.population.employee_emails(bench.concurrency)
+    # Past the generated history, which ends 60 days (plus a leave) after the anchor
+    first = bench.population.anchor + timedelta(days=90)
+
+    def step(client, rng, index):
+        for _ in range(bench.requests):
+            start, end = weekday_range(rng, first, 365)
+            client.call('submit', 'POST', '/api/leaves/submit', {
+                'leave_type': rng.choice(('vacation', 'vacation', 'sick', 'other')),
+                'start_date': start.isoformat(),
+                'end_date': end.isoformat(),
+                'reason': 'Benchmark'
+            })
+
+    return summarize(*bench.run_users('submit', employees, step))
+
+
+def approval_queue(bench):
+    """Managers working through their pending queue, alternating single and bulk decisions.
+
+    Like the dashboard, each round loads the whole (unpaginated) queue and
+    decides the first PENDING_PAGE leaves of it.
+    """
+    managers = bench.population.managers(bench.concurrency)
+
+    def step(client, rng, index):
+        for iteration in range(bench.requests):
+            status, leaves, _ = client.call('pending', 'GET', '/api/leaves/pending')
+            if status != 200 or not leaves:
+                return
+            decisions = [(leave['_id'], 'approve' if rng.random() < 0.7 else 'reject')
+                         for leave in leaves[:PENDING_PAGE]]
+            if iteration % 2:
+                client.call('bulk', 'POST', '/api/leaves/bulk-decision', {
+                    'decisions': [{'id': leave_id, 'decision': decision, 'comment': 'Benchmark'}
+                                  for leave_id, decision in decisions[:BULK_SIZE]]
+                })
+            else:
+                for leave_id, decision in decisions:
+                    client.call(decision, 'POST', f'/api/leaves/{leave_id}/{decision}', {'comment': 'Benchmark'})
+
+    samples, elapsed = bench.run_users('approval', managers, step)
+    return summarize(samples, elapsed)
+
+
+def approval_race(bench):
+    """Concurrent approvals of the same leaves: each is approved once and charged once.
+
+    One manager's sessions all approve one leave at once, then all bulk-approve
+    another, then bulk-approve different leaves of one employee that together
+    exceed the balance. Raises if a leave is approved twice, charged twice or
+    a balance goes negative, so a run fails on a lost lock or guard.
+    """
+    population = bench.population
+    department = len(population.slugs) - 1
+    owner = bench.login(population.employee_emails(population.employees, department=department)[-1])
+    managers = [bench.login(population.managers()[department]) for _ in range(max(2, bench.concurrency))]
+    # Far past every generated and submitted leave, so no limit or overlap gets in the way
+    monday = population.anchor + timedelta(days=1000)
+    monday += timedelta(days=(7 - monday.weekday()) % 7)
+
+    status, profile, _ = owner.request('GET', '/api/user/profile')
+    leave_type, column = max((('vacation', 'vacation_balance'), ('sick', 'sick_balance')),
+                             key=lambda item: profile[item[1]])
+    if profile[column] < 2:
+        raise RuntimeError(f'approval_race needs an employee with 2 days of balance, not {profile[column]}')
+
+    def submit(week, days):
+        start = monday + timedelta(weeks=week)
+        status, body, _ = owner.request('POST', '/api/leaves/submit', {
+            'leave_type': leave_type,
+            'start_date': start.isoformat(),
+            'end_date': (start + timedelta(days=days - 1)).isoformat(),
+            'reason': 'Approval race'
+        })
+        if status != 200:
+            raise RuntimeError(f'Submitting a leave failed with {status}: {body}')
+        return int(body['leave_id']), body['days']
+
+    def balance():
+        return owner.request('GET', '/api/user/profile')[1][column]
+
+    def race(requests):
+        """Send ``requests[i]`` (method, path, body) on manager session i, all at once."""
+        responses = [None] * len(requests)
+        start = threading.Barrier(len(requests))
+
+        def worker(index):
+            start.wait()
+            try:
+                responses[index] = managers[index].request(*requests[index])[:2]
+            except Exception as e:
+                responses[index] = ('error', str(e))
+
+        threads = [threading.Thread(target=worker, args=(index,), daemon=True) for index in range(len(requests))]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return responses
+
+    def charged(leave_ids):
+        _, entries, _ = owner.request('GET', '/api/user/balance-history?limit=200')
+        counts = {}
+        for entry in entries:
+            if entry['entry_type'] == 'deduction' and entry['leave_id'] and int(entry['leave_id']) in leave_ids:
+                counts[int(entry['leave_id'])] = counts.get(int(entry['leave_id']), 0) + 1
+        return counts
+
+    def check(name, approved, leaves, before):
+        after = balance()
+        counts = charged(set(leaves))
+        expected = before - sum(leaves[leave_id] for leave_id in approved)
+        if len(approved) != len(set(approved)) or any(count > 1 for count in counts.values()):
+            raise RuntimeError(f'{name}: a leave was approved or charged twice: {approved}, ledger {counts}')
+        if sorted(counts) != sorted(approved) or after != expected or after < 0:
+            raise RuntimeError(f'{name}: balance went from {before} to {after}, expected {expected} '
+                               f'for approvals {approved}, ledger {counts}')
+        return {'requests': len(managers), 'approved': len(approved), 'balance_before': before,
+                'balance_after': after}
+
+    result = {}
+    before = balance()
+    leave_id, days = submit(0, 1)
+    responses = race([('POST', f'/api/leaves/{leave_id}/approve', {'comment': 'Race'})] * len(managers))
+    approved = [leave_id for status, _ in responses if status == 200]
+    if len(approved) != 1:
+        raise RuntimeError(f'single: {len(approved)} of {len(managers)} concurrent approvals succeeded: {responses}')
+    result['single'] = check('single', approved, {leave_id: days}, before)
+
+    before = balance()
+    leave_id, days = submit(1, 1)
+    responses = race([('POST', '/api/leaves/bulk-decision',
+                       {'decisions': [{'id': leave_id, 'decision': 'approve'}]})] * len(managers))
+    approved = [decided for status, body in responses if status == 200 for decided in body['approved']]
+    if len(approved) != 1:
+        raise RuntimeError(f'bulk: {len(approved)} of {len(managers)} concurrent bulk approvals succeeded')
+    result['bulk'] = check('bulk', approved, {leave_id: days}, before)
+
+    # Leaves the balance covers one by one, two more than it covers together
+    before = balance()
+    length = max(1, min(5, int(before // len(managers))))
+    leaves = dict(submit(2 + week, length) for week in range(int(before // length) + 2))
+    batches = [list(leaves)[index::len(managers)] for index in range(len(managers))]
+    responses = race([('POST', '/api/leaves/bulk-decision',
+                       {'decisions': [{'id': leave_id, 'decision': 'approve'} for leave_id in batch]})
+                      for batch in batches])
+    approved = [decided for status, body in responses if status == 200 for decided in body['approved']]
+    result['overdraw'] = dict(check('overdraw', approved, leaves, before), leaves=len(leaves))
+    return result
+
+
+class Deliveries:
+    """Arrivals of new-leave events on a set of Socket.IO connections, collected by a poller thread.
+
+    Latency runs from sending the submit request to the event's arrival, so
+    an event that beats the submit response still counts.
+    """
+
+    def __init__(self, sockets):
+        self.sockets = sockets
+        self.submitted = {}
+        self.arrivals = []
+        self.done = threading.Event()
+        for socket in sockets:
+            socket.received()
+        self.poller = threading.Thread(target=self.poll, daemon=True)
+        self.poller.start()
+
+    def poll(self):
+        while not self.done.is_set():
+            idle = True
+            for index, socket in enumerate(self.sockets):
+                for event, payload in socket.received():
+                    arrived = time.perf_counter()
+                    requests = payload.get('requests', []) if event == 'new_leave_requests' else [payload]
+                    for item in requests if event.startswith('new_leave_request') else []:
+                        idle = False
+                        self.arrivals.append((index, item.get('leave_id'), arrived))
+            if idle:
+                time.sleep(0.0005)
+
+    def submit(self, client, body):
+        sent = time.perf_counter()
+        status, response, _ = client.call('submit', 'POST', '/api/leaves/submit', body)
+        if status == 200:
+            self.submitted[response['leave_id']] = sent
+
+    def finish(self, timeout=10):
+        """Wait for every connection to receive every submitted leave, then close them."""
+        expected = len(self.submitted) * len(self.sockets)
+        deadline = time.monotonic() + timeout
+        while len(self.delivered()) < expected and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.done.set()
+        self.poller.join()
+        for socket in self.sockets:
+            socket.close()
+
+        latencies = sorted(arrived - self.submitted[leave_id] for _, leave_id, arrived in self.delivered())
+        return {
+            'expected': expected,
+            'received': len(latencies),
+            'delivery_rate': round(len(latencies) / expected, 4) if expected else None,
+            'p50_ms': round(percentile(latencies, 0.50) * 1000, 3) if latencies else None,
+            'p95_ms': round(percentile(latencies, 0.95) * 1000, 3) if latencies else None,
+            'p99_ms': round(percentile(latencies, 0.99) * 1000, 3) if latencies else None,
+            'max_ms': round(latencies[-1] * 1000, 3) if latencies else None
+        }
+
+    def delivered(self):
+        return [arrival for arrival in list(self.arrivals) if arrival[1] in self.submitted]
+
+    def received_by(self, index):
+        return sum(1 for arrival in self.delivered() if arrival[0] == index)
+
+
+def submit_leaves(bench, deliveries, first):
+    def step(client, rng, index):
+        for _ in range(bench.requests):
+            start, end = weekday_range(rng, first, 365)
+            deliveries.submit(client, {
+                'leave_type': 'other', 'start_date': start.isoformat(), 'end_date': end.isoformat()
+            })
+    return step
+
+
+def socketio_fanout(bench, listeners=8):
+    """Delivery latency of new-leave events to every manager connection of a department.
+
+    ``listeners`` Socket.IO connections share the first department manager's
+    session (one per open tab).
+    """
+    manager = bench.login(bench.population.managers(1)[0])
+    deliveries = Deliveries([bench.target.socketio_client(manager) for _ in range(listeners)])
+    employees = bench.population.employee_emails(bench.concurrency, department=0)
+    first = bench.population.anchor + timedelta(days=500)
+    samples, elapsed = bench.run_users('fanout', employees, submit_leaves(bench, deliveries, first))
+    return summarize(samples, elapsed, listeners=listeners, deliveries=deliveries.finish())
+
+
+def socketio_workers(bench, workers=3, listeners=2):
+    """New-leave events delivered across several app.py servers sharing the realtime.py broker.
+
+    Starts ``python realtime.py broker`` and ``workers`` servers with
+    SOCKETIO_MESSAGE_QUEUE pointing at it. Each server holds ``listeners``
+    connections of the first department's manager, and employees submit
+    round-robin through the servers, so most events reach most connections
+    through the broker. Reports the delivery rate and latency over every
+    connection and the events each server's connections received.
+    """
+    workdir = tempfile.mkdtemp(prefix='leave-workers-')
+    path = os.path.join(workdir, 'broker.sock')
+    broker = subprocess.Popen([sys.executable, 'realtime.py', 'broker', path], cwd=ROOT,
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    targets = []
+    try:
+        deadline = time.monotonic() + 10
+        while not os.path.exists(path):
+            if broker.poll() is not None or time.monotonic() > deadline:
+                raise RuntimeError('realtime.py broker did not start')
+            time.sleep(0.05)
+        env = dict(bench.target.env, SOCKETIO_MESSAGE_QUEUE='unix://' + path,
+                   RESPONSE_VERSION_FILE=os.path.join(workdir, 'response-version'))
+        for _ in range(workers):
+            targets.append(ServerTarget(env, port=free_port(), cpus=bench.target.cpus))
+
+        manager = bench.population.managers(1)[0]
+        sockets = []
+        for target in targets:
+            session = bench.login(manager, target)
+            sockets.extend(target.socketio_client(session) for _ in range(listeners))
+        # Servers subscribe to the broker once their first client connects
+        time.sleep(1)
+        deliveries = Deliveries(sockets)
+        employees = bench.population.employee_emails(bench.concurrency, department=0)
+        first = bench.population.anchor + timedelta(days=900)
+        samples, elapsed = bench.run_users('workers', employees, submit_leaves(bench, deliveries, first), targets)
+        result = summarize(samples, elapsed, workers=workers, listeners=workers * listeners,
+                           deliveries=deliveries.finish())
+        result['received_per_worker'] = [
+            sum(deliveries.received_by(number * listeners + index) for index in range(listeners))
+            for number in range(workers)
+        ]
+        return result
+    finally:
+        for target in targets:
+            target.close()
+        broker.terminate()
+        broker.wait()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def gauges(bench, prefix):
+    """Gauges from /metrics whose names start with ``prefix``, keyed without it."""
+    headers = {'Authorization': f"Bearer {os.environ.get('METRICS_TOKEN', '')}"}
+    text = b''.join(bench.target.session().stream('/metrics', headers)).decode()
+    stats = {}
+    for line in text.splitlines():
+        if line.startswith(prefix):
+            name, _, value = line.partition(' ')
+            stats[name[len(prefix):]] = float(value)
+    return stats
+
+
+def pool_stats(bench):
+    """The database pool's gauges from /metrics (app_db_pool_*)."""
+    return gauges(bench, 'app_db_pool_')
+
+
+def capacity(bench):
+    """Employee dashboard reads as concurrency doubles, with database pool queueing per level.
+
+    Each level runs CAPACITY_LEVELS x --concurrency users. Waits, timeouts and
+    wait time are the pool's counters accumulated during the level, so the
+    level where requests start queueing for connections stands out.
+    """
+    levels = {}
+    for multiple in CAPACITY_LEVELS:
+        users = bench.concurrency * multiple
+        emails = bench.population.employee_emails(users)
+        if len(emails) < users:
+            levels[str(users)] = {'skipped': f'the data set has only {len(emails)} employees'}
+            continue
+
+        def step(client, rng, index):
+            for _ in range(bench.requests):
+                client.call('profile', 'GET', '/api/user/profile')
+                client.call('summary', 'GET', '/api/dashboard/summary')
+                client.call('my-requests', 'GET', '/api/leaves/my-requests?limit=20')
+
+        before = pool_stats(bench)
+        samples, elapsed = bench.run_users(f'capacity:{users}', emails, step)
+        after = pool_stats(bench)
+        levels[str(users)] = summarize(samples, elapsed, pool={
+            'size': after.get('size'),
+            'waits': after.get('waits', 0) - before.get('waits', 0),
+            'timeouts': after.get('timeouts', 0) - before.get('timeouts', 0),
+            'wait_time_s': round(after.get('wait_time', 0) - before.get('wait_time', 0), 3)
+        } if after else None)
+        del levels[str(users)]['endpoints']
+    return {'levels': levels}
+
+
+def open_sockets(bench, target, session, count):
+    """Open ``count`` Socket.IO connections on --concurrency threads; (sockets, first error)."""
+    sockets = []
+    errors = []
+
+    def opener(share):
+        for _ in range(share):
+            if errors:
+                return
+            try:
+                sockets.append(target.socketio_client(session))
+            except Exception as e:
+                errors.append(f'{type(e).__name__}: {e}')
+
+    threads = [threading.Thread(target=opener, args=(count // bench.concurrency + (index < count % bench.concurrency),),
+                                daemon=True) for index in range(bench.concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return sockets, errors[0] if errors else None
+
+
+def connection_capacity(bench):
+    """OS threads and RSS of the server per idle Socket.IO connection, for each async mode.
+
+    Starts ``python app.py`` with ASYNC_MODE threading and eventlet in turn
+    and opens idle manager connections up to each CONNECTION_STEPS total.
+    Records the server's threads and RSS at each step, the cost per
+    connection at the last step reached, and the count at which connecting
+    failed, if it did. Client connections hold two threads each in the
+    benchmark process.
+    """
+    result = {'fd_limit': resource.getrlimit(resource.RLIMIT_NOFILE)[0]}
+    for mode in ('threading', 'eventlet'):
+        target = ServerTarget(dict(bench.target.env, ASYNC_MODE=mode), port=free_port(), cpus=bench.target.cpus)
+        sockets = []
+        try:
+            session = bench.login(bench.population.managers(1)[0], target)
+            threads, rss = target.threads(), target.rss()
+            steps = {}
+            error = None
+            for total in CONNECTION_STEPS:
+                started = time.perf_counter()
+                opened, error = open_sockets(bench, target, session, total - len(sockets))
+                sockets.extend(opened)
+                elapsed = time.perf_counter() - started
+                # Let the server finish setting up the last connections
+                time.sleep(0.5)
+                steps[str(len(sockets))] = {
+                    'threads': target.threads(),
+                    'rss_mb': round(target.rss() / 2 ** 20, 1),
+                    'connects_per_s': round(len(opened) / elapsed, 1) if elapsed else None
+                }
+                if error:
+                    break
+            top = steps[str(len(sockets))] if sockets else None
+            result[mode] = {
+                'baseline': {'threads': threads, 'rss_mb': round(rss / 2 ** 20, 1)},
+                'steps': steps,
+                'connections': len(sockets),
+                'threads_per_connection': round((top['threads'] - threads) / len(sockets), 3) if top else None,
+                'rss_kb_per_connection': round((top['rss_mb'] * 2 ** 20 - rss) / 1024 / len(sockets), 1)
+                if top else None,
+                'failed_at': len(sockets) + 1 if error else None,
+                'error': error
+            }
+        finally:
+            for socket in sockets:
+                try:
+                    socket.close()
+                except Exception:
+                    pass
+            target.close()
+    return result
+
+
+def export(bench):
+    """Full NDJSON and CSV exports of one department, with the serving process's RSS growth."""
+    manager = bench.login(bench.population.managers(1)[0])
+    result = {}
+    for fmt in ('ndjson', 'csv'):
+        baseline = peak = bench.target.rss()
+        started = time.perf_counter()
+        size = lines = 0
+        for chunk in manager.stream(f'/api/leaves/export?format={fmt}'):
+            size += len(chunk)
+            lines += chunk.count(b'\n')
+            peak = max(peak, bench.target.rss())
+        elapsed = time.perf_counter() - started
+        rows = lines - (fmt == 'csv')
+        result[fmt] = {
+            'rows': rows,
+            'bytes': size,
+            'elapsed_s': round(elapsed, 3),
+            'rows_per_s': round(rows / elapsed) if elapsed else None,
+            'rss_baseline_mb': round(baseline / 2 ** 20, 1),
+            'rss_growth_mb': round((peak - baseline) / 2 ** 20, 1)
+        }
+    return result
+
+
+def serialization(bench, rows=100000):
+    """Leave-list serialization of ``rows`` rows: per-row dicts through jsonify vs RowSchema.
+
+    Runs in the benchmark process; the per-row path is the one list endpoints
+    used before tuple rows and RowSchema.
+    """
+    from flask import jsonify
+    from app import LEAVE_SCHEMA, app
+    from departments import name as department_name
+    from serialization import json_array_response
+
+    submitted = datetime(2026, 1, 5, 9, 30)
+    tuples = [(index, index % 500, f'Employee {index % 500}', 1, 'vacation', date(2026, 1, 5), date(2026, 1, 9),
+               'Family vacation', 'approved', submitted, None, 'Engineering Manager', submitted)
+              for index in range(rows)]
+    columns = LEAVE_SCHEMA.columns
+
+    def per_row():
+        leaves = []
+        for leave in (dict(zip(columns, row)) for row in tuples):
+            leave['department'] = department_name(leave.pop('department_id'))
+            for field in ('submitted_at', 'approved_at'):
+                if isinstance(leave.get(field), datetime):
+                    leave[field] = leave[field].isoformat()
+            for field in ('start_date', 'end_date'):
+                if isinstance(leave.get(field), date):
+                    leave[field] = leave[field].strftime('%Y-%m-%d')
+            leave['_id'] = str(leave['id'])
+            leaves.append(leave)
+        return jsonify(leaves).get_data()
+
+    def schema():
+        return b''.join(json_array_response(LEAVE_SCHEMA, tuples).response)
+
+    result = {'rows': rows}
+    with app.app_context():
+        for name, build in (('per_row_jsonify', per_row), ('row_schema', schema)):
+            timings = []
+            for _ in range(3):
+                started = time.perf_counter()
+                body = build()
+                timings.append(time.perf_counter() - started)
+            result[name] = {'best_s': round(min(timings), 4), 'bytes': len(body)}
+    try:
+        import orjson  # noqa: F401
+        result['encoder'] = 'orjson'
+    except ImportError:
+        result['encoder'] = 'json'
+    return result
+
+
+def startup(bench, runs=5):
+    """Time to first request of cold-started and of forked (preloaded) workers; see startup.py."""
+    output = subprocess.run([sys.executable, os.path.join(ROOT, 'benchmarks', 'startup.py'), '--runs', str(runs)],
+                            cwd=ROOT, capture_output=True, text=True, check=True).stdout
+    return json.loads(output.splitlines()[-1])
+
+
+def storage(bench):
+    """Data and index bytes per table of the seeded database."""
+    sizes = {}
+    if os.environ.get('DB_BACKEND') == 'sqlite':
+        connection = sqlite3.connect(os.environ['SQLITE_PATH'])
+        try:
+            rows = connection.execute("""
+                SELECT m.tbl_name, s.name = m.tbl_name, SUM(s.pgsize)
+                FROM dbstat s JOIN sqlite_master m ON m.name = s.name
+                GROUP BY m.tbl_name, s.name = m.tbl_name
+            """).fetchall()
+        except sqlite3.OperationalError:
+            return {'skipped': 'this SQLite build has no dbstat table'}
+        finally:
+            connection.close()
+        for table, is_table, size in rows:
+            sizes.setdefault(table, {'data_bytes': 0, 'index_bytes': 0})
+            sizes[table]['data_bytes' if is_table else 'index_bytes'] += size
+    else:
+        from seed_db import get_db_connection
+        connection = get_db_connection()
+        cursor = connection.cursor()
+        cursor.execute("""
+            SELECT table_name, data_length, index_length
+            FROM information_schema.tables
+            WHERE table_schema = DATABASE()
+        """)
+        for table, data_bytes, index_bytes in cursor.fetchall():
+            sizes[table] = {'data_bytes': int(data_bytes), 'index_bytes': int(index_bytes)}
+        cursor.close()
+        connection.close()
+    return {'tables': dict(sorted(sizes.items()))}
+
+
+# Run order matters: submit_burst fills the queue approval_queue works through
+SCENARIOS = {
+    'storage': storage,
+    'startup': startup,
+    'login_storm': login_storm,
+    'dashboard': dashboard,
+    'revalidation': revalidation,
+    'calendar_navigation': calendar_navigation,
+    'submit_burst': submit_burst,
+    'approval_queue': approval_queue,
+    'approval_race': approval_race,
+    'capacity': capacity,
+    'socketio_fanout': socketio_fanout,
+    'socketio_workers': socketio_workers,
+    'connection_capacity': connection_capacity,
+    'export': export,
+    'serialization': serialization
+}
+
+# Scenarios that import the app into the benchmark process
+IN_PROCESS = {'serialization'}
+# Scenarios that start their own app.py servers
+SERVER_ONLY = {'socketio_workers', 'connection_capacity'}
+
+
+def dump(results, path):
+    with open(path, 'w') as f:
+        json.dump(results, f, indent=2, sort_keys=True)
+        f.write('\n')
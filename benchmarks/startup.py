@@ -0,0 +1,108 @@
+"""Measure how long a new worker process takes to serve its first request.
+
+    python benchmarks/startup.py --runs 5
+
+For each mode, reports the seconds from process start (cold) or fork
+(forked) until the worker answered GET /readyz with 200:
+
+- cold: a fresh interpreter imports app.py and builds the app, as every
+  worker of a server started without preloading does;
+- forked: a parent builds the app once with PREFORK set and forks workers
+  that only run start_worker(), as under `gunicorn --preload`.
+
+The app is configured from the environment (DB_BACKEND, SQLITE_PATH, ...).
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+import traceback
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def first_request(app):
+    response = app.test_client().get('/readyz')
+    if response.status_code != 200:
+        raise RuntimeError(f'/readyz answered {response.status_code}: {response.get_data(as_text=True)}')
+
+
+def summary(timings):
+    ordered = sorted(timings)
+    return {
+        'median_ms': round(ordered[len(ordered) // 2] * 1000, 1),
+        'min_ms': round(ordered[0] * 1000, 1),
+        'max_ms': round(ordered[-1] * 1000, 1)
+    }
+
+
+def cold(runs):
+    timings = []
+    for _ in range(runs):
+        started = time.monotonic()
+        output = subprocess.run([sys.executable, os.path.abspath(__file__), '--child'], cwd=ROOT,
+                                capture_output=True, text=True, check=True).stdout
+        timings.append(float(output.split()[-1]) - started)
+    return timings
+
+
+def forked(runs):
+    os.environ['PREFORK'] = '1'
+    import app as app_module
+    started = time.monotonic()
+    app = app_module.create_app()
+    preload_seconds = time.monotonic() - started
+
+    timings = []
+    for _ in range(runs):
+        read, write = os.pipe()
+        started = time.monotonic()
+        pid = os.fork()
+        if pid == 0:
+            os.close(read)
+            try:
+                app_module.start_worker(app)
+                first_request(app)
+                os.write(write, str(time.monotonic()).encode())
+            except Exception:
+                traceback.print_exc()
+                os._exit(1)
+            os._exit(0)
+        os.close(write)
+        with os.fdopen(read) as f:
+            finished = f.read()
+        os.waitpid(pid, 0)
+        if not finished:
+            raise RuntimeError('forked worker failed')
+        timings.append(float(finished) - started)
+    return timings, preload_seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Time to first request of new worker processes.')
+    parser.add_argument('--runs', type=int, default=5, help='Workers started per mode')
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    sys.path.insert(0, ROOT)
+
+    if args.child:
+        import app as app_module
+        first_request(app_module.app)
+        print(time.monotonic(), flush=True)
+        # Skip interpreter teardown; only the time to the first response counts
+        os._exit(0)
+
+    cold_timings = cold(args.runs)
+    forked_timings, preload_seconds = forked(args.runs)
+    print(json.dumps({
+        'runs': args.runs,
+        'cold': summary(cold_timings),
+        'forked': summary(forked_timings),
+        'preload_ms': round(preload_seconds * 1000, 1)
+    }, sort_keys=True))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+"""Run the benchmark suite over data set sizes, app settings and server cores, and show how each metric scales.
+
+    python benchmarks/sweep.py --sizes small,medium,large --output sweep.json
+    python benchmarks/sweep.py --sizes small,large --scenarios export --max-export-rss-mb 32
+    python benchmarks/sweep.py --sizes small --target server --scenarios login_storm \\
+        --vary PASSWORD_HASH_WORKERS=0,1,2,4 --cpus 1,2,4
+
+Every other argument is passed to benchmarks/run.py, which runs once per
+combination of size, --vary value (passed as --env) and --cpus count
+(passed as --server-cpus). A metric that grows with the size of the tables
+points at a scan or an unbounded result; one that stops improving as
+workers or cores are added points at the next bottleneck. Exports must
+stream: the sweep exits with status 1 when an export grows the serving
+process's RSS by more than --max-export-rss-mb at any point.
+"""
+import argparse
+import itertools
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+from compare import metrics
+from drivers import ROOT
+from run import SIZES
+
+
+def run(index, arguments, passthrough, workdir):
+    output = os.path.join(workdir, f'{index}.json')
+    subprocess.run([sys.executable, os.path.join(ROOT, 'benchmarks', 'run.py'), '--output', output]
+                   + arguments + passthrough, check=True)
+    with open(output) as f:
+        return json.load(f)
+
+
+def print_table(reports):
+    labels = list(reports)
+    width = max([14] + [len(label) + 2 for label in labels])
+    rows = {}
+    for label, report in reports.items():
+        for scenario, result in report['scenarios'].items():
+            for name, value, _ in metrics(result):
+                rows.setdefault((scenario, name), {})[label] = value
+    print(f"\n{'scenario':<22}{'metric':<26}" + ''.join(f'{label:>{width}}' for label in labels))
+    for (scenario, name), values in rows.items():
+        print(f"{scenario:<22}{name:<26}" + ''.join(f"{values.get(label, '-'):>{width}}" for label in labels))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run the benchmarks over sizes, settings and server cores.',
+                                     epilog='Other arguments are passed to benchmarks/run.py.')
+    parser.add_argument('--sizes', default=','.join(SIZES), help='Comma-separated data set presets')
+    parser.add_argument('--vary', action='append', default=[], metavar='KEY=V1,V2',
+                        help='App setting to run at each value, e.g. PASSWORD_HASH_WORKERS=0,1,2 (repeatable)')
+    parser.add_argument('--cpus', help='Comma-separated CPU counts to pin the server to (needs --target server)')
+    parser.add_argument('--max-export-rss-mb', type=float, default=64,
+                        help='Largest RSS growth allowed while exporting, at any point')
+    parser.add_argument('--output', help='Write the results of every run as JSON to this file')
+    args, passthrough = parser.parse_known_args()
+    sizes = [size.strip() for size in args.sizes.split(',') if size.strip()]
+    unknown = [size for size in sizes if size not in SIZES]
+    if unknown:
+        parser.error(f"unknown sizes: {', '.join(unknown)}")
+
+    # One axis per option: (label, run.py arguments) for each of its values
+    axes = [[(size, ['--size', size]) for size in sizes]]
+    for item in args.vary:
+        key, _, values = item.partition('=')
+        if not key or not values:
+            parser.error(f'--vary expects KEY=V1,V2: {item}')
+        axes.append([(f'{key}={value.strip()}', ['--env', f'{key}={value.strip()}'])
+                     for value in values.split(',') if value.strip()])
+    if args.cpus:
+        axes.append([(f'cpus={count.strip()}', ['--server-cpus', count.strip()])
+                     for count in args.cpus.split(',') if count.strip()])
+
+    reports = {}
+    with tempfile.TemporaryDirectory() as workdir:
+        for index, combination in enumerate(itertools.product(*axes)):
+            label = ' '.join(part for part, _ in combination)
+            print(f"== {label}", flush=True)
+            reports[label] = run(index, [argument for _, arguments in combination for argument in arguments],
+                                 passthrough, workdir)
+
+    print_table(reports)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(reports, f, indent=2, sort_keys=True)
+            f.write('\n')
+        print(f"\nResults written to {args.output}")
+
+    unbounded = [(label, fmt, result[fmt]['rss_growth_mb'])
+                 for label, report in reports.items()
+                 for result in [report['scenarios'].get('export', {})]
+                 for fmt in ('ndjson', 'csv')
+                 if fmt in result and result[fmt]['rss_growth_mb'] > args.max_export_rss_mb]
+    for label, fmt, growth in unbounded:
+        print(f"{label}: {fmt} export grew RSS by {growth} MB (limit {args.max_export_rss_mb} MB)")
+    if unbounded:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,132 @@
+import bisect
+import threading
+import time
+from datetime import timedelta
+
+ONE_DAY = timedelta(days=1)
+
+
+class DepartmentCalendar:
+    """Approved leaves of one department, sorted by start date.
+
+    Leaves are keyed by id and indexed by (start_date, id). Together with the
+    longest leave seen so far, that bounds an overlap query to a bisect plus a
+    scan of the candidates that start inside [start - max_span, end].
+    """
+
+    def __init__(self, version, loaded_from, loaded_to):
+        self.version = version
+        self.loaded_from = loaded_from
+        self.loaded_to = loaded_to
+        self.loaded_at = time.monotonic()
+        self.leaves = {}
+        self.starts = []
+        self.max_span = timedelta(0)
+
+    def add(self, leave):
+        self.remove(leave['id'])
+        self.leaves[leave['id']] = leave
+        bisect.insort(self.starts, (leave['start_date'], leave['id']))
+        self.max_span = max(self.max_span, leave['end_date'] - leave['start_date'])
+
+    def remove(self, leave_id):
+        leave = self.leaves.pop(leave_id, None)
+        if leave:
+            index = bisect.bisect_left(self.starts, (leave['start_date'], leave_id))
+            del self.starts[index]
+
+    def covers(self, start, end):
+        return self.loaded_from <= start and end <= self.loaded_to
+
+    def overlapping(self, start, end):
+        lo = bisect.bisect_left(self.starts, (start - self.max_span,))
+        hi = bisect.bisect_right(self.starts, (end, float('inf')))
+        return [self.leaves[leave_id] for _, leave_id in self.starts[lo:hi]
+                if self.leaves[leave_id]['end_date'] >= start]
+
+
+class CalendarCache:
+    """In-process window cache of approved leaves per department.
+
+    A department's calendar remembers the date span it has loaded. Windows
+    inside that span are answered from memory; windows outside it load only
+    the missing segments (padded by ``prefetch_days``) from the database.
+    Calendars are tagged with the department version (see response_cache)
+    read before loading, so a change made by any worker drops them.
+    """
+
+    def __init__(self, ttl=300, prefetch_days=31):
+        self.ttl = ttl
+        self.prefetch = timedelta(days=prefetch_days)
+        self._departments = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _calendar(self, department, version):
+        calendar = self._departments.get(department)
+        if calendar and (calendar.version != version or time.monotonic() - calendar.loaded_at > self.ttl):
+            del self._departments[department]
+            calendar = None
+        return calendar
+
+    def window(self, department, version, start, end, load):
+        """Return approved leaves overlapping [start, end] as of ``version``.
+
+        ``load(department, start, end)`` fetches the rows overlapping a span
+        from the database on a miss. ``version`` must be read before the
+        call, so the loaded rows are never older than it.
+        """
+        with self._lock:
+            calendar = self._calendar(department, version)
+            if calendar and calendar.covers(start, end):
+                self.hits += 1
+                return calendar.overlapping(start, end)
+            self.misses += 1
+
+        if calendar is None:
+            segments = [(start - self.prefetch, end + self.prefetch)]
+        else:
+            segments = []
+            if start < calendar.loaded_from:
+                segments.append((start - self.prefetch, calendar.loaded_from - ONE_DAY))
+            if end > calendar.loaded_to:
+                segments.append((calendar.loaded_to + ONE_DAY, end + self.prefetch))
+        rows = [row for segment in segments for row in load(department, *segment)]
+
+        with self._lock:
+            if calendar is None:
+                calendar = DepartmentCalendar(version, segments[0][0], segments[-1][1])
+            else:
+                calendar.loaded_from = min(calendar.loaded_from, segments[0][0])
+                calendar.loaded_to = max(calendar.loaded_to, segments[-1][1])
+            for row in rows:
+                calendar.add(row)
+            # Another request may have installed a calendar meanwhile; keep the newer one
+            installed = self._departments.get(department)
+            if installed is None or installed.version < version:
+                self._departments[department] = calendar
+            return calendar.overlapping(start, end)
+
+    def clear(self):
+        with self._lock:
+            self._departments.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'departments': len(self._departments),
+                'leaves': sum(len(c.leaves) for c in self._departments.values()),
+                'hits': self.hits,
+                'misses': self.misses
+            }
+
+
+cache = CalendarCache()
+
+
+def init_app(app):
+    cache.ttl = app.config.get('CALENDAR_CACHE_TTL', 300)
+    cache.prefetch = timedelta(days=app.config.get('CALENDAR_PREFETCH_DAYS', 31))
+    cache.clear()
+    app.extensions['calendar_cache'] = cache
@@ -0,0 +1,368 @@
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+SQLITE_SCHEMA = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'scripts', 'create_tables_sqlite.sql')
+
+_pool = None
+
+# Optional statement observer (see set_observer)
+_observer = None
+
+# Unique/foreign key violations from either backend, and the errors get_db
+# logs. mysql.connector is slow to import, so it is only loaded when a MySQL
+# pool is created and its classes are added then; refer to these as
+# db.IntegrityError rather than importing the names.
+IntegrityError = (sqlite3.IntegrityError,)
+Error = ()
+
+
+def _load_mysql():
+    global IntegrityError, Error
+    import mysql.connector
+    IntegrityError = (mysql.connector.IntegrityError, sqlite3.IntegrityError)
+    Error = (mysql.connector.Error,)
+    return mysql.connector
+
+
+class PoolTimeout(Exception):
+    """Raised when no connection could be checked out before the timeout."""
+
+
+class ConnectionPool:
+    """Thread-safe pool of DB-API connections created lazily up to ``size``."""
+
+    def __init__(self, connect, size=10, timeout=5.0, recycle=60.0):
+        self._connect = connect
+        self.size = size
+        self.timeout = timeout
+        self.recycle = recycle
+        self._idle = deque()
+        self._cond = threading.Condition()
+        self._created = 0
+        # Metrics
+        self.in_use = 0
+        self.checkouts = 0
+        self.waits = 0
+        self.wait_time = 0.0
+        self.timeouts = 0
+
+    def acquire(self):
+        with self._cond:
+            if not self._idle and self._created >= self.size:
+                self.waits += 1
+                started = time.monotonic()
+                deadline = started + self.timeout
+                while not self._idle and self._created >= self.size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self.timeouts += 1
+                        self.wait_time += time.monotonic() - started
+                        raise PoolTimeout(f'No database connection available after {self.timeout}s')
+                    self._cond.wait(remaining)
+                self.wait_time += time.monotonic() - started
+
+            connection, idle_since = self._idle.pop() if self._idle else (None, None)
+            if connection is None:
+                self._created += 1
+            self.in_use += 1
+            self.checkouts += 1
+
+        try:
+            if connection is None:
+                connection = self._connect()
+            elif time.monotonic() - idle_since > self.recycle:
+                # Connections idle for a while may have been dropped by the server
+                connection.ping(reconnect=True)
+        except Exception:
+            self._forget()
+            raise
+        return connection
+
+    def release(self, connection):
+        try:
+            # End any implicit transaction so the next borrower gets a fresh snapshot
+            connection.rollback()
+        except Exception:
+            try:
+                connection.close()
+            except Exception:
+                pass
+            self._forget()
+            return
+
+        with self._cond:
+            self.in_use -= 1
+            self._idle.append((connection, time.monotonic()))
+            self._cond.notify()
+
+    def _forget(self):
+        with self._cond:
+            self._created -= 1
+            self.in_use -= 1
+            self._cond.notify()
+
+    def close(self):
+        with self._cond:
+            while self._idle:
+                connection, _ = self._idle.pop()
+                try:
+                    connection.close()
+                except Exception:
+                    pass
+                self._created -= 1
+
+    def stats(self):
+        with self._cond:
+            return {
+                'size': self.size,
+                'created': self._created,
+                'idle': len(self._idle),
+                'in_use': self.in_use,
+                'checkouts': self.checkouts,
+                'waits': self.waits,
+                'wait_time': round(self.wait_time, 6),
+                'timeouts': self.timeouts
+            }
+
+
+# SQLite stand-in so the app can run without a MySQL server. The wrappers
+# accept the mysql.connector calling conventions used throughout app.py.
+class SQLiteCursor:
+    _queries = {}
+
+    def __init__(self, cursor, dictionary=False, offload=None):
+        self._cursor = cursor
+        self._dictionary = dictionary
+        self._offload = offload
+
+    @classmethod
+    def _translate(cls, query):
+        translated = cls._queries.get(query)
+        if translated is None:
+            translated = query.replace('%s', '?').replace(' FOR UPDATE', '')
+            if 'ON DUPLICATE KEY UPDATE' in translated:
+                # MySQL upsert -> SQLite upsert; VALUES(col) is the incoming row
+                translated = re.sub(r'VALUES\((\w+)\)', r'excluded.\1',
+                                    translated.replace('ON DUPLICATE KEY UPDATE', 'ON CONFLICT DO UPDATE SET'))
+            cls._queries[query] = translated
+        return translated
+
+    def _row(self, row):
+        if row is None or not self._dictionary:
+            return row
+        return {column[0]: value for column, value in zip(self._cursor.description, row)}
+
+    def _lock(self):
+        # SQLite has no row locks: a locking read takes the database write
+        # lock up front, so the rows it returns stay current until commit
+        if not self._cursor.connection.in_transaction:
+            self._cursor.execute('BEGIN IMMEDIATE')
+
+    def execute(self, query, params=()):
+        if ' FOR UPDATE' in query:
+            if self._offload:
+                self._offload(self._lock)
+            else:
+                self._lock()
+        if self._offload:
+            self._offload(self._cursor.execute, self._translate(query), tuple(params or ()))
+        else:
+            self._cursor.execute(self._translate(query), tuple(params or ()))
+
+    def executemany(self, query, seq_of_params):
+        if self._offload:
+            self._offload(self._cursor.executemany, self._translate(query), list(seq_of_params))
+        else:
+            self._cursor.executemany(self._translate(query), seq_of_params)
+
+    def fetchone(self):
+        return self._row(self._cursor.fetchone())
+
+    def fetchmany(self, size=1):
+        return [self._row(row) for row in self._cursor.fetchmany(size)]
+
+    def fetchall(self):
+        return [self._row(row) for row in self._cursor.fetchall()]
+
+    def __iter__(self):
+        for row in self._cursor:
+            yield self._row(row)
+
+    @property
+    def description(self):
+        return self._cursor.description
+
+    @property
+    def lastrowid(self):
+        return self._cursor.lastrowid
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+    def close(self):
+        self._cursor.close()
+
+
+class SQLiteConnection:
+    def __init__(self, path, offload=None):
+        self._offload = offload
+        self._connection = sqlite3.connect(
+            path,
+            detect_types=sqlite3.PARSE_DECLTYPES,
+            check_same_thread=False,
+            uri=path.startswith('file:')
+        )
+        self._connection.execute('PRAGMA foreign_keys = ON')
+        exists = self._connection.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'table' AND name = 'users'"
+        ).fetchone()
+        if not exists:
+            with open(SQLITE_SCHEMA) as schema:
+                self._connection.executescript(schema.read())
+
+    def cursor(self, dictionary=False, **kwargs):
+        return SQLiteCursor(self._connection.cursor(), dictionary, self._offload)
+
+    def start_transaction(self):
+        if not self._connection.in_transaction:
+            self._connection.execute('BEGIN IMMEDIATE')
+
+    def commit(self):
+        if self._offload:
+            self._offload(self._connection.commit)
+        else:
+            self._connection.commit()
+
+    def rollback(self):
+        self._connection.rollback()
+
+    def ping(self, reconnect=False):
+        pass
+
+    def is_connected(self):
+        return True
+
+    def close(self):
+        self._connection.close()
+
+
+def blocking_executor(async_mode):
+    """Return a function that runs a blocking call on a native thread pool.
+
+    Under eventlet or gevent a C-level call (sqlite3, the mysql C extension)
+    would stall every green thread on the hub, so such calls are handed to
+    the green library's thread pool. Returns None for the threading server.
+    """
+    if async_mode == 'eventlet':
+        from eventlet import tpool
+        return tpool.execute
+    if async_mode == 'gevent':
+        from gevent import get_hub
+        return lambda func, *args: get_hub().threadpool.apply(func, args)
+    return None
+
+
+def create_pool(config):
+    backend = config.get('DB_BACKEND', 'mysql')
+    green = config.get('ASYNC_MODE', 'threading') in ('eventlet', 'gevent')
+    if backend == 'sqlite':
+        path = config.get('SQLITE_PATH', 'leave_management.db')
+        offload = blocking_executor(config.get('ASYNC_MODE'))
+        connect = lambda: SQLiteConnection(path, offload)
+    elif backend == 'mysql':
+        connector = _load_mysql()
+        settings = dict(config['DB_CONFIG'])
+        if green:
+            # The pure-Python protocol talks through the patched socket module,
+            # so a query waiting on the server yields to other green threads
+            settings.setdefault('use_pure', True)
+        connect = lambda: connector.connect(**settings)
+    else:
+        raise ValueError(f'Unknown DB_BACKEND: {backend}')
+
+    return ConnectionPool(
+        connect,
+        size=config.get('DB_POOL_SIZE', 10),
+        timeout=config.get('DB_POOL_TIMEOUT', 5.0),
+        recycle=config.get('DB_POOL_RECYCLE', 60.0)
+    )
+
+
+def init_app(app):
+    global _pool
+    if _pool is not None:
+        _pool.close()
+    _pool = create_pool(app.config)
+    app.extensions['db_pool'] = _pool
+    return _pool
+
+
+def get_pool():
+    return _pool
+
+
+class TimedCursor:
+    """Cursor proxy that reports every statement and its duration to an observer."""
+
+    def __init__(self, cursor, observer):
+        self._cursor = cursor
+        self._observer = observer
+
+    def execute(self, query, *args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return self._cursor.execute(query, *args, **kwargs)
+        finally:
+            self._observer.query(query, time.perf_counter() - started)
+
+    def executemany(self, query, *args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return self._cursor.executemany(query, *args, **kwargs)
+        finally:
+            self._observer.query(query, time.perf_counter() - started)
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+
+def set_observer(observer):
+    """Report get_db activity to ``observer``, or stop reporting with None.
+
+    The observer's ``acquired(seconds)`` is called after each connection
+    checkout and ``query(sql, seconds)`` after each statement.
+    """
+    global _observer
+    _observer = observer
+
+
+@contextmanager
+def get_db(dictionary=True, buffered=True):
+    """Check out a pooled connection and cursor, returning both on exit."""
+    observer = _observer
+    started = time.perf_counter()
+    connection = _pool.acquire()
+    if observer:
+        observer.acquired(time.perf_counter() - started)
+    try:
+        cursor = connection.cursor(dictionary=dictionary, buffered=buffered)
+        if observer:
+            cursor = TimedCursor(cursor, observer)
+        try:
+            yield connection, cursor
+        finally:
+            cursor.close()
+    except Error as e:
+        print(f"Database error: {e}")
+        raise
+    finally:
+        _pool.release(connection)
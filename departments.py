@@ -0,0 +1,96 @@
+import threading
+
+import db
+from db import get_db
+
+DEFAULT_DEPARTMENT = 'General'
+
+
+class DepartmentDirectory:
+    """Cached two-way map between department ids and names.
+
+    Leaves, users and notifications store only ``department_id``; names are
+    resolved here. The departments table is small and rarely changes, so it
+    is loaded whole and reloaded when an unknown id or name is asked for.
+    """
+
+    def __init__(self):
+        self._names = {}
+        self._ids = {}
+        self._lock = threading.Lock()
+        self.reloads = 0
+
+    def _reload(self):
+        with get_db() as (connection, cursor):
+            cursor.execute("SELECT id, name FROM departments")
+            rows = cursor.fetchall()
+        with self._lock:
+            self._names = {row['id']: row['name'] for row in rows}
+            self._ids = {row['name']: row['id'] for row in rows}
+            self.reloads += 1
+
+    def name(self, department_id):
+        if department_id is None:
+            return None
+        name = self._names.get(department_id)
+        if name is None:
+            self._reload()
+            name = self._names.get(department_id)
+        return name
+
+    def id_for(self, name, create=False):
+        """Id of the named department, inserting it first when ``create`` is set."""
+        department_id = self._ids.get(name)
+        if department_id is None:
+            self._reload()
+            department_id = self._ids.get(name)
+        if department_id is None and create:
+            with get_db() as (connection, cursor):
+                try:
+                    cursor.execute("INSERT INTO departments (name) VALUES (%s)", (name,))
+                    connection.commit()
+                except db.IntegrityError:
+                    # Created concurrently by another request
+                    connection.rollback()
+            self._reload()
+            department_id = self._ids.get(name)
+        return department_id
+
+    def ids(self):
+        """Ids of every department, read from the table now."""
+        self._reload()
+        with self._lock:
+            return sorted(self._names)
+
+    def clear(self):
+        with self._lock:
+            self._names = {}
+            self._ids = {}
+
+    def stats(self):
+        return {'departments': len(self._names), 'reloads': self.reloads}
+
+
+directory = DepartmentDirectory()
+
+
+def init_app(app):
+    directory.clear()
+    app.extensions['departments'] = directory
+
+
+def load():
+    """Read the whole directory now instead of on the first lookup."""
+    directory._reload()
+
+
+def name(department_id):
+    return directory.name(department_id)
+
+
+def id_for(name, create=False):
+    return directory.id_for(name, create)
+
+
+def ids():
+    return directory.ids()
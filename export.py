@@ -0,0 +1,59 @@
+import csv
+import io
+from datetime import date
+
+from db import get_db
+from serialization import dumps
+
+# Rows read per query; the pooled connection is returned between chunks
+EXPORT_CHUNK_ROWS = 5000
+
+
+def leave_chunks(select, schema, clauses, params, chunk_size=EXPORT_CHUNK_ROWS):
+    """Yield lists of tuple rows ordered by (submitted_at, id), oldest first.
+
+    Every chunk is its own keyset query: a connection is checked out, the
+    rows are read through an unbuffered cursor and the connection goes back
+    to the pool before the chunk is yielded. A slow client therefore never
+    pins a connection, and memory stays at one chunk whatever the row count.
+    """
+    position_index, id_index = schema.index('submitted_at'), schema.index('id')
+    last = None
+    while True:
+        page_clauses, page_params = list(clauses), list(params)
+        if last:
+            page_clauses.append('(submitted_at > %s OR (submitted_at = %s AND id > %s))')
+            page_params.extend([last[0], last[0], last[1]])
+        with get_db(dictionary=False, buffered=False) as (connection, cursor):
+            cursor.execute(f"""
+                {select}
+                WHERE {' AND '.join(page_clauses)}
+                ORDER BY submitted_at, id
+                LIMIT %s
+            """, page_params + [chunk_size])
+            rows = cursor.fetchall()
+        if rows:
+            yield rows
+        if len(rows) < chunk_size:
+            return
+        last = (rows[-1][position_index], rows[-1][id_index])
+
+
+def csv_stream(chunks, schema):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(schema.names)
+    # The header goes out before the first query runs
+    yield buffer.getvalue().encode()
+    for rows in chunks:
+        buffer.seek(0)
+        buffer.truncate()
+        for item in schema.rows(rows):
+            # ISO 8601 dates and datetimes, as in the NDJSON export
+            writer.writerow([value.isoformat() if isinstance(value, date) else value for value in item.values()])
+        yield buffer.getvalue().encode()
+
+
+def ndjson_stream(chunks, schema):
+    for rows in chunks:
+        yield b''.join(dumps(item) + b'\n' for item in schema.rows(rows))
@@ -0,0 +1,100 @@
+import threading
+import time
+
+from flask import g, session
+
+import departments
+from db import get_db
+
+IDENTITY_SELECT = "SELECT id, name, role, department_id FROM users WHERE id = %s"
+
+
+class IdentityCache:
+    """Per-user cache of role, department and name with a TTL."""
+
+    def __init__(self, ttl=300):
+        self.ttl = ttl
+        self._entries = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, user_id):
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry and entry[0] > time.monotonic():
+                self.hits += 1
+                return entry[1]
+            if entry:
+                del self._entries[user_id]
+            self.misses += 1
+            return None
+
+    def set(self, user_id, identity):
+        with self._lock:
+            self._entries[user_id] = (time.monotonic() + self.ttl, identity)
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._entries.pop(str(user_id), None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0
+            }
+
+
+cache = IdentityCache()
+
+
+def init_app(app):
+    cache.ttl = app.config.get('IDENTITY_CACHE_TTL', 300)
+    cache.clear()
+    app.extensions['identity_cache'] = cache
+
+
+def remember(user):
+    identity = {
+        'id': str(user['id']),
+        'name': user['name'],
+        'role': user['role'],
+        'department_id': user['department_id'],
+        'department': departments.name(user['department_id'])
+    }
+    cache.set(identity['id'], identity)
+    return identity
+
+
+def get_identity(user_id):
+    identity = cache.get(user_id)
+    if identity is None:
+        with get_db() as (connection, cursor):
+            cursor.execute(IDENTITY_SELECT, (user_id,))
+            user = cursor.fetchone()
+        if not user:
+            return None
+        identity = remember(user)
+    return identity
+
+
+def invalidate(user_id):
+    cache.invalidate(user_id)
+    if g and g.get('identity') and g.identity['id'] == str(user_id):
+        g.pop('identity')
+
+
+def current_identity():
+    """Resolve the logged-in user once per request and share it through flask.g."""
+    if 'identity' not in g:
+        user_id = session.get('user_id')
+        g.identity = get_identity(user_id) if user_id else None
+    return g.identity
@@ -0,0 +1,283 @@
+import hmac
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from functools import lru_cache
+
+from flask import Response, g, has_request_context, jsonify, request
+
+import db
+from identity import current_identity
+
+# Histogram upper bounds: seconds for latencies, statements for per-request counts
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+STATEMENT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55)
+
+
+class Histogram:
+    """Prometheus-style cumulative histogram with labels."""
+
+    def __init__(self, name, help_text, labels, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self.buckets = buckets
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [0] * len(self.buckets) + [0, 0.0]
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[index] += 1
+            series[-2] += 1
+            series[-1] += value
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            series = sorted(self._series.items())
+        for label_values, values in series:
+            labels = ','.join(f'{label}="{value}"' for label, value in zip(self.labels, label_values))
+            prefix = labels + ',' if labels else ''
+            for bound, count in zip(self.buckets, values):
+                lines.append(f'{self.name}_bucket{{{prefix}le="{bound}"}} {count}')
+            lines.append(f'{self.name}_bucket{{{prefix}le="+Inf"}} {values[-2]}')
+            lines.append(f'{self.name}_count{{{labels}}} {values[-2]}')
+            lines.append(f'{self.name}_sum{{{labels}}} {values[-1]:.6f}')
+        return lines
+
+
+class CounterMetric:
+    def __init__(self, name, help_text, labels):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self._values = Counter()
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values):
+        with self._lock:
+            self._values[label_values] += 1
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} counter']
+        with self._lock:
+            values = sorted(self._values.items())
+        for label_values, value in values:
+            labels = ','.join(f'{label}="{value}"' for label, value in zip(self.labels, label_values))
+            lines.append(f'{self.name}{{{labels}}} {value}')
+        return lines
+
+
+@lru_cache(maxsize=1024)
+def normalize_sql(sql):
+    """Collapse whitespace, literals and placeholder lists so equal statements group together."""
+    sql = re.sub(r'\s+', ' ', sql).strip()
+    sql = re.sub(r"'[^']*'", '?', sql)
+    sql = re.sub(r'\b\d+\b', '?', sql)
+    return re.sub(r'%s(?:\s*,\s*%s)+', '%s, ...', sql)
+
+
+class SamplingProfiler:
+    """Samples one thread's stack at a fixed interval into folded-stack counts.
+
+    The output is the collapsed format read by flamegraph.pl and speedscope.
+    Sampling uses a native thread, so it only works with ASYNC_MODE=threading.
+    """
+
+    def __init__(self, thread_id, interval=0.005):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.samples = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='request-profiler', daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f'{os.path.basename(code.co_filename)}:{code.co_name}')
+                frame = frame.f_back
+            if stack:
+                self.samples[';'.join(reversed(stack))] += 1
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        return self.samples
+
+
+class Instrumentation:
+    """Per-route latency, per-request SQL and Socket.IO emit metrics.
+
+    Installs itself as the db statement observer and as request hooks on
+    the app. Metrics are kept per process.
+    """
+
+    def __init__(self, slow_query_seconds=0.1, profile_dir=None, profile_interval=0.005):
+        self.slow_query_seconds = slow_query_seconds
+        self.profile_dir = profile_dir
+        self.profile_interval = profile_interval
+        self.requests = Histogram('http_request_duration_seconds', 'Request latency by endpoint',
+                                  ('endpoint', 'method', 'status'))
+        self.request_statements = Histogram('http_request_sql_statements', 'SQL statements issued per request',
+                                            ('endpoint',), STATEMENT_BUCKETS)
+        self.request_sql = Histogram('http_request_sql_seconds', 'Time spent in SQL per request', ('endpoint',))
+        self.request_acquire = Histogram('http_request_db_acquire_seconds',
+                                         'Time spent waiting for pooled connections per request', ('endpoint',))
+        self.queries = Histogram('db_query_duration_seconds', 'SQL statement latency', ('statement',))
+        self.slow_queries = CounterMetric('db_slow_queries_total', 'Statements slower than SLOW_QUERY_MS',
+                                          ('statement',))
+        self.emits = Histogram('socketio_emit_duration_seconds', 'Socket.IO emit latency', ('event',))
+
+    # db observer
+    def acquired(self, seconds):
+        if has_request_context() and 'request_stats' in g:
+            g.request_stats[2] += seconds
+
+    def query(self, sql, seconds):
+        statement = sql.lstrip().split(None, 1)[0].upper()
+        self.queries.observe(seconds, statement)
+        if has_request_context() and 'request_stats' in g:
+            g.request_stats[0] += 1
+            g.request_stats[1] += seconds
+        if seconds >= self.slow_query_seconds:
+            self.slow_queries.inc(statement)
+            endpoint = request.endpoint if has_request_context() else 'background'
+            print(f"Slow query ({seconds * 1000:.1f} ms, {endpoint}): {normalize_sql(sql)}")
+
+    def timed_emit(self, emit):
+        def timed(event, *args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return emit(event, *args, **kwargs)
+            finally:
+                self.emits.observe(time.perf_counter() - started, event)
+        timed.untimed = emit
+        return timed
+
+    # Request hooks
+    def before_request(self):
+        # [statements, sql seconds, acquire seconds]
+        g.request_stats = [0, 0.0, 0.0]
+        g.request_started = time.perf_counter()
+        # Profiles cost CPU and disk, so only managers may ask for one
+        if self.profile_dir and request.headers.get('X-Profile'):
+            user = current_identity()
+            if user and user['role'] == 'manager':
+                g.profiler = SamplingProfiler(threading.get_ident(), self.profile_interval).start()
+
+    def after_request(self, response):
+        statements, sql_seconds, _ = g.request_stats
+        response.headers['Server-Timing'] = f'db;dur={sql_seconds * 1000:.1f};desc="{statements} queries"'
+        g.request_status = response.status_code
+        return response
+
+    def teardown_request(self, exc):
+        if 'request_started' not in g:
+            return
+        endpoint = request.endpoint or 'unmatched'
+        statements, sql_seconds, acquire_seconds = g.request_stats
+        self.requests.observe(time.perf_counter() - g.request_started, endpoint, request.method,
+                              g.get('request_status', 500))
+        self.request_statements.observe(statements, endpoint)
+        self.request_sql.observe(sql_seconds, endpoint)
+        self.request_acquire.observe(acquire_seconds, endpoint)
+        if 'profiler' in g:
+            self._write_profile(endpoint, g.profiler.stop())
+
+    def _write_profile(self, endpoint, samples):
+        os.makedirs(self.profile_dir, exist_ok=True)
+        path = os.path.join(self.profile_dir, f'{time.strftime("%Y%m%d-%H%M%S")}-{os.getpid()}-{endpoint}.folded')
+        with open(path, 'w') as f:
+            for stack, count in samples.most_common():
+                f.write(f'{stack} {count}\n')
+        print(f"Profile of {endpoint} written to {path} ({sum(samples.values())} samples)")
+
+    def render(self, extensions):
+        lines = []
+        for metric in (self.requests, self.request_statements, self.request_sql, self.request_acquire,
+                       self.queries, self.slow_queries, self.emits):
+            lines.extend(metric.render())
+        # Every extension with stats() (pool, caches, queues) as gauges
+        for name, extension in sorted(extensions.items()):
+            stats = getattr(extension, 'stats', None)
+            if not callable(stats):
+                continue
+            for key, value in sorted(stats().items()):
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    metric = f'app_{name}_{key}'
+                    lines.append(f'# TYPE {metric} gauge')
+                    lines.append(f'{metric} {value}')
+        return '\n'.join(lines) + '\n'
+
+
+instrumentation = None
+
+
+def init_app(app):
+    """Enable metrics when METRICS_ENABLED is set; call after every other init_app.
+
+    Adds the request hooks, the db observer, timing around every Socket.IO
+    emit and a Prometheus text endpoint at /metrics, served to logged-in
+    managers and to scrapers sending ``Authorization: Bearer <METRICS_TOKEN>``.
+    Requests of logged-in managers sent with an X-Profile header are
+    profiled when PROFILE_DIR is set. Statements run outside any request (the notification
+    writer, CLI jobs) only reach the per-statement metrics.
+    """
+    global instrumentation
+    # The SocketIO object outlives apps; unwrap an emit timed for an earlier one
+    socketio = app.extensions.get('socketio')
+    pipeline = app.extensions.get('notification_pipeline')
+    if socketio:
+        socketio.emit = getattr(socketio.emit, 'untimed', socketio.emit)
+        if pipeline:
+            pipeline.emit = socketio.emit
+    if not app.config.get('METRICS_ENABLED'):
+        db.set_observer(None)
+        return None
+
+    profile_dir = app.config.get('PROFILE_DIR')
+    if profile_dir and app.config.get('ASYNC_MODE', 'threading') != 'threading':
+        print("Request profiling needs ASYNC_MODE=threading; PROFILE_DIR ignored")
+        profile_dir = None
+    instrumentation = Instrumentation(
+        slow_query_seconds=app.config.get('SLOW_QUERY_MS', 100) / 1000,
+        profile_dir=profile_dir,
+        profile_interval=app.config.get('PROFILE_INTERVAL_MS', 5) / 1000
+    )
+    db.set_observer(instrumentation)
+    app.before_request(instrumentation.before_request)
+    app.after_request(instrumentation.after_request)
+    app.teardown_request(instrumentation.teardown_request)
+
+    if socketio:
+        # Covers flask_socketio.emit() in event handlers as well as the notification pipeline
+        socketio.emit = instrumentation.timed_emit(socketio.emit)
+        if pipeline:
+            pipeline.emit = socketio.emit
+
+    def metrics():
+        token = app.config.get('METRICS_TOKEN')
+        if not (token and hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}')):
+            user = current_identity()
+            if not user or user['role'] != 'manager':
+                return jsonify({'error': 'Unauthorized'}), 403
+        return Response(instrumentation.render(app.extensions), mimetype='text/plain; version=0.0.4')
+    app.add_url_rule('/metrics', 'metrics', metrics)
+
+    app.extensions['instrumentation'] = instrumentation
+    return instrumentation
@@ -0,0 +1,264 @@
+import atexit
+import queue
+import threading
+import time
+
+from db import get_db
+
+INSERT_NOTIFICATION = """
+    INSERT INTO notifications (type, message, leave_id, department_id, user_id, created_at, is_read)
+    VALUES (%s, %s, %s, %s, %s, %s, %s)
+"""
+
+# Adds a (possibly negative) delta to an audience's unread counter
+ADJUST_UNREAD = """
+    INSERT INTO notification_counters (audience, unread)
+    VALUES (%s, %s)
+    ON DUPLICATE KEY UPDATE unread = unread + VALUES(unread)
+"""
+
+# When several events for the same room land in one batch they are coalesced
+# into a single event carrying a list: event -> (batched event, list key)
+BATCH_EVENTS = {
+    'new_leave_request': ('new_leave_requests', 'requests'),
+    'leave_status_update': ('leave_status_updates', 'updates')
+}
+
+_STOP = object()
+
+
+def audience_key(department_id=None, user_id=None):
+    """Counter key for a notification's audience: one user, or a department's managers."""
+    return f'user:{user_id}' if user_id else f'department:{department_id}'
+
+
+def adjust_unread(cursor, deltas):
+    """Apply {audience: delta} to the unread counters inside the caller's transaction."""
+    deltas = [(audience, delta) for audience, delta in deltas.items() if delta]
+    if deltas:
+        cursor.executemany(ADJUST_UNREAD, deltas)
+
+
+def unread_count(cursor, audience):
+    cursor.execute("SELECT unread FROM notification_counters WHERE audience = %s", (audience,))
+    row = cursor.fetchone()
+    return max(row['unread'], 0) if row else 0
+
+
+class NotificationPipeline:
+    """Bounded write-behind queue for notification rows and Socket.IO emits.
+
+    A background worker drains the queue in batches, inserts the rows with one
+    executemany and one commit, then emits once per (event, room). When the
+    queue is full the producer waits up to ``put_timeout`` and then writes its
+    own item synchronously, so bursts slow submitters down instead of losing
+    notifications. A batch whose write fails (a pool timeout, a lost
+    connection) is retried ``retries`` times with doubling delays before its
+    rows are counted as dropped; its emits go out either way.
+    """
+
+    def __init__(self, emit, maxsize=10000, batch_size=200, put_timeout=0.5, retries=5, retry_delay=0.1):
+        self.queue = queue.Queue(maxsize)
+        self.batch_size = batch_size
+        self.put_timeout = put_timeout
+        self.retries = retries
+        self.retry_delay = retry_delay
+        self.emit = emit
+        self._worker = None
+        self._lock = threading.Lock()
+        # Metrics
+        self.published = 0
+        self.persisted = 0
+        self.emitted = 0
+        self.batches = 0
+        self.sync_writes = 0
+        self.retried = 0
+        self.dropped = 0
+        self.errors = 0
+        self.max_depth = 0
+
+    def start(self):
+        with self._lock:
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._run, name='notification-writer', daemon=True)
+                self._worker.start()
+
+    def stop(self, timeout=10.0):
+        """Drain everything queued so far, then stop the worker."""
+        with self._lock:
+            worker, self._worker = self._worker, None
+        if worker:
+            self.queue.put(_STOP)
+            worker.join(timeout)
+
+    def publish(self, event, payload, room, notification=None):
+        """Queue an emit and, optionally, notification rows to persist.
+
+        ``notification`` is a tuple in INSERT_NOTIFICATION column order, or a
+        list of them.
+        """
+        rows = [notification] if isinstance(notification, tuple) else list(notification or ())
+        item = (rows, event, payload, room)
+        self.published += 1
+        # Written in the caller without retries: its own change is already
+        # committed, so a failure must not fail (and get retried by) the request
+        if self._worker is None:
+            self._write([item], 0)
+            return
+        try:
+            self.queue.put(item, timeout=self.put_timeout)
+        except queue.Full:
+            self.sync_writes += 1
+            self._write([item], 0)
+            return
+        self.max_depth = max(self.max_depth, self.queue.qsize())
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            item = self.queue.get()
+            if item is _STOP:
+                break
+            batch = [item]
+            while len(batch) < self.batch_size:
+                try:
+                    item = self.queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+            self._write(batch, self.retries)
+
+    def _write(self, batch, retries):
+        delay = self.retry_delay
+        for attempt in range(retries + 1):
+            try:
+                self._persist(batch)
+                break
+            except Exception as e:
+                self.errors += 1
+                if attempt == retries:
+                    self.dropped += sum(len(rows) for rows, _, _, _ in batch)
+                    print(f"Error writing notifications, dropping {len(batch)} items: {e}")
+                    break
+                print(f"Error writing notifications, retrying in {delay:.1f}s: {e}")
+                self.retried += 1
+                time.sleep(delay)
+                delay *= 2
+        try:
+            self._emit(batch)
+        except Exception as e:
+            self.errors += 1
+            print(f"Error emitting notifications: {e}")
+
+    def _persist(self, batch):
+        rows = [row for item_rows, _, _, _ in batch for row in item_rows]
+        if rows:
+            unread = {}
+            for _, _, _, department_id, user_id, _, is_read in rows:
+                if not is_read:
+                    key = audience_key(department_id, user_id)
+                    unread[key] = unread.get(key, 0) + 1
+            with get_db(dictionary=False) as (connection, cursor):
+                cursor.executemany(INSERT_NOTIFICATION, rows)
+                adjust_unread(cursor, unread)
+                connection.commit()
+            self.persisted += len(rows)
+        self.batches += 1
+
+    def _emit(self, batch):
+        grouped = {}
+        for _, event, payload, room in batch:
+            grouped.setdefault((event, room), []).append(payload)
+        for (event, room), payloads in grouped.items():
+            if len(payloads) > 1 and event in BATCH_EVENTS:
+                batch_event, key = BATCH_EVENTS[event]
+                self.emit(batch_event, {key: payloads}, room=room)
+            else:
+                for payload in payloads:
+                    self.emit(event, payload, room=room)
+            self.emitted += 1
+
+    def stats(self):
+        return {
+            'depth': self.queue.qsize(),
+            'max_depth': self.max_depth,
+            'capacity': self.queue.maxsize,
+            'published': self.published,
+            'persisted': self.persisted,
+            'emitted': self.emitted,
+            'batches': self.batches,
+            'sync_writes': self.sync_writes,
+            'retried': self.retried,
+            'dropped': self.dropped,
+            'errors': self.errors
+        }
+
+
+pipeline = None
+
+
+def init_app(app, socketio):
+    global pipeline
+    if pipeline is not None:
+        pipeline.stop()
+    pipeline = NotificationPipeline(
+        socketio.emit,
+        maxsize=app.config.get('NOTIFICATION_QUEUE_SIZE', 10000),
+        batch_size=app.config.get('NOTIFICATION_BATCH_SIZE', 200)
+    )
+    app.extensions['notification_pipeline'] = pipeline
+    return pipeline
+
+
+def start():
+    """Start the background writer of this process; until then publish() writes synchronously."""
+    pipeline.start()
+
+
+def publish(event, payload, room, notification=None):
+    pipeline.publish(event, payload, room, notification)
+
+
+def purge(before, batch_size=1000):
+    """Delete notifications created before ``before``, oldest first.
+
+    Each batch is its own short transaction that also takes the deleted unread
+    rows off the counters, so the job can run alongside normal traffic.
+    Returns the number of rows deleted.
+    """
+    deleted = 0
+    while True:
+        with get_db() as (connection, cursor):
+            cursor.execute("""
+                SELECT id, department_id, user_id, is_read 
+                FROM notifications 
+                WHERE created_at < %s 
+                ORDER BY created_at, id 
+                LIMIT %s 
+                FOR UPDATE
+            """, (before, batch_size))
+            rows = cursor.fetchall()
+            if not rows:
+                break
+            ids = [row['id'] for row in rows]
+            cursor.execute(f"DELETE FROM notifications WHERE id IN ({', '.join(['%s'] * len(ids))})", ids)
+            unread = {}
+            for row in rows:
+                if not row['is_read']:
+                    key = audience_key(row['department_id'], row['user_id'])
+                    unread[key] = unread.get(key, 0) - 1
+            adjust_unread(cursor, unread)
+            connection.commit()
+        deleted += len(rows)
+        if len(rows) < batch_size:
+            break
+    return deleted
+
+
+@atexit.register
+def _drain_on_exit():
+    if pipeline is not None:
+        pipeline.stop()
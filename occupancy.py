@@ -0,0 +1,192 @@
+import json
+from datetime import timedelta
+
+import workdays
+
+# Rows are (department_id, day) with the approved and pending leaves covering
+# that working day. Values are deltas, merged into the existing row.
+UPSERT_OCCUPANCY = """
+    INSERT INTO department_occupancy (department_id, day, approved, pending)
+    VALUES (%s, %s, %s, %s)
+    ON DUPLICATE KEY UPDATE approved = approved + VALUES(approved),
+                            pending = pending + VALUES(pending)
+"""
+
+INSERT_OCCUPANCY = """
+    INSERT INTO department_occupancy (department_id, day, approved, pending)
+    VALUES (%s, %s, %s, %s)
+"""
+
+# Longest window served by /api/coverage
+MAX_WINDOW_DAYS = 366
+
+_rules = {'default': {}}
+_departments = {}
+
+
+def init_app(app):
+    """Load the max-concurrent-absence rules.
+
+    MAX_ABSENT caps how many people of a department may be away on one
+    working day and MAX_ABSENT_RATIO caps it as a share of the department's
+    headcount; the lower limit applies and 0 disables either. A
+    COVERAGE_RULES_FILE can override both per department:
+    {"departments": {"Support": {"max_absent": 2}}}.
+    """
+    default = {'max_absent': app.config.get('MAX_ABSENT', 0),
+               'max_absent_ratio': app.config.get('MAX_ABSENT_RATIO', 0)}
+    departments = {}
+    path = app.config.get('COVERAGE_RULES_FILE')
+    if path:
+        with open(path) as f:
+            data = json.load(f)
+        default.update(data.get('default', {}))
+        departments = data.get('departments', {})
+    _rules.clear()
+    _rules['default'] = default
+    _departments.clear()
+    _departments.update({name: dict(default, **rule) for name, rule in departments.items()})
+
+
+def limit_for(department, headcount):
+    """Most people of ``department`` allowed away on one day, or None without a rule."""
+    rule = _departments.get(department, _rules['default'])
+    limits = []
+    if rule.get('max_absent'):
+        limits.append(int(rule['max_absent']))
+    if rule.get('max_absent_ratio'):
+        limits.append(max(1, int(rule['max_absent_ratio'] * headcount)))
+    return min(limits) if limits else None
+
+
+def needs_headcount(department):
+    return bool(_departments.get(department, _rules['default']).get('max_absent_ratio'))
+
+
+def headcount(cursor, department_id):
+    cursor.execute("SELECT COUNT(*) AS people FROM users WHERE department_id = %s", (department_id,))
+    return cursor.fetchone()['people']
+
+
+def working_days(department, start, end):
+    return workdays.calendar_for(department).days(start, end)
+
+
+def submitted(department_id, department, start_date, end_date):
+    """Occupancy deltas for a newly submitted leave."""
+    return [((department_id, day), (0, 1)) for day in working_days(department, start_date, end_date)]
+
+
+def decided(leave, status):
+    """Occupancy deltas moving a pending leave to ``status``.
+
+    ``leave`` needs department_id, department, start_date and end_date.
+    """
+    approved = 1 if status == 'approved' else 0
+    return [((leave['department_id'], day), (approved, -1))
+            for day in working_days(leave['department'], leave['start_date'], leave['end_date'])]
+
+
+def record(cursor, deltas):
+    """Apply occupancy deltas in the caller's transaction.
+
+    As with analytics rollups, deltas for the same day are merged and rows
+    are written in key order so concurrent transactions lock them in the
+    same order.
+    """
+    merged = {}
+    for key, values in deltas:
+        current = merged.get(key, (0, 0))
+        merged[key] = (current[0] + values[0], current[1] + values[1])
+    if merged:
+        cursor.executemany(UPSERT_OCCUPANCY, [key + values for key, values in sorted(merged.items())])
+
+
+def over_limit(cursor, department_id, department, start_date, end_date):
+    """First day in the span booked beyond the department's rule, as (day, limit), or (None, limit).
+
+    Call after recording the new leave: the upsert has locked the span's
+    rows, so concurrent submits for the same days are checked one at a time.
+    Counts approved and pending leaves, which keeps approvals within the
+    rule as well. Reads one row per working day of the span.
+    """
+    limit = limit_for(department, headcount(cursor, department_id) if needs_headcount(department) else 0)
+    if limit is None:
+        return None, None
+    cursor.execute("""
+        SELECT day
+        FROM department_occupancy
+        WHERE department_id = %s AND day BETWEEN %s AND %s AND approved + pending > %s
+        ORDER BY day
+        LIMIT 1
+    """, (department_id, start_date, end_date, limit))
+    row = cursor.fetchone()
+    return (row['day'] if row else None), limit
+
+
+def window(cursor, department_id, start, end):
+    """{day: (approved, pending)} for the department's booked days in [start, end]."""
+    cursor.execute("""
+        SELECT day, approved, pending
+        FROM department_occupancy
+        WHERE department_id = %s AND day BETWEEN %s AND %s
+    """, (department_id, start, end))
+    return {row['day']: (row['approved'], row['pending']) for row in cursor.fetchall()}
+
+
+def rebuild_department(connection, department_id, department_name, chunk_size=5000):
+    """Recompute one department's occupancy from its approved and pending leaves.
+
+    Each leave adds +1 at its start and -1 the day after its end to a
+    difference map per status; one sweep over the changes then yields the
+    count for every day. As in analytics.rebuild_department, the opening
+    DELETE makes concurrent submits and decisions wait for the commit.
+    """
+    calendar = workdays.calendar_for(department_name)
+    changes = {}
+    cursor = connection.cursor(buffered=False)
+    try:
+        cursor.execute("DELETE FROM department_occupancy WHERE department_id = %s", (department_id,))
+        cursor.execute("""
+            SELECT status, start_date, end_date
+            FROM leaves
+            WHERE department_id = %s AND status IN ('approved', 'pending')
+        """, (department_id,))
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+            for status, start_date, end_date in rows:
+                index = 0 if status == 'approved' else 1
+                for day, step in ((start_date, 1), (end_date + timedelta(days=1), -1)):
+                    change = changes.setdefault(day, [0, 0])
+                    change[index] += step
+
+        occupancy = []
+        counts = [0, 0]
+        days = sorted(changes)
+        for day, following in zip(days, days[1:]):
+            counts = [counts[0] + changes[day][0], counts[1] + changes[day][1]]
+            if counts != [0, 0]:
+                occupancy.extend((department_id, working_day, counts[0], counts[1])
+                                 for working_day in calendar.days(day, following - timedelta(days=1)))
+        if occupancy:
+            cursor.executemany(INSERT_OCCUPANCY, occupancy)
+        connection.commit()
+    except Exception:
+        connection.rollback()
+        raise
+    finally:
+        cursor.close()
+    return len(occupancy)
+
+
+def rebuild(connection, chunk_size=5000):
+    """Recompute the occupancy of every department, one transaction each."""
+    cursor = connection.cursor()
+    cursor.execute("SELECT id, name FROM departments ORDER BY id")
+    department_rows = cursor.fetchall()
+    cursor.close()
+    connection.commit()
+    return sum(rebuild_department(connection, department_id, name, chunk_size)
+               for department_id, name in department_rows)
@@ -0,0 +1,108 @@
+import base64
+from datetime import datetime
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+LEAVE_STATUSES = ('pending', 'approved', 'rejected')
+LEAVE_TYPES = ('vacation', 'sick', 'other')
+
+
+def encode_cursor(row, column='submitted_at'):
+    position = row[column]
+    if isinstance(position, datetime):
+        position = position.isoformat()
+    raw = f"{position}|{row['id']}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(value):
+    try:
+        raw = base64.urlsafe_b64decode(value + '=' * (-len(value) % 4)).decode()
+        position, row_id = raw.rsplit('|', 1)
+        return datetime.fromisoformat(position), int(row_id)
+    except (ValueError, UnicodeDecodeError):
+        raise ValueError('Invalid cursor')
+
+
+def parse_page_size(args):
+    try:
+        limit = int(args.get('limit', DEFAULT_PAGE_SIZE))
+    except ValueError:
+        raise ValueError('limit must be an integer')
+    return max(1, min(limit, MAX_PAGE_SIZE))
+
+
+def parse_date(value, name):
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    except ValueError:
+        raise ValueError(f'{name} must be a date in YYYY-MM-DD format')
+
+
+def leave_filters(args):
+    """Translate status/leave_type/start/end query parameters into SQL conditions.
+
+    ``start`` and ``end`` select leaves whose dates overlap the given range.
+    """
+    clauses = []
+    params = []
+
+    status = args.get('status')
+    if status and status != 'all':
+        if status not in LEAVE_STATUSES:
+            raise ValueError(f'status must be one of {", ".join(LEAVE_STATUSES)}')
+        clauses.append('status = %s')
+        params.append(status)
+
+    leave_type = args.get('leave_type')
+    if leave_type and leave_type != 'all':
+        if leave_type not in LEAVE_TYPES:
+            raise ValueError(f'leave_type must be one of {", ".join(LEAVE_TYPES)}')
+        clauses.append('leave_type = %s')
+        params.append(leave_type)
+
+    if args.get('start'):
+        clauses.append('end_date >= %s')
+        params.append(parse_date(args['start'], 'start'))
+    if args.get('end'):
+        clauses.append('start_date <= %s')
+        params.append(parse_date(args['end'], 'end'))
+
+    return clauses, params
+
+
+def keyset_page(cursor, select, clauses, params, args, column='submitted_at'):
+    """Fetch one page ordered by (column, id) DESC.
+
+    ``column`` is a timestamp column selected by ``select``. Works with dict
+    and tuple cursors. Returns the rows and the cursor for the next page
+    (None on the last page).
+    """
+    clauses = list(clauses)
+    params = list(params)
+    limit = parse_page_size(args)
+
+    if args.get('cursor'):
+        position, row_id = decode_cursor(args['cursor'])
+        clauses.append(f'({column} < %s OR ({column} = %s AND id < %s))')
+        params.extend([position, position, row_id])
+
+    query = f"""
+        {select}
+        WHERE {' AND '.join(clauses)}
+        ORDER BY {column} DESC, id DESC
+        LIMIT %s
+    """
+    cursor.execute(query, params + [limit + 1])
+    rows = cursor.fetchall()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        if not isinstance(last, dict):
+            # Tuple cursor: name the values from the result description
+            last = dict(zip((description[0] for description in cursor.description), last))
+        next_cursor = encode_cursor(last, column)
+    return rows, next_cursor
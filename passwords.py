@@ -0,0 +1,143 @@
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import cached_property
+
+from werkzeug.security import generate_password_hash, check_password_hash
+
+from db import blocking_executor
+
+
+def _exit_with_parent(parent_pid):
+    """Worker initializer: exit once the server process is gone.
+
+    Workers block reading a queue whose write end they also hold, so they
+    would otherwise outlive a server killed with SIGTERM.
+    """
+    def watch():
+        while os.getppid() == parent_pid:
+            time.sleep(1)
+        os._exit(0)
+    threading.Thread(target=watch, daemon=True).start()
+
+
+class PasswordHasher:
+    """Werkzeug password hashing with configurable cost, run off the request thread.
+
+    ``method`` is any Werkzeug method string ('scrypt', 'scrypt:16384:8:1',
+    'pbkdf2:sha256:600000', ...). With ``workers`` > 0 hashing runs in a
+    process pool so a login storm uses every core; under eventlet/gevent it
+    runs on the green library's native thread pool instead, since hashlib
+    releases the GIL and a process pool's helper threads would block the hub.
+    Until start() is called hashing runs in the calling thread.
+    """
+
+    def __init__(self, method='scrypt', salt_length=16, workers=0, async_mode='threading'):
+        self.method = method
+        self.salt_length = salt_length
+        self.workers = workers
+        self._pool = None
+        self._offload = blocking_executor(async_mode)
+        self._lock = threading.Lock()
+        # Metrics
+        self.hashed = 0
+        self.verified = 0
+        self.rehashed = 0
+
+    @cached_property
+    def prefix(self):
+        """Canonical prefix of hashes made with the current parameters.
+
+        Found by hashing, which costs as much as a login, so it is computed on
+        first use (or by warm-up) rather than at import.
+        """
+        return generate_password_hash('', self.method, self.salt_length).split('$', 1)[0]
+
+    def start(self):
+        """Fork the worker processes, if any. Call while the process is still single-threaded."""
+        if self.workers and not self._offload and self._pool is None:
+            self._pool = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context('fork'),
+                                             initializer=_exit_with_parent, initargs=(os.getpid(),))
+            list(self._pool.map(abs, range(self.workers)))
+
+    def _run(self, func, *args):
+        if self._pool:
+            return self._pool.submit(func, *args).result()
+        if self._offload:
+            return self._offload(func, *args)
+        return func(*args)
+
+    def hash(self, password):
+        with self._lock:
+            self.hashed += 1
+        return self._run(generate_password_hash, password, self.method, self.salt_length)
+
+    def verify(self, pwhash, password):
+        with self._lock:
+            self.verified += 1
+        return self._run(check_password_hash, pwhash, password)
+
+    def needs_rehash(self, pwhash):
+        return pwhash.split('$', 1)[0] != self.prefix
+
+    def upgrade(self, pwhash, password):
+        """New hash for a just-verified password if its parameters are outdated, else None."""
+        if not self.needs_rehash(pwhash):
+            return None
+        with self._lock:
+            self.rehashed += 1
+        return self.hash(password)
+
+    def close(self):
+        if self._pool:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    def stats(self):
+        return {
+            'method': self.prefix,
+            'workers': self._pool._max_workers if self._pool else 0,
+            'hashed': self.hashed,
+            'verified': self.verified,
+            'rehashed': self.rehashed
+        }
+
+
+hasher = PasswordHasher()
+
+
+def init_app(app):
+    """Configure hashing from PASSWORD_HASH_METHOD, PASSWORD_SALT_LENGTH and PASSWORD_HASH_WORKERS.
+
+    The worker processes are forked by start(), which each server process
+    calls before anything starts background threads.
+    """
+    global hasher
+    hasher.close()
+    workers = app.config.get('PASSWORD_HASH_WORKERS')
+    hasher = PasswordHasher(
+        method=app.config.get('PASSWORD_HASH_METHOD', 'scrypt'),
+        salt_length=app.config.get('PASSWORD_SALT_LENGTH', 16),
+        workers=os.cpu_count() if workers is None else workers,
+        async_mode=app.config.get('ASYNC_MODE', 'threading')
+    )
+    app.extensions['password_hasher'] = hasher
+    return hasher
+
+
+def start():
+    hasher.start()
+
+
+def hash_password(password):
+    return hasher.hash(password)
+
+
+def verify_password(pwhash, password):
+    return hasher.verify(pwhash, password)
+
+
+def upgrade_hash(pwhash, password):
+    return hasher.upgrade(pwhash, password)
@@ -0,0 +1,177 @@
+import os
+import pickle
+import socket
+import struct
+import sys
+import threading
+import time
+
+import socketio
+
+DEFAULT_BROKER_PATH = '/tmp/leave-management-socketio.sock'
+
+# Frames are a 4-byte big-endian length followed by the payload
+HEADER = struct.Struct('!I')
+
+
+def _send_frame(sock, payload):
+    sock.sendall(HEADER.pack(len(payload)) + payload)
+
+
+def _recv_exact(sock, size):
+    buffer = bytearray()
+    while len(buffer) < size:
+        chunk = sock.recv(size - len(buffer))
+        if not chunk:
+            raise ConnectionError('Connection closed')
+        buffer += chunk
+    return bytes(buffer)
+
+
+def _recv_frame(sock):
+    (length,) = HEADER.unpack(_recv_exact(sock, HEADER.size))
+    return _recv_exact(sock, length)
+
+
+class UnixSocketManager(socketio.PubSubManager):
+    """Socket.IO client manager that shares events through a local broker.
+
+    A stand-in for Redis when several worker processes run on one host. Start
+    the broker with ``python realtime.py broker`` and set
+    SOCKETIO_MESSAGE_QUEUE=unix:///tmp/leave-management-socketio.sock in every
+    worker. Each worker keeps its own clients and rooms; emits are published
+    to the broker and delivered by every worker to its local room members.
+    """
+    name = 'unix'
+
+    def __init__(self, url='unix://' + DEFAULT_BROKER_PATH, channel='socketio', write_only=False, logger=None):
+        self.path = url[len('unix://'):]
+        self._publisher = None
+        self._publish_lock = threading.Lock()
+        super().__init__(channel=channel, write_only=write_only, logger=logger)
+
+    def _connect(self, role):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.connect(self.path)
+        _send_frame(sock, f'{role}:{self.channel}'.encode())
+        return sock
+
+    def _publish(self, data):
+        payload = pickle.dumps(data)
+        with self._publish_lock:
+            for retry in (False, True):
+                try:
+                    if self._publisher is None:
+                        self._publisher = self._connect('pub')
+                    _send_frame(self._publisher, payload)
+                    return
+                except OSError:
+                    if self._publisher is not None:
+                        self._publisher.close()
+                        self._publisher = None
+                    if retry:
+                        self._get_logger().error('Cannot publish to the broker... giving up')
+                    else:
+                        self._get_logger().error('Cannot publish to the broker... retrying')
+
+    def _listen(self):
+        retry_sleep = 1
+        while True:
+            try:
+                sock = self._connect('sub')
+                retry_sleep = 1
+                while True:
+                    yield pickle.loads(_recv_frame(sock))
+            except OSError:
+                self._get_logger().error(
+                    'Cannot receive from the broker... retrying in {} secs'.format(retry_sleep))
+                time.sleep(retry_sleep)
+                retry_sleep = min(retry_sleep * 2, 60)
+
+
+class Broker:
+    """Fans out frames from publisher connections to subscribers of the same channel."""
+
+    def __init__(self, path=DEFAULT_BROKER_PATH, send_timeout=5.0):
+        self.path = path
+        self.send_timeout = send_timeout
+        self._subscribers = {}
+        self._lock = threading.Lock()
+        self.frames = 0
+
+    def serve_forever(self):
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+        server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        server.bind(self.path)
+        os.chmod(self.path, 0o600)
+        server.listen(128)
+        print(f"Socket.IO broker listening on {self.path}")
+        try:
+            while True:
+                connection, _ = server.accept()
+                threading.Thread(target=self._handle, args=(connection,), daemon=True).start()
+        finally:
+            server.close()
+            os.unlink(self.path)
+
+    def _handle(self, connection):
+        channel = None
+        try:
+            role, channel = _recv_frame(connection).decode().split(':', 1)
+            if role == 'sub':
+                connection.settimeout(self.send_timeout)
+                with self._lock:
+                    self._subscribers.setdefault(channel, {})[connection] = threading.Lock()
+                # Subscribers never send; this returns when they disconnect
+                while True:
+                    try:
+                        if not connection.recv(1):
+                            break
+                    except socket.timeout:
+                        continue
+            else:
+                while True:
+                    self._fan_out(channel, _recv_frame(connection))
+        except (OSError, ValueError):
+            pass
+        finally:
+            self._drop(channel, connection)
+
+    def _fan_out(self, channel, payload):
+        self.frames += 1
+        with self._lock:
+            subscribers = list(self._subscribers.get(channel, {}).items())
+        for subscriber, send_lock in subscribers:
+            try:
+                with send_lock:
+                    _send_frame(subscriber, payload)
+            except OSError:
+                self._drop(channel, subscriber)
+
+    def _drop(self, channel, connection):
+        with self._lock:
+            self._subscribers.get(channel, {}).pop(connection, None)
+        connection.close()
+
+
+def socketio_options(config):
+    """Extra SocketIO() arguments for the configured SOCKETIO_MESSAGE_QUEUE.
+
+    ``unix://`` URLs use the local broker; any other URL (redis://, amqp://,
+    kafka://, zmq+tcp://) is handed to Flask-SocketIO's built-in managers.
+    """
+    url = config.get('SOCKETIO_MESSAGE_QUEUE')
+    if not url:
+        return {}
+    channel = config.get('SOCKETIO_CHANNEL', 'flask-socketio')
+    if url.startswith('unix://'):
+        return {'client_manager': UnixSocketManager(url, channel=channel)}
+    return {'message_queue': url, 'channel': channel}
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2 or sys.argv[1] != 'broker':
+        print("Usage: python realtime.py broker [socket path]")
+        sys.exit(1)
+    Broker(sys.argv[2] if len(sys.argv) > 2 else DEFAULT_BROKER_PATH).serve_forever()
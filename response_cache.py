@@ -0,0 +1,199 @@
+import fcntl
+import mmap
+import multiprocessing
+import os
+import struct
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from functools import wraps
+
+from flask import Response, make_response, request
+from werkzeug.http import is_resource_modified
+
+from identity import current_identity
+
+# Department ids are SMALLINT UNSIGNED; slot 0 holds the table's epoch
+SLOTS = 65536
+SLOT = struct.Struct('Q')
+
+
+def _now_ms():
+    return int(time.time() * 1000)
+
+
+class VersionTable:
+    """Per-department change versions in shared memory.
+
+    A version is the millisecond timestamp of the department's last change
+    and only ever increases. Departments never changed since the table was
+    created report the table's epoch. The anonymous mapping is shared with
+    worker processes forked after it is created; unrelated processes can
+    share a table through ``path``.
+    """
+
+    def __init__(self, path=None):
+        size = (SLOTS + 1) * SLOT.size
+        self._fd = None
+        if path:
+            self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+            if os.fstat(self._fd).st_size < size:
+                os.ftruncate(self._fd, size)
+            self._map = mmap.mmap(self._fd, size)
+            self._lock = threading.Lock()
+        else:
+            self._map = mmap.mmap(-1, size)
+            self._lock = multiprocessing.get_context('fork').Lock()
+        with self._locked():
+            if not SLOT.unpack_from(self._map, 0)[0]:
+                SLOT.pack_into(self._map, 0, _now_ms())
+
+    @contextmanager
+    def _locked(self):
+        with self._lock:
+            if self._fd is not None:
+                fcntl.flock(self._fd, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if self._fd is not None:
+                    fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+    @staticmethod
+    def _offset(department_id):
+        return (1 + department_id % SLOTS) * SLOT.size
+
+    def get(self, department_id):
+        return SLOT.unpack_from(self._map, self._offset(department_id))[0] or SLOT.unpack_from(self._map, 0)[0]
+
+    def bump(self, department_id):
+        offset = self._offset(department_id)
+        with self._locked():
+            version = max(self.get(department_id) + 1, _now_ms())
+            SLOT.pack_into(self._map, offset, version)
+        return version
+
+    def close(self):
+        self._map.close()
+        if self._fd is not None:
+            os.close(self._fd)
+
+
+class ResponseCache:
+    """LRU cache of response bodies bounded by total size in bytes.
+
+    Keys include the department version, so a change never needs an explicit
+    invalidation: entries for old versions stop being asked for and age out.
+    """
+
+    def __init__(self, max_bytes=0):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def set(self, key, body, headers):
+        # One response may use at most an eighth of the budget
+        if len(body) > self.max_bytes // 8:
+            return
+        with self._lock:
+            if key in self._entries:
+                return
+            self._entries[key] = (body, headers)
+            self._bytes += len(body)
+            while self._bytes > self.max_bytes:
+                _, (evicted, _) = self._entries.popitem(last=False)
+                self._bytes -= len(evicted)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions
+            }
+
+
+versions = None
+cache = ResponseCache()
+
+
+def init_app(app):
+    global versions
+    if versions is not None:
+        versions.close()
+    versions = VersionTable(app.config.get('RESPONSE_VERSION_FILE'))
+    cache.max_bytes = app.config.get('RESPONSE_CACHE_BYTES', 0)
+    cache.clear()
+    app.extensions['response_versions'] = versions
+    app.extensions['response_cache'] = cache
+
+
+def bump(department_id):
+    """Mark a department's leave data as changed. Call after the commit."""
+    return versions.bump(department_id)
+
+
+def department_versioned(view):
+    """Serve a department-scoped GET view with an ETag from the department version.
+
+    A request whose If-None-Match matches gets a 304 without running the view.
+    There is no Last-Modified: whole seconds cannot tell apart two changes
+    made within one second.
+    With RESPONSE_CACHE_BYTES set, bodies of 200 responses are kept per
+    (endpoint, department, version, query string).
+    """
+    @wraps(view)
+    def decorated_function(*args, **kwargs):
+        user = current_identity()
+        if not user:
+            return view(*args, **kwargs)
+
+        # Read before the view queries, so the version can only be older than the data
+        department_id = user['department_id']
+        version = versions.get(department_id)
+        etag = f'd{department_id}v{version}'
+
+        if not is_resource_modified(request.environ, etag=etag):
+            response = Response(status=304)
+        else:
+            key = (request.endpoint, department_id, version, request.query_string)
+            entry = cache.get(key) if cache.max_bytes else None
+            if entry:
+                response = Response(entry[0], headers=entry[1])
+            else:
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+                if cache.max_bytes and not response.is_streamed:
+                    cache.set(key, response.get_data(),
+                              [header for header in response.headers if header[0] != 'Content-Length'])
+
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = 'private, no-cache'
+        response.vary.add('Cookie')
+        return response
+    return decorated_function
@@ -1,9 +1,21 @@
 -- MySQL database schema for Leave Management System
 
 -- Drop tables if they exist (for clean setup)
+DROP TABLE IF EXISTS balance_runs;
+DROP TABLE IF EXISTS balance_ledger;
+DROP TABLE IF EXISTS department_occupancy;
+DROP TABLE IF EXISTS leave_rollups;
+DROP TABLE IF EXISTS notification_counters;
 DROP TABLE IF EXISTS notifications;
 DROP TABLE IF EXISTS leaves;
 DROP TABLE IF EXISTS users;
+DROP TABLE IF EXISTS departments;
+
+-- Create departments table; other tables reference it by a 2-byte id
+CREATE TABLE departments (
+    id SMALLINT UNSIGNED AUTO_INCREMENT PRIMARY KEY,
+    name VARCHAR(100) UNIQUE NOT NULL
+);
 
 -- Create users table
 CREATE TABLE users (
@@ -12,21 +24,22 @@ CREATE TABLE users (
     email VARCHAR(255) UNIQUE NOT NULL,
     password VARCHAR(255) NOT NULL,
     role ENUM('employee', 'manager') DEFAULT 'employee',
-    department VARCHAR(100) DEFAULT 'General',
+    department_id SMALLINT UNSIGNED NOT NULL,
     vacation_balance INT DEFAULT 20,
     sick_balance INT DEFAULT 10,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (department_id) REFERENCES departments(id),
     INDEX idx_email (email),
     INDEX idx_role (role),
-    INDEX idx_department (department)
+    INDEX idx_department_role (department_id, role)
 );
 
 -- Create leaves table
+-- Employee and department names are resolved at read time, never copied here
 CREATE TABLE leaves (
     id INT AUTO_INCREMENT PRIMARY KEY,
     user_id INT NOT NULL,
-    user_name VARCHAR(255) NOT NULL,
-    department VARCHAR(100) NOT NULL,
+    department_id SMALLINT UNSIGNED NOT NULL,
     leave_type ENUM('vacation', 'sick', 'other') NOT NULL,
     start_date DATE NOT NULL,
     end_date DATE NOT NULL,
@@ -37,23 +50,102 @@ CREATE TABLE leaves (
     approved_by VARCHAR(255),
     approved_at TIMESTAMP NULL,
     FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE,
-    INDEX idx_user_id (user_id),
+    FOREIGN KEY (department_id) REFERENCES departments(id),
+    -- Keyset pagination on (submitted_at, id) per user and per department
+    INDEX idx_user_submitted (user_id, submitted_at, id),
+    INDEX idx_department_submitted (department_id, submitted_at, id),
+    INDEX idx_department_status_submitted (department_id, status, submitted_at, id),
+    -- Calendar windows: end_date >= window start AND start_date <= window end
+    INDEX idx_calendar_window (department_id, status, end_date, start_date),
     INDEX idx_status (status),
-    INDEX idx_department (department),
     INDEX idx_dates (start_date, end_date)
 );
 
 -- Create notifications table
+-- A row is addressed either to a department's managers (department_id set)
+-- or to one user (user_id set)
 CREATE TABLE notifications (
     id INT AUTO_INCREMENT PRIMARY KEY,
     type VARCHAR(50) NOT NULL,
     message TEXT NOT NULL,
     leave_id INT,
-    department VARCHAR(100),
+    department_id SMALLINT UNSIGNED NULL,
+    user_id INT NULL,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     is_read BOOLEAN DEFAULT FALSE,
     FOREIGN KEY (leave_id) REFERENCES leaves(id) ON DELETE CASCADE,
+    FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE,
+    FOREIGN KEY (department_id) REFERENCES departments(id),
     INDEX idx_leave_id (leave_id),
+    -- Retention purges scan by age
     INDEX idx_created_at (created_at),
-    INDEX idx_department (department)
+    -- Inbox pages and unread filters per audience, newest first
+    INDEX idx_department_read_created (department_id, is_read, created_at, id),
+    INDEX idx_user_read_created (user_id, is_read, created_at, id)
+);
+
+-- Unread notifications per audience ('department:<id>' or 'user:<id>'),
+-- maintained alongside every insert, mark-read and purge
+CREATE TABLE notification_counters (
+    audience VARCHAR(120) PRIMARY KEY,
+    unread INT NOT NULL DEFAULT 0
+);
+
+-- Leave usage per department, month (of start_date), leave type and status.
+-- Kept current by submits and decisions; `flask --app app rebuild-analytics`
+-- recomputes it from leaves
+CREATE TABLE leave_rollups (
+    department_id SMALLINT UNSIGNED NOT NULL,
+    month DATE NOT NULL,
+    leave_type ENUM('vacation', 'sick', 'other') NOT NULL,
+    status ENUM('pending', 'approved', 'rejected') NOT NULL,
+    leave_count INT NOT NULL DEFAULT 0,
+    day_count INT NOT NULL DEFAULT 0,
+    -- Decided leaves and their summed approved_at - submitted_at
+    decided_count INT NOT NULL DEFAULT 0,
+    latency_seconds BIGINT NOT NULL DEFAULT 0,
+    PRIMARY KEY (department_id, month, leave_type, status),
+    FOREIGN KEY (department_id) REFERENCES departments(id)
+);
+
+-- Every change to a balance, signed in days. users.vacation_balance and
+-- users.sick_balance are kept equal to the ledger totals in the same
+-- transaction, so balance reads never sum the ledger
+CREATE TABLE balance_ledger (
+    id BIGINT AUTO_INCREMENT PRIMARY KEY,
+    user_id INT NOT NULL,
+    leave_type ENUM('vacation', 'sick') NOT NULL,
+    entry_type ENUM('opening', 'grant', 'deduction', 'expiry') NOT NULL,
+    days INT NOT NULL,
+    leave_id INT NULL,
+    run_id VARCHAR(40) NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE,
+    FOREIGN KEY (leave_id) REFERENCES leaves(id) ON DELETE SET NULL,
+    -- A batch run writes at most one entry per user and leave type
+    UNIQUE KEY uniq_run_user_type (run_id, user_id, leave_type),
+    -- Balance history per user, newest first
+    INDEX idx_user_created (user_id, created_at, id)
+);
+
+-- Accrual and expiry runs; a run resumes after last_user_id and is skipped
+-- once completed
+CREATE TABLE balance_runs (
+    run_id VARCHAR(40) PRIMARY KEY,
+    last_user_id INT NOT NULL DEFAULT 0,
+    users INT NOT NULL DEFAULT 0,
+    started_at TIMESTAMP NULL,
+    completed_at TIMESTAMP NULL
+);
+
+-- Absences per department and working day: approved and pending leaves
+-- covering the day. Kept current by submits and decisions;
+-- `flask --app app rebuild-coverage` recomputes it from leaves
+CREATE TABLE department_occupancy (
+    department_id SMALLINT UNSIGNED NOT NULL,
+    day DATE NOT NULL,
+    approved INT NOT NULL DEFAULT 0,
+    pending INT NOT NULL DEFAULT 0,
+    PRIMARY KEY (department_id, day),
+    FOREIGN KEY (department_id) REFERENCES departments(id)
 );
@@ -0,0 +1,113 @@
+-- SQLite stand-in schema for local development and testing (DB_BACKEND=sqlite)
+-- Mirrors scripts/create_tables.sql
+
+DROP TABLE IF EXISTS balance_runs;
+DROP TABLE IF EXISTS balance_ledger;
+DROP TABLE IF EXISTS department_occupancy;
+DROP TABLE IF EXISTS leave_rollups;
+DROP TABLE IF EXISTS notification_counters;
+DROP TABLE IF EXISTS notifications;
+DROP TABLE IF EXISTS leaves;
+DROP TABLE IF EXISTS users;
+DROP TABLE IF EXISTS departments;
+
+CREATE TABLE departments (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name VARCHAR(100) UNIQUE NOT NULL
+);
+
+CREATE TABLE users (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name VARCHAR(255) NOT NULL,
+    email VARCHAR(255) UNIQUE NOT NULL,
+    password VARCHAR(255) NOT NULL,
+    role TEXT DEFAULT 'employee' CHECK (role IN ('employee', 'manager')),
+    department_id INT NOT NULL REFERENCES departments(id),
+    vacation_balance INT DEFAULT 20,
+    sick_balance INT DEFAULT 10,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+CREATE INDEX idx_users_role ON users (role);
+CREATE INDEX idx_users_department ON users (department_id, role);
+
+CREATE TABLE leaves (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id INT NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    department_id INT NOT NULL REFERENCES departments(id),
+    leave_type TEXT NOT NULL CHECK (leave_type IN ('vacation', 'sick', 'other')),
+    start_date DATE NOT NULL,
+    end_date DATE NOT NULL,
+    reason TEXT,
+    status TEXT DEFAULT 'pending' CHECK (status IN ('pending', 'approved', 'rejected')),
+    submitted_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    manager_comment TEXT,
+    approved_by VARCHAR(255),
+    approved_at TIMESTAMP NULL
+);
+CREATE INDEX idx_leaves_user_submitted ON leaves (user_id, submitted_at, id);
+CREATE INDEX idx_leaves_department_submitted ON leaves (department_id, submitted_at, id);
+CREATE INDEX idx_leaves_department_status_submitted ON leaves (department_id, status, submitted_at, id);
+CREATE INDEX idx_leaves_calendar_window ON leaves (department_id, status, end_date, start_date);
+CREATE INDEX idx_leaves_status ON leaves (status);
+CREATE INDEX idx_leaves_dates ON leaves (start_date, end_date);
+
+CREATE TABLE notifications (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    type VARCHAR(50) NOT NULL,
+    message TEXT NOT NULL,
+    leave_id INT REFERENCES leaves(id) ON DELETE CASCADE,
+    department_id INT REFERENCES departments(id),
+    user_id INT REFERENCES users(id) ON DELETE CASCADE,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    is_read BOOLEAN DEFAULT FALSE
+);
+CREATE INDEX idx_notifications_leave_id ON notifications (leave_id);
+CREATE INDEX idx_notifications_created_at ON notifications (created_at);
+CREATE INDEX idx_notifications_department_read_created ON notifications (department_id, is_read, created_at, id);
+CREATE INDEX idx_notifications_user_read_created ON notifications (user_id, is_read, created_at, id);
+
+CREATE TABLE notification_counters (
+    audience VARCHAR(120) PRIMARY KEY,
+    unread INT NOT NULL DEFAULT 0
+);
+
+CREATE TABLE leave_rollups (
+    department_id INT NOT NULL REFERENCES departments(id),
+    month DATE NOT NULL,
+    leave_type TEXT NOT NULL CHECK (leave_type IN ('vacation', 'sick', 'other')),
+    status TEXT NOT NULL CHECK (status IN ('pending', 'approved', 'rejected')),
+    leave_count INT NOT NULL DEFAULT 0,
+    day_count INT NOT NULL DEFAULT 0,
+    decided_count INT NOT NULL DEFAULT 0,
+    latency_seconds BIGINT NOT NULL DEFAULT 0,
+    PRIMARY KEY (department_id, month, leave_type, status)
+);
+
+CREATE TABLE balance_ledger (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id INT NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    leave_type TEXT NOT NULL CHECK (leave_type IN ('vacation', 'sick')),
+    entry_type TEXT NOT NULL CHECK (entry_type IN ('opening', 'grant', 'deduction', 'expiry')),
+    days INT NOT NULL,
+    leave_id INT REFERENCES leaves(id) ON DELETE SET NULL,
+    run_id VARCHAR(40),
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    UNIQUE (run_id, user_id, leave_type)
+);
+CREATE INDEX idx_balance_ledger_user_created ON balance_ledger (user_id, created_at, id);
+
+CREATE TABLE balance_runs (
+    run_id VARCHAR(40) PRIMARY KEY,
+    last_user_id INT NOT NULL DEFAULT 0,
+    users INT NOT NULL DEFAULT 0,
+    started_at TIMESTAMP NULL,
+    completed_at TIMESTAMP NULL
+);
+
+CREATE TABLE department_occupancy (
+    department_id INT NOT NULL REFERENCES departments(id),
+    day DATE NOT NULL,
+    approved INT NOT NULL DEFAULT 0,
+    pending INT NOT NULL DEFAULT 0,
+    PRIMARY KEY (department_id, day)
+);
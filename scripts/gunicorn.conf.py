@@ -0,0 +1,21 @@
+# Prefork deployment: the app is built once in the Gunicorn master and every
+# worker is forked from it, sharing the loaded calendars, departments,
+# identities, templates and response version table.
+#
+#   gunicorn -c scripts/gunicorn.conf.py -w 4 -b 0.0.0.0:5000
+#
+# Socket.IO clients need sticky sessions and SOCKETIO_MESSAGE_QUEUE when
+# there is more than one worker.
+import os
+
+os.environ['PREFORK'] = '1'
+
+wsgi_app = 'app:create_app()'
+preload_app = True
+
+
+def post_worker_init(worker):
+    # Connections, the notification writer and hashing processes belong to
+    # one process, so each worker starts its own before taking requests
+    import app
+    app.start_worker(worker.wsgi)
@@ -0,0 +1,22 @@
+-- Notification inbox: per-user rows, audience indexes and unread counters
+-- Apply to an existing MySQL database created before the inbox endpoints:
+--   mysql -u root -p leave_management < scripts/migrations/001_notification_inbox.sql
+
+ALTER TABLE notifications
+    ADD COLUMN user_id INT NULL AFTER department,
+    ADD CONSTRAINT fk_notifications_user FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE,
+    ADD INDEX idx_department_read_created (department, is_read, created_at, id),
+    ADD INDEX idx_user_read_created (user_id, is_read, created_at, id),
+    DROP INDEX idx_department;
+
+CREATE TABLE notification_counters (
+    audience VARCHAR(120) PRIMARY KEY,
+    unread INT NOT NULL DEFAULT 0
+);
+
+-- Existing rows are all addressed to departments
+INSERT INTO notification_counters (audience, unread)
+SELECT CONCAT('department:', department), COUNT(*)
+FROM notifications
+WHERE is_read = FALSE AND department IS NOT NULL
+GROUP BY department;
@@ -0,0 +1,221 @@
+"""Online migration: key leaves, users and notifications by department_id.
+
+Moves an existing MySQL database from copied names (leaves.user_name,
+leaves.department, users.department, notifications.department) to a
+departments table referenced by a SMALLINT id. Run the steps in order:
+
+    python scripts/migrations/002_department_ids.py expand
+    python scripts/migrations/002_department_ids.py backfill
+    # deploy the application version that reads department_id
+    python scripts/migrations/002_department_ids.py backfill   # rows written during the deploy
+    python scripts/migrations/002_department_ids.py contract
+
+expand only adds nullable columns (ALGORITHM=INSTANT where possible) and
+relaxes the old NOT NULL columns so both application versions can write.
+backfill updates rows in primary-key chunks, committing after each chunk,
+so locks are short and replicas keep up. contract makes the new columns
+NOT NULL, swaps the indexes over to department_id (whichever of them the
+database has, starting from the original schema) and drops the old
+columns. Every step can be re-run.
+"""
+import argparse
+import os
+import sys
+import time
+
+import mysql.connector
+
+# Tables whose rows carry a department name to translate
+BACKFILL_TABLES = ('users', 'leaves', 'notifications')
+
+
+def get_db_connection():
+    return mysql.connector.connect(
+        host=os.environ.get('DB_HOST', 'localhost'),
+        database=os.environ.get('DB_NAME', 'leave_management'),
+        user=os.environ.get('DB_USER', 'root'),
+        password=os.environ.get('DB_PASSWORD', '')
+    )
+
+
+def column_exists(cursor, table, column):
+    cursor.execute("""
+        SELECT 1 FROM information_schema.columns
+        WHERE table_schema = DATABASE() AND table_name = %s AND column_name = %s
+    """, (table, column))
+    return cursor.fetchone() is not None
+
+
+def index_exists(cursor, table, index):
+    cursor.execute("""
+        SELECT 1 FROM information_schema.statistics
+        WHERE table_schema = DATABASE() AND table_name = %s AND index_name = %s
+    """, (table, index))
+    return cursor.fetchone() is not None
+
+
+def drop_index(cursor, table, index):
+    """A DROP INDEX clause for an ALTER TABLE, or '' when the index does not exist.
+
+    Databases created from the original schema lack the composite indexes
+    that later versions of create_tables.sql added.
+    """
+    return f'DROP INDEX {index},' if index_exists(cursor, table, index) else ''
+
+
+def expand(connection, cursor, args):
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS departments (
+            id SMALLINT UNSIGNED AUTO_INCREMENT PRIMARY KEY,
+            name VARCHAR(100) UNIQUE NOT NULL
+        )
+    """)
+    for table in BACKFILL_TABLES:
+        if not column_exists(cursor, table, 'department_id'):
+            print(f"Adding {table}.department_id")
+            cursor.execute(f"ALTER TABLE {table} ADD COLUMN department_id SMALLINT UNSIGNED NULL, ALGORITHM=INSTANT")
+    # The new application version no longer writes these
+    cursor.execute("""
+        ALTER TABLE leaves
+            MODIFY user_name VARCHAR(255) NULL,
+            MODIFY department VARCHAR(100) NULL,
+            ALGORITHM=INPLACE, LOCK=NONE
+    """)
+    connection.commit()
+    print("Expand complete")
+
+
+def backfill(connection, cursor, args):
+    # Departments first, including any created by the old version since the last run
+    for table in BACKFILL_TABLES:
+        if column_exists(cursor, table, 'department'):
+            cursor.execute(f"""
+                INSERT IGNORE INTO departments (name)
+                SELECT DISTINCT department FROM {table} WHERE department IS NOT NULL
+            """)
+    connection.commit()
+
+    for table in BACKFILL_TABLES:
+        if not column_exists(cursor, table, 'department'):
+            continue
+        cursor.execute(f"SELECT MIN(id), MAX(id) FROM {table}")
+        low, high = cursor.fetchone()
+        if low is None:
+            continue
+        updated = 0
+        for start in range(low, high + 1, args.chunk_size):
+            cursor.execute(f"""
+                UPDATE {table} t
+                JOIN departments d ON d.name = t.department
+                SET t.department_id = d.id
+                WHERE t.id BETWEEN %s AND %s AND t.department_id IS NULL
+            """, (start, start + args.chunk_size - 1))
+            updated += cursor.rowcount
+            connection.commit()
+            print(f"\r{table}: ids up to {min(start + args.chunk_size - 1, high)} of {high}, {updated} rows updated",
+                  end='', flush=True)
+            if args.pause:
+                time.sleep(args.pause)
+        print()
+
+    rebuild_counters(connection, cursor)
+    print("Backfill complete")
+
+
+def rebuild_counters(connection, cursor):
+    """Re-key department unread counters from names to ids."""
+    cursor.execute("DELETE FROM notification_counters WHERE audience LIKE 'department:%'")
+    cursor.execute("""
+        INSERT INTO notification_counters (audience, unread)
+        SELECT CONCAT('department:', department_id), COUNT(*)
+        FROM notifications
+        WHERE is_read = FALSE AND department_id IS NOT NULL
+        GROUP BY department_id
+    """)
+    connection.commit()
+
+
+def contract(connection, cursor, args):
+    for table, condition in (('users', 'department_id IS NULL'),
+                             ('leaves', 'department_id IS NULL'),
+                             ('notifications', 'department_id IS NULL AND department IS NOT NULL')):
+        if column_exists(cursor, table, 'department'):
+            cursor.execute(f"SELECT COUNT(*) FROM {table} WHERE {condition}")
+            (missing,) = cursor.fetchone()
+            if missing:
+                print(f"{table} has {missing} rows without department_id; run backfill first")
+                sys.exit(1)
+
+    # Rows were verified above; skip re-checking them while adding the foreign keys in place
+    cursor.execute("SET foreign_key_checks = 0")
+
+    if column_exists(cursor, 'users', 'department'):
+        print("Contracting users")
+        cursor.execute(f"""
+            ALTER TABLE users
+                MODIFY department_id SMALLINT UNSIGNED NOT NULL,
+                ADD CONSTRAINT fk_users_department FOREIGN KEY (department_id) REFERENCES departments(id),
+                ADD INDEX idx_department_role (department_id, role),
+                {drop_index(cursor, 'users', 'idx_department')}
+                DROP COLUMN department,
+                ALGORITHM=INPLACE, LOCK=NONE
+        """)
+
+    if column_exists(cursor, 'leaves', 'department'):
+        print("Contracting leaves")
+        add_user_index = ('' if index_exists(cursor, 'leaves', 'idx_user_submitted')
+                          else 'ADD INDEX idx_user_submitted (user_id, submitted_at, id),')
+        cursor.execute(f"""
+            ALTER TABLE leaves
+                MODIFY department_id SMALLINT UNSIGNED NOT NULL,
+                ADD CONSTRAINT fk_leaves_department FOREIGN KEY (department_id) REFERENCES departments(id),
+                {drop_index(cursor, 'leaves', 'idx_department')}
+                {drop_index(cursor, 'leaves', 'idx_department_submitted')}
+                ADD INDEX idx_department_submitted (department_id, submitted_at, id),
+                {drop_index(cursor, 'leaves', 'idx_department_status_submitted')}
+                ADD INDEX idx_department_status_submitted (department_id, status, submitted_at, id),
+                {drop_index(cursor, 'leaves', 'idx_calendar_window')}
+                ADD INDEX idx_calendar_window (department_id, status, end_date, start_date),
+                {add_user_index}
+                DROP COLUMN user_name,
+                DROP COLUMN department,
+                ALGORITHM=INPLACE, LOCK=NONE
+        """)
+
+    if column_exists(cursor, 'notifications', 'department'):
+        print("Contracting notifications")
+        cursor.execute(f"""
+            ALTER TABLE notifications
+                ADD CONSTRAINT fk_notifications_department FOREIGN KEY (department_id) REFERENCES departments(id),
+                {drop_index(cursor, 'notifications', 'idx_department_read_created')}
+                ADD INDEX idx_department_read_created (department_id, is_read, created_at, id),
+                DROP COLUMN department,
+                ALGORITHM=INPLACE, LOCK=NONE
+        """)
+
+    cursor.execute("SET foreign_key_checks = 1")
+    rebuild_counters(connection, cursor)
+    print("Contract complete")
+
+
+STEPS = {'expand': expand, 'backfill': backfill, 'contract': contract}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Move department names to department ids without downtime.')
+    parser.add_argument('step', choices=list(STEPS))
+    parser.add_argument('--chunk-size', type=int, default=5000, help='Rows per backfill UPDATE and commit')
+    parser.add_argument('--pause', type=float, default=0.05, help='Seconds to sleep between backfill chunks')
+    args = parser.parse_args()
+
+    connection = get_db_connection()
+    cursor = connection.cursor()
+    try:
+        STEPS[args.step](connection, cursor, args)
+    finally:
+        cursor.close()
+        connection.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,17 @@
+-- Analytics rollups: leave usage per department, month, leave type and status
+-- Apply to an existing MySQL database, then fill it from the leaves table:
+--   mysql -u root -p leave_management < scripts/migrations/003_leave_rollups.sql
+--   flask --app app rebuild-analytics
+
+CREATE TABLE leave_rollups (
+    department_id SMALLINT UNSIGNED NOT NULL,
+    month DATE NOT NULL,
+    leave_type ENUM('vacation', 'sick', 'other') NOT NULL,
+    status ENUM('pending', 'approved', 'rejected') NOT NULL,
+    leave_count INT NOT NULL DEFAULT 0,
+    day_count INT NOT NULL DEFAULT 0,
+    decided_count INT NOT NULL DEFAULT 0,
+    latency_seconds BIGINT NOT NULL DEFAULT 0,
+    PRIMARY KEY (department_id, month, leave_type, status),
+    FOREIGN KEY (department_id) REFERENCES departments(id)
+);
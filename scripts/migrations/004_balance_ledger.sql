@@ -0,0 +1,32 @@
+-- Balance ledger and batch runs. Apply to an existing MySQL database while no
+-- leaves are being approved; current balances become each user's opening entries:
+--   mysql -u root -p leave_management < scripts/migrations/004_balance_ledger.sql
+
+CREATE TABLE balance_ledger (
+    id BIGINT AUTO_INCREMENT PRIMARY KEY,
+    user_id INT NOT NULL,
+    leave_type ENUM('vacation', 'sick') NOT NULL,
+    entry_type ENUM('opening', 'grant', 'deduction', 'expiry') NOT NULL,
+    days INT NOT NULL,
+    leave_id INT NULL,
+    run_id VARCHAR(40) NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE,
+    FOREIGN KEY (leave_id) REFERENCES leaves(id) ON DELETE SET NULL,
+    UNIQUE KEY uniq_run_user_type (run_id, user_id, leave_type),
+    INDEX idx_user_created (user_id, created_at, id)
+);
+
+CREATE TABLE balance_runs (
+    run_id VARCHAR(40) PRIMARY KEY,
+    last_user_id INT NOT NULL DEFAULT 0,
+    users INT NOT NULL DEFAULT 0,
+    started_at TIMESTAMP NULL,
+    completed_at TIMESTAMP NULL
+);
+
+INSERT INTO balance_ledger (user_id, leave_type, entry_type, days, created_at)
+SELECT id, 'vacation', 'opening', vacation_balance, NOW() FROM users WHERE vacation_balance <> 0;
+
+INSERT INTO balance_ledger (user_id, leave_type, entry_type, days, created_at)
+SELECT id, 'sick', 'opening', sick_balance, NOW() FROM users WHERE sick_balance <> 0;
@@ -0,0 +1,13 @@
+-- Per-day department occupancy used by /api/coverage and the absence rules
+-- Apply to an existing MySQL database, then fill it from the leaves table:
+--   mysql -u root -p leave_management < scripts/migrations/005_department_occupancy.sql
+--   flask --app app rebuild-coverage
+
+CREATE TABLE department_occupancy (
+    department_id SMALLINT UNSIGNED NOT NULL,
+    day DATE NOT NULL,
+    approved INT NOT NULL DEFAULT 0,
+    pending INT NOT NULL DEFAULT 0,
+    PRIMARY KEY (department_id, day),
+    FOREIGN KEY (department_id) REFERENCES departments(id)
+);
@@ -1,97 +1,316 @@
+import argparse
+import os
+import random
+import time
+from itertools import islice
 import mysql.connector
 from mysql.connector import Error
 from werkzeug.security import generate_password_hash
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
+
+import analytics
+import balances
+import occupancy
+from db import SQLiteConnection
 
 def get_db_connection():
+    # Same settings as app.py; DB_BACKEND=sqlite seeds the SQLite stand-in
+    if os.environ.get('DB_BACKEND', 'mysql') == 'sqlite':
+        return SQLiteConnection(os.environ.get('SQLITE_PATH', 'leave_management.db'))
     try:
         connection = mysql.connector.connect(
-            host='localhost',
-            database='leave_management',
-            user='root',
-            password='Rajesh@857'  # Change this to your MySQL password
+            host=os.environ.get('DB_HOST', 'localhost'),
+            database=os.environ.get('DB_NAME', 'leave_management'),
+            user=os.environ.get('DB_USER', 'root'),
+            password=os.environ.get('DB_PASSWORD', '')
         )
         return connection
     except Error as e:
         print(f"Error connecting to MySQL: {e}")
         return None
 
-print("Seeding database...")
+user_query = """
+    INSERT INTO users (name, email, password, role, department_id, vacation_balance, sick_balance, created_at)
+    VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+"""
 
-connection = get_db_connection()
-if not connection:
-    print("Failed to connect to MySQL")
-    exit(1)
+leave_query = """
+    INSERT INTO leaves (user_id, department_id, leave_type, start_date, end_date,
+                       reason, status, submitted_at, manager_comment, approved_by, approved_at)
+    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+"""
 
-cursor = connection.cursor()
+# Generated users carry explicit ids so their leaves can reference them
+# without reading ids back after each batch
+generated_user_query = """
+    INSERT INTO users (id, name, email, password, role, department_id, vacation_balance, sick_balance, created_at)
+    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
+"""
 
-cursor.execute("DELETE FROM notifications")
-cursor.execute("DELETE FROM leaves")
-cursor.execute("DELETE FROM users")
-connection.commit()
+def clear_data(connection, cursor):
+    cursor.execute("DELETE FROM balance_runs")
+    cursor.execute("DELETE FROM balance_ledger")
+    cursor.execute("DELETE FROM department_occupancy")
+    cursor.execute("DELETE FROM leave_rollups")
+    cursor.execute("DELETE FROM notification_counters")
+    cursor.execute("DELETE FROM notifications")
+    cursor.execute("DELETE FROM leaves")
+    cursor.execute("DELETE FROM users")
+    cursor.execute("DELETE FROM departments")
+    connection.commit()
+    print("Cleared existing data")
 
-print("Cleared existing data")
+def department_ids(connection, cursor, names):
+    """Map department names to ids, creating the missing departments."""
+    cursor.execute("SELECT id, name FROM departments")
+    ids = {name: department_id for department_id, name in cursor.fetchall()}
+    missing = [(name,) for name in names if name not in ids]
+    if missing:
+        cursor.executemany("INSERT INTO departments (name) VALUES (%s)", missing)
+        connection.commit()
+        cursor.execute("SELECT id, name FROM departments")
+        ids = {name: department_id for department_id, name in cursor.fetchall()}
+    return ids
 
-users = [
-    ('John Manager', 'manager@company.com', generate_password_hash('manager123'), 'manager', 'Engineering', 25, 15, datetime.now()),
-    ('Lisa Marketing Manager', 'lisa@company.com', generate_password_hash('manager123'), 'manager', 'Marketing', 25, 15, datetime.now()),
-    ('Robert Sales Manager', 'robert@company.com', generate_password_hash('manager123'), 'manager', 'Sales', 25, 15, datetime.now()),
-    ('Sarah Smith', 'sarah@company.com', generate_password_hash('employee123'), 'employee', 'Engineering', 18, 8, datetime.now()),
-    ('Mike Johnson', 'mike@company.com', generate_password_hash('employee123'), 'employee', 'Marketing', 20, 10, datetime.now()),
-    ('Emily Davis', 'emily@company.com', generate_password_hash('employee123'), 'employee', 'Sales', 15, 7, datetime.now())
-]
+def seed_demo(connection, cursor):
+    manager_password = generate_password_hash('manager123')
+    employee_password = generate_password_hash('employee123')
+    ids = department_ids(connection, cursor, ['Engineering', 'Marketing', 'Sales'])
 
-user_query = """
-    INSERT INTO users (name, email, password, role, department, vacation_balance, sick_balance, created_at)
-    VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
-"""
+    users = [
+        ('John Manager', 'manager@company.com', manager_password, 'manager', ids['Engineering'], 25, 15, datetime.now()),
+        ('Lisa Marketing Manager', 'lisa@company.com', manager_password, 'manager', ids['Marketing'], 25, 15, datetime.now()),
+        ('Robert Sales Manager', 'robert@company.com', manager_password, 'manager', ids['Sales'], 25, 15, datetime.now()),
+        ('Sarah Smith', 'sarah@company.com', employee_password, 'employee', ids['Engineering'], 18, 8, datetime.now()),
+        ('Mike Johnson', 'mike@company.com', employee_password, 'employee', ids['Marketing'], 20, 10, datetime.now()),
+        ('Emily Davis', 'emily@company.com', employee_password, 'employee', ids['Sales'], 15, 7, datetime.now())
+    ]
+
+    user_ids = []
+    for user in users:
+        cursor.execute(user_query, user)
+        user_ids.append(cursor.lastrowid)
+
+    print(f"Created {len(user_ids)} users")
+
+    leaves = [
+        (user_ids[3], ids['Engineering'], 'vacation',
+         (datetime.now() + timedelta(days=10)).strftime('%Y-%m-%d'),
+         (datetime.now() + timedelta(days=14)).strftime('%Y-%m-%d'),
+         'Family vacation to Hawaii', 'pending', datetime.now(), None, None, None),
+
+        (user_ids[4], ids['Marketing'], 'sick',
+         (datetime.now() - timedelta(days=2)).strftime('%Y-%m-%d'),
+         (datetime.now() - timedelta(days=2)).strftime('%Y-%m-%d'),
+         'Medical appointment', 'approved', datetime.now() - timedelta(days=3),
+         'Approved. Get well soon!', 'Lisa Marketing Manager', datetime.now() - timedelta(days=2)),
+
+        (user_ids[5], ids['Sales'], 'vacation',
+         (datetime.now() + timedelta(days=30)).strftime('%Y-%m-%d'),
+         (datetime.now() + timedelta(days=35)).strftime('%Y-%m-%d'),
+         'Summer holiday', 'pending', datetime.now(), None, None, None)
+    ]
 
-user_ids = []
-for user in users:
-    cursor.execute(user_query, user)
+    cursor.executemany(leave_query, leaves)
     connection.commit()
-    user_ids.append(cursor.lastrowid)
-
-print(f"Created {len(user_ids)} users")
-
-leaves = [
-    (user_ids[3], 'Sarah Smith', 'Engineering', 'vacation', 
-     (datetime.now() + timedelta(days=10)).strftime('%Y-%m-%d'),
-     (datetime.now() + timedelta(days=14)).strftime('%Y-%m-%d'),
-     'Family vacation to Hawaii', 'pending', datetime.now(), None, None, None),
-    
-    (user_ids[4], 'Mike Johnson', 'Marketing', 'sick',
-     (datetime.now() - timedelta(days=2)).strftime('%Y-%m-%d'),
-     (datetime.now() - timedelta(days=2)).strftime('%Y-%m-%d'),
-     'Medical appointment', 'approved', datetime.now() - timedelta(days=3),
-     'Approved. Get well soon!', 'Lisa Marketing Manager', datetime.now() - timedelta(days=2)),
-    
-    (user_ids[5], 'Emily Davis', 'Sales', 'vacation',
-     (datetime.now() + timedelta(days=30)).strftime('%Y-%m-%d'),
-     (datetime.now() + timedelta(days=35)).strftime('%Y-%m-%d'),
-     'Summer holiday', 'pending', datetime.now(), None, None, None)
-]
 
-leave_query = """
-    INSERT INTO leaves (user_id, user_name, department, leave_type, start_date, end_date, 
-                       reason, status, submitted_at, manager_comment, approved_by, approved_at)
-    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-"""
+    print(f"Created {len(leaves)} leave requests")
+
+    print("\nTest Accounts:")
+    print("Engineering Manager: manager@company.com / manager123")
+    print("Marketing Manager: lisa@company.com / manager123")
+    print("Sales Manager: robert@company.com / manager123")
+    print("Engineering Employee: sarah@company.com / employee123")
+    print("Marketing Employee: mike@company.com / employee123")
+    print("Sales Employee: emily@company.com / employee123")
+
+# Synthetic data for load testing (python seed_db.py generate ...)
 
-for leave in leaves:
-    cursor.execute(leave_query, leave)
+DEPARTMENT_NAMES = ['Engineering', 'Marketing', 'Sales', 'Finance', 'HR', 'Operations',
+                    'Support', 'Legal', 'Product', 'Design']
+
+# leave type -> (weight, shortest, longest) in calendar days
+LEAVE_TYPE_MIX = {
+    'vacation': (0.6, 1, 10),
+    'sick': (0.3, 1, 3),
+    'other': (0.1, 1, 2)
+}
+
+REASONS = {
+    'vacation': ['Family vacation', 'Holiday trip', 'Personal time off', 'Visiting relatives'],
+    'sick': ['Flu', 'Medical appointment', 'Recovering from surgery'],
+    'other': ['Moving house', 'Jury duty', 'Wedding']
+}
+
+def parse_status_mix(value):
+    """Parse 'pending=0.1,approved=0.75,rejected=0.15' into normalised weights."""
+    mix = {}
+    for part in value.split(','):
+        status, _, weight = part.partition('=')
+        status = status.strip()
+        if status not in ('pending', 'approved', 'rejected'):
+            raise argparse.ArgumentTypeError(f'Unknown status in mix: {status}')
+        try:
+            mix[status] = float(weight)
+        except ValueError:
+            raise argparse.ArgumentTypeError(f'Invalid weight for {status}: {weight}')
+    total = sum(mix.values())
+    if total <= 0:
+        raise argparse.ArgumentTypeError('Status mix weights must add up to more than 0')
+    return {status: weight / total for status, weight in mix.items()}
+
+def department_names(count):
+    if count <= len(DEPARTMENT_NAMES):
+        return DEPARTMENT_NAMES[:count]
+    return [f'{DEPARTMENT_NAMES[i % len(DEPARTMENT_NAMES)]} {i // len(DEPARTMENT_NAMES) + 1}' for i in range(count)]
+
+def generate_users(args, first_id, password, created_at, ids):
+    """Yield (id, manager name, user row) for a manager and the employees of each department."""
+    rng = random.Random(f'{args.seed}:users')
+    user_id = first_id
+    for department in department_names(args.departments):
+        department_id = ids[department]
+        manager = f'{department} Manager'
+        slug = department.lower().replace(' ', '')
+        yield user_id, manager, (user_id, manager, f'manager.{slug}@loadtest.example', password, 'manager',
+                                 department_id, 25, 15, created_at)
+        user_id += 1
+        for number in range(1, args.employees + 1):
+            name = f'{department} Employee {number}'
+            yield user_id, manager, (user_id, name, f'employee{number}.{slug}@loadtest.example', password, 'employee',
+                                     department_id, rng.randint(0, 25), rng.randint(0, 10), created_at)
+            user_id += 1
+
+def generate_leaves(args, employees):
+    """Yield leave rows for every (id, department id, manager name) employee.
+
+    Each employee gets a Poisson-like number of leaves per year of history,
+    spread from ``years`` back to 60 days ahead of the anchor date. Leaves
+    that started more than two weeks before the anchor are never pending.
+    """
+    rng = random.Random(f'{args.seed}:leaves')
+    anchor = args.anchor
+    first_day = anchor - timedelta(days=365 * args.years)
+    span = (anchor + timedelta(days=60) - first_day).days
+    types = list(LEAVE_TYPE_MIX)
+    type_weights = [LEAVE_TYPE_MIX[leave_type][0] for leave_type in types]
+    statuses = list(args.status_mix)
+    status_weights = [args.status_mix[status] for status in statuses]
+    decided = [status for status in statuses if status != 'pending'] or ['approved']
+    decided_weights = [args.status_mix.get(status, 1) for status in decided]
+    pending_cutoff = anchor - timedelta(days=14)
+
+    for user_id, department_id, manager in employees:
+        count = sum(1 for _ in range(args.years * args.leaves_per_year * 2) if rng.random() < 0.5)
+        for _ in range(count):
+            leave_type = rng.choices(types, type_weights)[0]
+            _, shortest, longest = LEAVE_TYPE_MIX[leave_type]
+            start = first_day + timedelta(days=rng.randrange(span))
+            end = start + timedelta(days=rng.randint(shortest, longest) - 1)
+            submitted_at = datetime.combine(start, datetime.min.time()) - timedelta(
+                days=rng.randint(1, 30), seconds=rng.randrange(86400))
+            if start < pending_cutoff:
+                status = rng.choices(decided, decided_weights)[0]
+            else:
+                status = rng.choices(statuses, status_weights)[0]
+            if status == 'pending':
+                comment = approved_by = approved_at = None
+            else:
+                comment = None
+                approved_by = manager
+                approved_at = submitted_at + timedelta(seconds=rng.randrange(3 * 86400))
+            yield (user_id, department_id, leave_type, start, end, rng.choice(REASONS[leave_type]),
+                   status, submitted_at, comment, approved_by, approved_at)
+
+def insert_batches(connection, cursor, query, rows, batch_size, label):
+    """executemany ``rows`` in batches of ``batch_size``, committing after each batch."""
+    total = 0
+    started = time.monotonic()
+    rows = iter(rows)
+    while True:
+        batch = list(islice(rows, batch_size))
+        if not batch:
+            break
+        cursor.executemany(query, batch)
+        connection.commit()
+        total += len(batch)
+        elapsed = time.monotonic() - started
+        print(f"\r{label}: {total} rows ({total / elapsed if elapsed else 0:.0f} rows/s)", end='', flush=True)
+    print()
+    return total
+
+def seed_generated(connection, cursor, args):
+    cursor.execute("SELECT MAX(id) FROM users")
+    row = cursor.fetchone()
+    first_id = (row[0] or 0) + 1
+
+    # Synthetic users share one hash; hashing per user would dominate the run
+    password = generate_password_hash(args.password)
+    created_at = datetime.combine(args.anchor - timedelta(days=365 * args.years), datetime.min.time())
+    ids = department_ids(connection, cursor, department_names(args.departments))
+
+    employees = []
+    def users():
+        for user_id, manager, user in generate_users(args, first_id, password, created_at, ids):
+            if user[4] == 'employee':
+                employees.append((user_id, user[5], manager))
+            yield user
+
+    insert_batches(connection, cursor, generated_user_query, users(), args.batch_size, 'Users')
+    insert_batches(connection, cursor, leave_query, generate_leaves(args, employees), args.batch_size, 'Leaves')
+
+    print(f"\nAll synthetic accounts use the password: {args.password}")
+    print(f"Example manager: manager.{department_names(args.departments)[0].lower().replace(' ', '')}@loadtest.example")
+
+def main():
+    parser = argparse.ArgumentParser(description='Seed the leave management database.')
+    subparsers = parser.add_subparsers(dest='mode')
+    subparsers.add_parser('demo', help='Demo accounts and a few leaves (default)')
+
+    generate = subparsers.add_parser('generate', help='Synthetic data for load testing')
+    generate.add_argument('--departments', type=int, default=10)
+    generate.add_argument('--employees', type=int, default=100, help='Employees per department')
+    generate.add_argument('--years', type=int, default=3, help='Years of leave history')
+    generate.add_argument('--leaves-per-year', type=int, default=8, help='Average leaves per employee per year')
+    generate.add_argument('--status-mix', type=parse_status_mix, default='pending=0.1,approved=0.75,rejected=0.15',
+                          help='Relative status weights, e.g. pending=0.1,approved=0.75,rejected=0.15')
+    generate.add_argument('--seed', type=int, default=42, help='Random seed; the same seed and anchor give the same data')
+    generate.add_argument('--anchor', type=date.fromisoformat, default=date.today(),
+                          help='Date the history is generated around (YYYY-MM-DD, default today)')
+    generate.add_argument('--password', default='employee123', help='Password for every synthetic account')
+    generate.add_argument('--batch-size', type=int, default=5000, help='Rows per INSERT batch and commit')
+    generate.add_argument('--append', action='store_true', help='Keep existing data')
+    args = parser.parse_args()
+
+    print("Seeding database...")
+
+    connection = get_db_connection()
+    if not connection:
+        print("Failed to connect to MySQL")
+        exit(1)
+
+    cursor = connection.cursor()
+
+    if args.mode == 'generate':
+        if not args.append:
+            clear_data(connection, cursor)
+        seed_generated(connection, cursor, args)
+    else:
+        clear_data(connection, cursor)
+        seed_demo(connection, cursor)
+
+    # Balances were set directly, so they open the ledger
+    balances.record_opening(cursor, datetime.now())
     connection.commit()
 
-print(f"Created {len(leaves)} leave requests")
+    # Leaves were inserted directly, so compute their analytics rollups
+    print(f"Rebuilt {analytics.rebuild(connection)} analytics rollup rows")
+    print(f"Rebuilt {occupancy.rebuild(connection)} occupancy rows")
+
+    cursor.close()
+    connection.close()
 
-cursor.close()
-connection.close()
+    print("\nDatabase seeding completed!")
 
-print("\nTest Accounts:")
-print("Engineering Manager: manager@company.com / manager123")
-print("Marketing Manager: lisa@company.com / manager123")
-print("Sales Manager: robert@company.com / manager123")
-print("Engineering Employee: sarah@company.com / employee123")
-print("Marketing Employee: mike@company.com / employee123")
-print("Sales Employee: emily@company.com / employee123")
-print("\nDatabase seeding completed!")
+if __name__ == '__main__':
+    main()
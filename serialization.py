@@ -0,0 +1,88 @@
+import json
+from datetime import date
+from decimal import Decimal
+
+from flask import Response
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Rows encoded per chunk of a streamed JSON array
+STREAM_CHUNK_ROWS = 500
+
+
+def _default(value):
+    # Same output as orjson: ISO 8601 dates and datetimes
+    if isinstance(value, date):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    raise TypeError(f'Object of type {type(value).__name__} is not JSON serializable')
+
+
+def dumps(obj):
+    """Compact JSON bytes, using orjson when it is installed."""
+    if orjson is not None:
+        return orjson.dumps(obj, default=_default)
+    return json.dumps(obj, separators=(',', ':'), default=_default).encode()
+
+
+class RowSchema:
+    """Precompiled mapping from tuple-cursor rows to JSON-ready dicts.
+
+    ``fields`` lists the selected columns in order as ``(column, name,
+    convert)``; ``convert`` may be None to copy the value unchanged.
+    ``derived`` adds ``(name, column, convert)`` keys computed from another
+    column. Dates and datetimes are left for the encoder to write.
+    """
+
+    def __init__(self, fields, derived=()):
+        self.columns = tuple(column for column, _, _ in fields)
+        self.names = tuple(name for _, name, _ in fields)
+        self._converters = tuple((index, convert) for index, (_, _, convert) in enumerate(fields) if convert)
+        self._derived = tuple((name, self.columns.index(column), convert) for name, column, convert in derived)
+
+    def index(self, column):
+        return self.columns.index(column)
+
+    def row(self, values):
+        values = list(values)
+        for index, convert in self._converters:
+            values[index] = convert(values[index])
+        item = dict(zip(self.names, values))
+        for name, index, convert in self._derived:
+            item[name] = convert(values[index])
+        return item
+
+    def rows(self, rows):
+        row = self.row
+        return [row(values) for values in rows]
+
+    def from_dict(self, record):
+        return self.row([record[column] for column in self.columns])
+
+
+def json_response(obj, status=200):
+    return Response(dumps(obj), status=status, mimetype='application/json')
+
+
+def json_array_response(schema, rows):
+    """Serialize tuple rows as a JSON array.
+
+    Large results are streamed a chunk at a time so the full list of dicts
+    and the full body never exist at once.
+    """
+    if len(rows) <= STREAM_CHUNK_ROWS:
+        return json_response(schema.rows(rows))
+
+    def generate():
+        yield b'['
+        for start in range(0, len(rows), STREAM_CHUNK_ROWS):
+            chunk = dumps(schema.rows(rows[start:start + STREAM_CHUNK_ROWS]))
+            # Drop each chunk's brackets and join the chunks with commas
+            yield (b',' if start else b'') + chunk[1:-1]
+        yield b']'
+
+    return Response(generate(), mimetype='application/json')
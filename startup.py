@@ -0,0 +1,115 @@
+import gc
+import os
+import time
+from datetime import datetime, timedelta
+
+import db
+import departments
+import identity
+import passwords
+from db import get_db
+
+PAGE_TEMPLATES = ('login.html', 'employee_dashboard.html', 'manager_dashboard.html')
+
+
+class Startup:
+    """What this process loaded before taking traffic; behind /readyz and the app_startup_* gauges.
+
+    A worker forked from a preloaded parent inherits ``shared_loaded`` and
+    only warms its own connections.
+    """
+
+    def __init__(self):
+        self.pid = None
+        self.ready = False
+        self.shared_loaded = False
+        self.shared_seconds = 0.0
+        self.warm_seconds = 0.0
+        self.connections = 0
+        self.identities = 0
+
+    def stats(self):
+        return {
+            'ready': int(self.ready),
+            'shared_seconds': round(self.shared_seconds, 6),
+            'warm_seconds': round(self.warm_seconds, 6),
+            'connections': self.connections,
+            'identities': self.identities
+        }
+
+
+state = Startup()
+
+
+def load_shared(app):
+    """Load the read-only state every request path uses.
+
+    That is the department directory, the identities of managers and of
+    recently active employees, the password hash prefix (one hash) and the
+    compiled page templates. A prefork server calls this once in the parent,
+    so workers share the result instead of each loading it on first use.
+    """
+    started = time.perf_counter()
+    departments.load()
+    since = datetime.now() - timedelta(days=app.config.get('IDENTITY_WARM_DAYS', 30))
+    with get_db() as (connection, cursor):
+        cursor.execute("""
+            SELECT id, name, role, department_id
+            FROM users
+            WHERE role = 'manager' OR id IN (SELECT user_id FROM leaves WHERE submitted_at >= %s)
+            LIMIT %s
+        """, (since, app.config.get('IDENTITY_WARM_USERS', 1000)))
+        users = cursor.fetchall()
+    for user in users:
+        identity.remember(user)
+    passwords.hasher.prefix
+    for name in PAGE_TEMPLATES:
+        app.jinja_env.get_template(name)
+    state.identities = len(users)
+    state.shared_loaded = True
+    state.shared_seconds = time.perf_counter() - started
+
+
+def prepare_fork():
+    """Leave nothing in this process that a forked worker must not share.
+
+    Pooled connections are closed so no socket or SQLite handle crosses the
+    fork, and the loaded objects are moved out of the collector's reach so
+    a worker's collections do not write to (and copy) the shared pages.
+    """
+    db.get_pool().close()
+    gc.collect()
+    gc.freeze()
+
+
+def warm_up(app, statements=()):
+    """Open this process's connections and run ``statements`` once on each, then mark it ready.
+
+    ``statements`` are (sql, params) pairs of the hottest queries: SQLite
+    compiles and caches statements per connection, and MySQL reads their
+    index pages into the buffer pool. A failure is logged and the process
+    still becomes ready; /readyz checks the database itself.
+    """
+    started = time.perf_counter()
+    state.pid = os.getpid()
+    try:
+        if not state.shared_loaded:
+            load_shared(app)
+        pool = db.get_pool()
+        count = min(app.config.get('DB_WARM_CONNECTIONS', 2), pool.size)
+        connections = [pool.acquire() for _ in range(count)]
+        try:
+            for connection in connections:
+                cursor = connection.cursor()
+                for sql, params in statements:
+                    cursor.execute(sql, params)
+                    cursor.fetchall()
+                cursor.close()
+        finally:
+            for connection in connections:
+                pool.release(connection)
+        state.connections = count
+    except Exception as e:
+        print(f"Warm-up failed: {e}")
+    state.warm_seconds = time.perf_counter() - started
+    state.ready = True
@@ -19,7 +19,7 @@ let allLeaves = []
 document.addEventListener("DOMContentLoaded", () => {
   console.log("[v0] Employee dashboard initializing...")
   initializeSocket()
-  loadUserProfile()
+  loadDashboardSummary()
   setupNavigation()
   setupLeaveForm()
   setupSocketListeners()
@@ -45,30 +45,43 @@ function setupSocketListeners() {
     console.log("[v0] Leave status updated:", data)
     showNotification(`Your leave request has been ${data.status}`, data.status === "approved" ? "success" : "error")
     loadMyRequests()
-    loadUserProfile()
+    loadDashboardSummary()
+  })
+
+  // Bulk decisions arrive as one event per employee
+  socket.on("leave_status_updates", (data) => {
+    console.log("[v0] Leave statuses updated:", data.updates)
+    const approved = data.updates.filter((u) => u.status === "approved").length
+    const rejected = data.updates.length - approved
+    const parts = []
+    if (approved) parts.push(`${approved} approved`)
+    if (rejected) parts.push(`${rejected} rejected`)
+    showNotification(`Leave requests updated: ${parts.join(", ")}`, rejected ? "info" : "success")
+    loadMyRequests()
+    loadDashboardSummary()
   })
 }
 
-// Load user profile
-async function loadUserProfile() {
-  console.log("[v0] Loading user profile...")
+// Load profile, balances, pending count and recent requests in one request
+async function loadDashboardSummary() {
+  console.log("[v0] Loading dashboard summary...")
   try {
-    const response = await fetch("/api/user/profile")
+    const response = await fetch("/api/dashboard/summary")
     if (!response.ok) {
       throw new Error(`HTTP error! status: ${response.status}`)
     }
     const data = await response.json()
-    console.log("[v0] User profile loaded:", data)
-    userProfile = data
+    console.log("[v0] Dashboard summary loaded:", data)
+    userProfile = data.profile
 
-    document.getElementById("user-name-display").textContent = data.name
-    document.getElementById("vacation-balance").textContent = data.vacation_balance
-    document.getElementById("sick-balance").textContent = data.sick_balance
+    document.getElementById("user-name-display").textContent = data.profile.name
+    document.getElementById("vacation-balance").textContent = data.profile.vacation_balance
+    document.getElementById("sick-balance").textContent = data.profile.sick_balance
+    document.getElementById("pending-count").textContent = data.counts.pending
 
-    // Load recent requests for overview
-    loadRecentRequests()
+    renderRecentRequests(data.recent)
   } catch (error) {
-    console.error("[v0] Error loading profile:", error)
+    console.error("[v0] Error loading dashboard:", error)
     showNotification("Error loading profile. Please refresh the page.", "error")
   }
 }
@@ -103,49 +116,51 @@ function setupNavigation() {
   })
 }
 
-// Load recent requests for overview
-async function loadRecentRequests() {
-  console.log("[v0] Loading recent requests...")
-  try {
-    const response = await fetch("/api/leaves/my-requests")
-    const requests = await response.json()
-    console.log("[v0] Recent requests loaded:", requests.length)
+// Render recent requests for overview
+function renderRecentRequests(recentRequests) {
+  const recentList = document.getElementById("recent-requests-list")
 
-    const pendingCount = requests.filter((r) => r.status === "pending").length
-    document.getElementById("pending-count").textContent = pendingCount
-
-    const recentList = document.getElementById("recent-requests-list")
-    const recentRequests = requests.slice(0, 3)
-
-    if (recentRequests.length === 0) {
-      recentList.innerHTML =
-        '<p style="color: var(--text-secondary); text-align: center; padding: 40px;">No leave requests yet</p>'
-      return
-    }
-
-    recentList.innerHTML = recentRequests.map((request) => createRequestCard(request)).join("")
-  } catch (error) {
-    console.error("[v0] Error loading recent requests:", error)
+  if (recentRequests.length === 0) {
+    recentList.innerHTML =
+      '<p style="color: var(--text-secondary); text-align: center; padding: 40px;">No leave requests yet</p>'
+    return
   }
+
+  recentList.innerHTML = recentRequests.map((request) => createRequestCard(request)).join("")
 }
 
-// Load my requests
-async function loadMyRequests() {
+// Load my requests (one page at a time)
+async function loadMyRequests(cursor = null) {
   console.log("[v0] Loading my requests...")
   try {
-    const response = await fetch("/api/leaves/my-requests")
+    const url = cursor ? `/api/leaves/my-requests?cursor=${encodeURIComponent(cursor)}` : "/api/leaves/my-requests"
+    const response = await fetch(url)
     const requests = await response.json()
+    const nextCursor = response.headers.get("X-Next-Cursor")
     console.log("[v0] My requests loaded:", requests.length)
 
     const requestsList = document.getElementById("my-requests-list")
 
-    if (requests.length === 0) {
+    if (!cursor && requests.length === 0) {
       requestsList.innerHTML =
         '<p style="color: var(--text-secondary); text-align: center; padding: 40px;">No leave requests yet</p>'
       return
     }
 
-    requestsList.innerHTML = requests.map((request) => createRequestCard(request)).join("")
+    const cards = requests.map((request) => createRequestCard(request)).join("")
+    if (cursor) {
+      requestsList.querySelector(".load-more")?.remove()
+      requestsList.insertAdjacentHTML("beforeend", cards)
+    } else {
+      requestsList.innerHTML = cards
+    }
+
+    if (nextCursor) {
+      requestsList.insertAdjacentHTML(
+        "beforeend",
+        `<button class="btn btn-sm btn-ghost load-more" onclick="loadMyRequests('${nextCursor}')">Load more</button>`,
+      )
+    }
   } catch (error) {
     console.error("[v0] Error loading requests:", error)
   }
@@ -225,10 +240,10 @@ function setupLeaveForm() {
 
         // Reload overview data
         setTimeout(() => {
-          loadUserProfile()
+          loadDashboardSummary()
         }, 1000)
       } else {
-        showFormMessage("Failed to submit leave request", "error")
+        showFormMessage(data.message || "Failed to submit leave request", "error")
       }
     } catch (error) {
       console.error("[v0] Error submitting leave:", error)
@@ -240,7 +255,12 @@ function setupLeaveForm() {
 async function loadCalendar() {
   console.log("[v0] Loading calendar...")
   try {
-    const response = await fetch("/api/calendar/leaves")
+    // Only fetch the leaves that overlap the displayed month
+    const pad = (n) => String(n).padStart(2, "0")
+    const lastDay = new Date(currentYear, currentMonth + 1, 0).getDate()
+    const start = `${currentYear}-${pad(currentMonth + 1)}-01`
+    const end = `${currentYear}-${pad(currentMonth + 1)}-${pad(lastDay)}`
+    const response = await fetch(`/api/calendar/leaves?start=${start}&end=${end}`)
     allLeaves = await response.json()
     console.log("[v0] Calendar events loaded:", allLeaves.length)
 
@@ -262,7 +282,7 @@ function setupCalendarControls() {
         currentMonth = 11
         currentYear--
       }
-      renderCalendar()
+      loadCalendar()
     }
 
     nextBtn.onclick = () => {
@@ -271,7 +291,7 @@ function setupCalendarControls() {
         currentMonth = 0
         currentYear++
       }
-      renderCalendar()
+      loadCalendar()
     }
   }
 }
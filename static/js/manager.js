@@ -20,9 +20,8 @@ let allLeaves = []
 document.addEventListener("DOMContentLoaded", () => {
   console.log("[v0] Manager dashboard initializing...")
   initializeSocket()
-  loadUserProfile()
+  loadDashboardSummary()
   setupNavigation()
-  loadPendingRequests()
   setupSocketListeners()
   setupFilters()
 })
@@ -44,21 +43,29 @@ function setupSocketListeners() {
     loadPendingRequests()
     updateNotificationBadge()
   })
+
+  // Bursts of submissions arrive as one event per department
+  socket.on("new_leave_requests", (data) => {
+    console.log("[v0] New leave requests received:", data.requests.length)
+    showNotification(`${data.requests.length} new leave requests`, "info")
+    loadPendingRequests()
+  })
 }
 
-// Load user profile
-async function loadUserProfile() {
-  console.log("[v0] Loading user profile...")
+// Load profile, pending count and newest pending requests in one request
+async function loadDashboardSummary() {
+  console.log("[v0] Loading dashboard summary...")
   try {
-    const response = await fetch("/api/user/profile")
+    const response = await fetch("/api/dashboard/summary")
     if (!response.ok) {
       throw new Error(`HTTP error! status: ${response.status}`)
     }
     const data = await response.json()
-    console.log("[v0] User profile loaded:", data)
-    document.getElementById("user-name-display").textContent = data.name
+    console.log("[v0] Dashboard summary loaded:", data)
+    document.getElementById("user-name-display").textContent = data.profile.name
+    renderPendingRequests(data.recent, data.counts.pending)
   } catch (error) {
-    console.error("[v0] Error loading profile:", error)
+    console.error("[v0] Error loading dashboard:", error)
     showNotification("Error loading profile. Please refresh the page.", "error")
   }
 }
@@ -102,47 +109,65 @@ async function loadPendingRequests() {
     const response = await fetch("/api/leaves/pending")
     const requests = await response.json()
     console.log("[v0] Pending requests loaded:", requests.length)
+    renderPendingRequests(requests, requests.length)
+  } catch (error) {
+    console.error("[v0] Error loading pending requests:", error)
+  }
+}
 
-    const badge = document.getElementById("pending-badge")
-    badge.textContent = requests.length
-
-    updateNotificationBadge(requests.length)
+// Render pending requests and update the pending counters
+function renderPendingRequests(requests, pendingCount) {
+  const badge = document.getElementById("pending-badge")
+  badge.textContent = pendingCount
 
-    const requestsList = document.getElementById("pending-requests-list")
+  updateNotificationBadge(pendingCount)
 
-    if (requests.length === 0) {
-      requestsList.innerHTML =
-        '<p style="color: var(--text-secondary); text-align: center; padding: 40px;">No pending requests</p>'
-      return
-    }
+  const requestsList = document.getElementById("pending-requests-list")
 
-    requestsList.innerHTML = requests.map((request) => createManagerRequestCard(request)).join("")
-  } catch (error) {
-    console.error("[v0] Error loading pending requests:", error)
+  if (requests.length === 0) {
+    requestsList.innerHTML =
+      '<p style="color: var(--text-secondary); text-align: center; padding: 40px;">No pending requests</p>'
+    return
   }
+
+  requestsList.innerHTML = requests.map((request) => createManagerRequestCard(request)).join("")
 }
 
-// Load all requests
-async function loadAllRequests(statusFilter = "all") {
+// Load all requests (one page at a time; the server filters by status)
+async function loadAllRequests(statusFilter = "all", cursor = null) {
   console.log("[v0] Loading all requests with filter:", statusFilter)
   try {
-    const response = await fetch("/api/leaves/all")
-    let requests = await response.json()
-    console.log("[v0] All requests loaded:", requests.length)
-
-    if (statusFilter !== "all") {
-      requests = requests.filter((r) => r.status === statusFilter)
+    const params = new URLSearchParams({ status: statusFilter })
+    if (cursor) {
+      params.set("cursor", cursor)
     }
+    const response = await fetch(`/api/leaves/all?${params}`)
+    const requests = await response.json()
+    const nextCursor = response.headers.get("X-Next-Cursor")
+    console.log("[v0] All requests loaded:", requests.length)
 
     const requestsList = document.getElementById("all-requests-list")
 
-    if (requests.length === 0) {
+    if (!cursor && requests.length === 0) {
       requestsList.innerHTML =
         '<p style="color: var(--text-secondary); text-align: center; padding: 40px;">No requests found</p>'
       return
     }
 
-    requestsList.innerHTML = requests.map((request) => createManagerRequestCard(request)).join("")
+    const cards = requests.map((request) => createManagerRequestCard(request)).join("")
+    if (cursor) {
+      requestsList.querySelector(".load-more")?.remove()
+      requestsList.insertAdjacentHTML("beforeend", cards)
+    } else {
+      requestsList.innerHTML = cards
+    }
+
+    if (nextCursor) {
+      requestsList.insertAdjacentHTML(
+        "beforeend",
+        `<button class="btn btn-sm btn-ghost load-more" onclick="loadAllRequests('${statusFilter}', '${nextCursor}')">Load more</button>`,
+      )
+    }
   } catch (error) {
     console.error("[v0] Error loading all requests:", error)
   }
@@ -206,10 +231,9 @@ function openApprovalModal(leaveId) {
   currentLeaveId = leaveId
 
   // Fetch leave details
-  fetch(`/api/leaves/all`)
-    .then((response) => response.json())
-    .then((requests) => {
-      const leave = requests.find((r) => r._id === leaveId)
+  fetch(`/api/leaves/${leaveId}`)
+    .then((response) => (response.ok ? response.json() : null))
+    .then((leave) => {
       if (leave) {
         const modalDetails = document.getElementById("modal-details")
         modalDetails.innerHTML = `
@@ -264,7 +288,7 @@ async function approveLeave() {
       closeApprovalModal()
       loadPendingRequests()
     } else {
-      showNotification("Failed to approve leave", "error")
+      showNotification(data.message || "Failed to approve leave", "error")
     }
   } catch (error) {
     console.error("[v0] Error approving leave:", error)
@@ -301,7 +325,7 @@ async function rejectLeave() {
       closeApprovalModal()
       loadPendingRequests()
     } else {
-      showNotification("Failed to reject leave", "error")
+      showNotification(data.message || "Failed to reject leave", "error")
     }
   } catch (error) {
     console.error("[v0] Error rejecting leave:", error)
@@ -320,7 +344,12 @@ function setupFilters() {
 async function loadCalendar() {
   console.log("[v0] Loading calendar...")
   try {
-    const response = await fetch("/api/calendar/leaves")
+    // Only fetch the leaves that overlap the displayed month
+    const pad = (n) => String(n).padStart(2, "0")
+    const lastDay = new Date(currentYear, currentMonth + 1, 0).getDate()
+    const start = `${currentYear}-${pad(currentMonth + 1)}-01`
+    const end = `${currentYear}-${pad(currentMonth + 1)}-${pad(lastDay)}`
+    const response = await fetch(`/api/calendar/leaves?start=${start}&end=${end}`)
     allLeaves = await response.json()
     console.log("[v0] Calendar events loaded:", allLeaves.length)
 
@@ -342,7 +371,7 @@ function setupCalendarControls() {
         currentMonth = 11
         currentYear--
       }
-      renderCalendar()
+      loadCalendar()
     }
 
     nextBtn.onclick = () => {
@@ -351,7 +380,7 @@ function setupCalendarControls() {
         currentMonth = 0
         currentYear++
       }
-      renderCalendar()
+      loadCalendar()
     }
   }
 }
@@ -523,6 +552,7 @@ function showNotification(message, type = "info") {
   }, 4000)
 }
 
+window.loadAllRequests = loadAllRequests
 window.openApprovalModal = openApprovalModal
 window.closeApprovalModal = closeApprovalModal
 window.approveLeave = approveLeave
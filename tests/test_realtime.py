@@ -0,0 +1,82 @@
+"""Emits shared between Socket.IO servers through the bundled broker."""
+import json
+import os
+import threading
+import time
+
+import simple_websocket
+import socketio
+from werkzeug.serving import make_server
+
+from realtime import Broker, UnixSocketManager
+
+
+class WebSocket(simple_websocket.Client):
+    def handshake(self):
+        super().handshake()
+        # simple-websocket 1.1 leaves a message that arrived with the accept unread
+        self._handle_events()
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, 'timed out'
+        time.sleep(0.01)
+
+
+def start_server(path):
+    """A threading Socket.IO server on a free port whose clients all join 'managers'."""
+    server = socketio.Server(async_mode='threading', client_manager=UnixSocketManager('unix://' + path))
+
+    @server.on('connect')
+    def connect(sid, environ):
+        server.enter_room(sid, 'managers')
+
+    http = make_server('127.0.0.1', 0, socketio.WSGIApp(server), threaded=True)
+    threading.Thread(target=http.serve_forever, daemon=True).start()
+    return server, http
+
+
+def connect(http):
+    client = WebSocket.connect(f'ws://127.0.0.1:{http.server_port}/socket.io/?EIO=4&transport=websocket')
+    assert client.receive(timeout=5).startswith('0')
+    client.send('40')
+    assert client.receive(timeout=5).startswith('40')
+    return client
+
+
+def events(client, timeout=0.5):
+    received = []
+    while True:
+        message = client.receive(timeout=timeout)
+        if message is None:
+            return received
+        if message.startswith('42'):
+            received.append(json.loads(message[2:]))
+
+
+def test_emit_reaches_clients_of_every_server(tmp_path):
+    path = str(tmp_path / 'broker.sock')
+    broker = Broker(path)
+    threading.Thread(target=broker.serve_forever, daemon=True).start()
+    wait_for(lambda: os.path.exists(path))
+
+    first, first_http = start_server(path)
+    second, second_http = start_server(path)
+    clients = [connect(first_http), connect(second_http)]
+    try:
+        # Each server subscribes to the broker when its first client connects
+        wait_for(lambda: len(broker._subscribers.get('socketio', {})) == 2)
+
+        first.emit('new_leave_request', {'leave_id': '1'}, room='managers')
+        second.emit('new_leave_request', {'leave_id': '2'}, room='managers')
+
+        for client in clients:
+            assert sorted(payload['leave_id'] for _, payload in events(client)) == ['1', '2']
+        assert broker.frames == 2
+    finally:
+        for client in clients:
+            client.close()
+        first_http.shutdown()
+        second_http.shutdown()
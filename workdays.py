@@ -0,0 +1,128 @@
+import json
+import threading
+from array import array
+from datetime import date, timedelta
+
+DAY_NAMES = ('Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun')
+
+# Years precomputed around today; spans outside are added on demand
+PRECOMPUTE_YEARS_BEFORE = 2
+PRECOMPUTE_YEARS_AFTER = 3
+
+
+def parse_weekmask(weekmask):
+    """Accept '1111100' or 'Mon Tue Wed Thu Fri' (numpy.busday style)."""
+    if isinstance(weekmask, str) and len(weekmask) == 7 and set(weekmask) <= {'0', '1'}:
+        return tuple(flag == '1' for flag in weekmask)
+    names = weekmask.split() if isinstance(weekmask, str) else list(weekmask)
+    unknown = set(names) - set(DAY_NAMES)
+    if unknown:
+        raise ValueError(f'Unknown weekday names in weekmask: {sorted(unknown)}')
+    return tuple(day in names for day in DAY_NAMES)
+
+
+class WorkCalendar:
+    """Working-day calendar with O(1) span counts.
+
+    ``cumulative[i]`` holds the number of working days in
+    [origin, origin + i), so any inclusive span is one subtraction. The
+    (origin, last, cumulative) triple is replaced as a whole when the
+    calendar grows, so readers take it once and never see a mix of two.
+    """
+
+    def __init__(self, weekmask='1111100', holidays=()):
+        self.weekmask = parse_weekmask(weekmask)
+        self.holidays = frozenset(h if isinstance(h, date) else date.fromisoformat(h) for h in holidays)
+        self._lock = threading.Lock()
+        today = date.today()
+        self._span = self._build(date(today.year - PRECOMPUTE_YEARS_BEFORE, 1, 1),
+                                 date(today.year + PRECOMPUTE_YEARS_AFTER, 12, 31))
+
+    def _build(self, first, last):
+        cumulative = array('l', [0])
+        total = 0
+        day = first
+        while day <= last:
+            if self.weekmask[day.weekday()] and day not in self.holidays:
+                total += 1
+            cumulative.append(total)
+            day += timedelta(days=1)
+        return first, last, cumulative
+
+    def _covering(self, start, end):
+        """The (origin, last, cumulative) triple, grown first if it does not cover [start, end]."""
+        span = self._span
+        if span[0] <= start and end <= span[1]:
+            return span
+        with self._lock:
+            origin, last, _ = span = self._span
+            if start < origin or end > last:
+                span = self._span = self._build(date(min(start, origin).year, 1, 1),
+                                                date(max(end, last).year, 12, 31))
+            return span
+
+    def is_working_day(self, day):
+        return self.weekmask[day.weekday()] and day not in self.holidays
+
+    def count(self, start, end):
+        """Working days in the inclusive span [start, end]."""
+        if end < start:
+            return 0
+        origin, _, cumulative = self._covering(start, end)
+        return cumulative[(end - origin).days + 1] - cumulative[(start - origin).days]
+
+    def days(self, start, end):
+        """Working days in the inclusive span [start, end], in order."""
+        working = []
+        day = start
+        while day <= end:
+            if self.is_working_day(day):
+                working.append(day)
+            day += timedelta(days=1)
+        return working
+
+    def count_many(self, spans):
+        """Working days for each (start, end) pair, for batch jobs."""
+        spans = list(spans)
+        if not spans:
+            return []
+        origin, _, cumulative = self._covering(min(start for start, _ in spans), max(end for _, end in spans))
+        return [cumulative[(end - origin).days + 1] - cumulative[(start - origin).days] if end >= start else 0
+                for start, end in spans]
+
+
+_calendars = {'default': WorkCalendar()}
+_departments = {}
+
+
+def init_app(app):
+    """Build the calendars named in WORK_CALENDARS.
+
+    WORK_CALENDARS maps a calendar name to {'weekmask': ..., 'holidays': [...]}
+    and DEPARTMENT_WORK_CALENDARS maps a department (or region) to a calendar
+    name. Departments without an entry use the 'default' calendar.
+    """
+    configs = dict(app.config.get('WORK_CALENDARS') or {})
+    path = app.config.get('WORK_CALENDARS_FILE')
+    if path:
+        with open(path) as f:
+            data = json.load(f)
+        configs.update(data.get('calendars', {}))
+        app.config.setdefault('DEPARTMENT_WORK_CALENDARS', {}).update(data.get('departments', {}))
+    configs.setdefault('default', {})
+
+    _calendars.clear()
+    for name, config in configs.items():
+        _calendars[name] = WorkCalendar(config.get('weekmask', '1111100'), config.get('holidays', ()))
+    _departments.clear()
+    _departments.update(app.config.get('DEPARTMENT_WORK_CALENDARS') or {})
+    app.extensions['work_calendars'] = _calendars
+
+
+def calendar_for(department):
+    return _calendars.get(_departments.get(department, 'default'), _calendars['default'])
+
+
+def leave_days(leave):
+    """Working days charged for a leave row with department, start_date and end_date."""
+    return calendar_for(leave['department']).count(leave['start_date'], leave['end_date'])